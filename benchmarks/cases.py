@@ -0,0 +1,169 @@
+"""
+What the benchmark suite times, one entry per user-facing operation.
+
+Each case runs in a fresh process inside a generated dataset directory
+(see generate.py), so it pays what a CLI run pays: nothing is warm in
+memory, only the on-disk caches under database/cache may be. Run one by
+hand with:
+
+    python benchmarks/cases.py <case> <dataset directory>
+
+which prints {"seconds": ...} for the timed call alone (imports and setup
+are not timed).
+"""
+import atexit
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+
+class _Answer:
+    """Stands in for a questionary prompt: ask() returns a fixed answer."""
+
+    def __init__(self, answer):
+        self.answer = answer
+
+    def ask(self):
+        return self.answer
+
+
+def _answering(choice):
+    import questionary
+    questionary.select = lambda *args, **kwargs: _Answer(choice)
+
+
+def _scratch_dir():
+    path = tempfile.mkdtemp(prefix="hisaab_bench_")
+    atexit.register(shutil.rmtree, path, True)
+    return path
+
+
+def _list_transactions(choice):
+    def setup(info):
+        _answering(choice)
+        from features.transactions2 import transactions
+        return transactions.list_transactions
+
+    return setup
+
+
+def _query_transactions(info):
+    from features.transactions2 import transactions
+    return transactions._query_transactions
+
+
+def _balance(info):
+    from features.transactions2 import transactions
+    return transactions.balance
+
+
+def _view_budgets(info):
+    from features.budgets import budget
+    return budget.view_budgets
+
+
+def _display_analytics(info):
+    from features.analytics import analytics
+    return analytics.display_analytics
+
+
+def _export(writer_name, suffix):
+    def setup(info):
+        from features.data_management import data_management
+        path = os.path.join(_scratch_dir(), f"export{suffix}")
+        return lambda: getattr(data_management, writer_name)(path)
+
+    return setup
+
+
+def _import_statement(info):
+    from features.data_management import data_management
+    # A dry run still parses, reconciles against the whole ledger and categorizes
+    return lambda: data_management.import_statement("statement.csv", "debit_credit", dry_run=True)
+
+
+def _backup(info):
+    from features.data_management import backup_store
+    # Every run starts from an empty store, like the first backup of a ledger
+    shutil.rmtree("backups", ignore_errors=True)
+    return backup_store.create_snapshot
+
+
+def _restore(info):
+    from features.data_management import backup_store
+    snapshots = backup_store.list_snapshots()
+    snapshot_id = snapshots[0]["id"] if snapshots else backup_store.create_snapshot()[0]["id"]
+    target = _scratch_dir()
+    return lambda: backup_store.restore_snapshot(snapshot_id, target_root=target)
+
+
+def _dashboard_load_transactions(info):
+    import importlib.util
+    from features.data_management import backup_scheduler
+
+    # No snapshots running behind the measurement
+    backup_scheduler.start_background_backups = lambda *args, **kwargs: None
+    # Imported without `streamlit run` (bare mode): st calls log warnings to stderr
+    spec = importlib.util.spec_from_file_location("dashboard", os.path.join(PROJECT_ROOT, "day-7", "dashboard.py"))
+    dashboard = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(dashboard)
+    dashboard.st.session_state.username = info["username"]
+    return dashboard.load_transactions
+
+
+# name -> setup(dataset info) returning the function to time, and the
+# largest ledger (rows) the case is run on; None for no limit
+CASES = {
+    # Every transaction through the query engine; not comparable with the
+    # read_transactions full scan of results recorded before it
+    "query_transactions": {"setup": _query_transactions, "max_rows": None},
+    "list_transactions_last_7_days": {"setup": _list_transactions("Last 7 days"), "max_rows": None},
+    # Renders every row in a Rich table
+    "list_transactions_expenses": {"setup": _list_transactions("Expenses only"), "max_rows": 10_000},
+    "balance": {"setup": _balance, "max_rows": None},
+    "view_budgets": {"setup": _view_budgets, "max_rows": None},
+    "display_analytics": {"setup": _display_analytics, "max_rows": None},
+    "export_csv": {"setup": _export("write_transactions_csv", ".csv"), "max_rows": None},
+    "export_json": {"setup": _export("write_transactions_json", ".json"), "max_rows": None},
+    "import_statement": {"setup": _import_statement, "max_rows": None},
+    "backup": {"setup": _backup, "max_rows": None},
+    "restore": {"setup": _restore, "max_rows": None},
+    "dashboard_load_transactions": {"setup": _dashboard_load_transactions, "max_rows": None},
+}
+
+
+def run_case(name, dataset_dir):
+    """
+    Runs one case in dataset_dir (the working directory is changed to it).
+
+    Returns:
+        float: Seconds taken by the timed call. Console output is discarded.
+    """
+    os.chdir(dataset_dir)
+    with open("dataset.json") as f:
+        info = json.load(f)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        function = CASES[name]["setup"](info)
+        started = time.perf_counter()
+        function()
+        return time.perf_counter() - started
+
+
+def main():
+    if len(sys.argv) != 3 or sys.argv[1] not in CASES:
+        print(f"usage: {sys.argv[0]} <{'|'.join(CASES)}> <dataset directory>", file=sys.stderr)
+        return 2
+    print(json.dumps({"seconds": run_case(sys.argv[1], sys.argv[2])}))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+"""
+Deterministic synthetic data for the benchmarks.
+
+Writes a database/ directory the way the CLI and the dashboard leave it:
+the CLI ledger (database/transactions.txt, with "category_or_source"), a
+dashboard user's ledger (database/transactions_<user>.txt, with
+"category"), budget histories and settings for both, plus a bank
+statement (statement.csv, Debit/Credit columns) that partly overlaps the
+ledger, for the importer. The same size, seed and end date always give
+byte-for-byte the same files.
+
+Usage (from the project root):
+    python benchmarks/generate.py [--size 100k] [--seed 42] [--end-date 2026-10-19] [--out DIR]
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import random
+import shutil
+import sys
+from datetime import date, timedelta
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+# Bump when the generated data changes, so cached datasets are rebuilt
+GENERATOR_VERSION = 1
+
+SEED = 42
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+DEFAULT_SIZE = "100k"
+# The dashboard user the generated ledger belongs to
+USERNAME = "bench"
+
+# Days covered: a year at least, ~25 transactions a day as the ledger grows,
+# twenty years at most (bigger ledgers just get busier days)
+ROWS_PER_DAY = 25
+MIN_DAYS = 365
+MAX_DAYS = 20 * 365
+# Records encoded and appended per write
+BLOCK_ROWS = 50_000
+# Statement rows for the importer: most are already in the ledger
+STATEMENT_ROWS = 2_000
+STATEMENT_NEW_SHARE = 0.2
+
+# (category, descriptions, median amount in rupees, relative frequency)
+EXPENSES = [
+    ("Food", ["Imtiaz Supermarket", "Foodpanda order", "KFC", "Chai dhaba", "Al-Fatah grocery",
+              "Bundu Khan", "Savour Foods", "Cafe Aylanto"], 1_200, 40),
+    ("Transport", ["Careem ride", "Uber trip", "PSO petrol", "Shell fuel", "Metro bus card"], 800, 20),
+    ("Shopping", ["Daraz order", "Khaadi", "Outfitters", "Hush Puppies", "Liberty market"], 4_500, 10),
+    ("Bills", ["Mobile top-up", "Water bill", "Gas bill"], 2_500, 6),
+    ("Entertainment", ["Cinepax tickets", "Spotify", "Steam game", "Bowling"], 1_500, 6),
+    ("Health", ["Pharmacy", "Clinic visit", "Lab test"], 2_000, 5),
+    ("Other", ["ATM withdrawal", "Gift for friend", "Donation", "Haircut"], 1_000, 5),
+]
+INCOMES = [
+    ("Freelance", ["Upwork payout", "Fiverr withdrawal", "Client transfer"], 40_000, 5),
+    ("Investment", ["Mutual fund dividend", "Savings profit"], 8_000, 2),
+    ("Gift", ["Eidi", "Birthday gift"], 5_000, 1),
+]
+# Paid every month: (day of month, type, category, description, amount in rupees)
+MONTHLY = [
+    (1, "income", "Salary", "Monthly salary", 250_000),
+    (3, "expense", "Bills", "House rent", 60_000),
+    (10, "expense", "Bills", "K-Electric bill", 9_500),
+    (12, "expense", "Bills", "PTCL internet", 4_200),
+    (15, "expense", "Entertainment", "Netflix subscription", 1_100),
+]
+# Monthly budgets set from the first month on, in rupees
+BUDGETS = {"Food": 45_000, "Transport": 20_000, "Shopping": 25_000, "Bills": 80_000,
+           "Entertainment": 8_000, "Health": 10_000}
+SETTINGS = {"currency": "PKR", "symbol": "₨", "setup_complete": True}
+
+
+def parse_size(size):
+    """Rows for a size name ("100k") or a plain number. Raises ValueError otherwise."""
+    if size.lower() in SIZES:
+        return SIZES[size.lower()]
+    rows = int(size.replace("_", ""))
+    if rows <= 0:
+        raise ValueError(f"size must be positive, got {size}")
+    return rows
+
+
+def size_label(rows):
+    """The SIZES name of a row count, or the count itself."""
+    return next((label for label, count in SIZES.items() if count == rows), str(rows))
+
+
+def span_days(rows):
+    return min(max(math.ceil(rows / ROWS_PER_DAY), MIN_DAYS), MAX_DAYS)
+
+
+def _amount_paisa(rng, median_rupees):
+    # Log-normal around the median, like real spending: mostly small, a few big
+    return max(100, int(rng.lognormvariate(math.log(median_rupees), 0.6) * 100))
+
+
+def iter_records(rows, seed=SEED, end_date=None):
+    """
+    Yields rows synthetic CLI transactions in date order, ending on end_date
+    (default today): monthly salary and bills plus random daily spending.
+    """
+    end_date = end_date or date.today()
+    days = span_days(rows)
+    first_day = end_date - timedelta(days=days - 1)
+    rng = random.Random(seed)
+    expense_weights = [weight for *_, weight in EXPENSES]
+    income_weights = [weight for *_, weight in INCOMES]
+
+    for n in range(days):
+        day = first_day + timedelta(days=n)
+        iso = day.isoformat()
+        count = rows * (n + 1) // days - rows * n // days
+        fixed = [entry for entry in MONTHLY if entry[0] == day.day][:count]
+        for _, kind, category, description, rupees in fixed:
+            yield {"date": iso, "type": kind, "category_or_source": category,
+                   "description": description, "amount_paisa": rupees * 100}
+        for _ in range(count - len(fixed)):
+            if rng.random() < 0.04:
+                kind, (category, descriptions, median, _) = "income", rng.choices(INCOMES, income_weights)[0]
+            else:
+                kind, (category, descriptions, median, _) = "expense", rng.choices(EXPENSES, expense_weights)[0]
+            yield {"date": iso, "type": kind, "category_or_source": category,
+                   "description": rng.choice(descriptions), "amount_paisa": _amount_paisa(rng, median)}
+
+
+def _write_ledgers(database_dir, rows, seed, end_date):
+    """Writes the CLI and dashboard ledgers in blocks. Returns the last STATEMENT_ROWS records."""
+    from features.ledger import ledger
+
+    cli_path = os.path.join(database_dir, "transactions.txt")
+    user_path = os.path.join(database_dir, f"transactions_{USERNAME}.txt")
+    tail = []
+    block = []
+
+    def flush():
+        ledger.append_records(cli_path, block)
+        ledger.append_records(user_path, [
+            {"date": record["date"], "type": record["type"], "category": record["category_or_source"],
+             "description": record["description"], "amount_paisa": record["amount_paisa"]}
+            for record in block
+        ])
+        tail.extend(block[-STATEMENT_ROWS:])
+        del tail[:-STATEMENT_ROWS]
+        block.clear()
+
+    for record in iter_records(rows, seed, end_date):
+        block.append(record)
+        if len(block) == BLOCK_ROWS:
+            flush()
+    if block:
+        flush()
+    return tail
+
+
+def _write_statement(path, tail, seed):
+    """A Debit/Credit bank statement: the ledger's last rows plus some it does not have yet."""
+    rng = random.Random(seed + 1)
+    rows = []
+    for record in tail:
+        rows.append(record)
+        if rng.random() < STATEMENT_NEW_SHARE:
+            rows.append(dict(record, description=f"POS {rng.randrange(10_000, 99_999)}",
+                             amount_paisa=_amount_paisa(rng, 1_500), type="expense"))
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Transaction Date", "Description", "Debit", "Credit"])
+        for record in rows:
+            amount = f"{record['amount_paisa'] / 100:,.2f}"
+            day = date.fromisoformat(record["date"]).strftime("%d/%m/%Y")
+            if record["type"] == "expense":
+                writer.writerow([day, record["description"], amount, ""])
+            else:
+                writer.writerow([day, record["description"], "", amount])
+    return len(rows)
+
+
+def generate(root, rows, seed=SEED, end_date=None):
+    """
+    Writes a synthetic dataset under root (database/ and statement.csv).
+
+    Args:
+        root (str): Directory to write to; must not already hold a database/.
+        rows (int): Transactions in each ledger.
+        seed (int): Random seed.
+        end_date (date): Date of the newest transactions, default today.
+
+    Returns:
+        dict: What was generated, also saved as root/dataset.json.
+    """
+    from features.budgets import budget_history
+
+    end_date = end_date or date.today()
+    database_dir = os.path.join(root, "database")
+    if os.path.exists(os.path.join(database_dir, "transactions.txt")):
+        raise ValueError(f"{database_dir} already has a ledger")
+    os.makedirs(database_dir, exist_ok=True)
+
+    tail = _write_ledgers(database_dir, rows, seed, end_date)
+    first_month = (end_date - timedelta(days=span_days(rows) - 1)).replace(day=1)
+    for suffix in ("", f"_{USERNAME}"):
+        for category, rupees in BUDGETS.items():
+            budget_history.record_budget(category, rupees * 100, first_month,
+                                         os.path.join(database_dir, f"budget_history{suffix}.txt"))
+    with open(os.path.join(database_dir, f"settings_{USERNAME}.json"), "w") as f:
+        json.dump(SETTINGS, f)
+    statement_rows = _write_statement(os.path.join(root, "statement.csv"), tail, seed)
+
+    info = {
+        "version": GENERATOR_VERSION,
+        "rows": rows,
+        "seed": seed,
+        "end_date": end_date.isoformat(),
+        "days": span_days(rows),
+        "username": USERNAME,
+        "statement_rows": statement_rows,
+        "ledger_bytes": os.path.getsize(os.path.join(database_dir, "transactions.txt")),
+    }
+    with open(os.path.join(root, "dataset.json"), "w") as f:
+        json.dump(info, f, indent=2)
+    return info
+
+
+def cached_dataset(data_root, rows, seed=SEED, end_date=None):
+    """
+    Returns (directory, info) of a dataset under data_root, generating it
+    unless an identical one is already there.
+    """
+    end_date = end_date or date.today()
+    root = os.path.join(data_root, f"{size_label(rows)}-seed{seed}-{end_date.isoformat()}")
+    try:
+        with open(os.path.join(root, "dataset.json")) as f:
+            info = json.load(f)
+        if info.get("version") == GENERATOR_VERSION:
+            return root, info
+    except (OSError, json.JSONDecodeError):
+        pass
+    if os.path.exists(root):
+        shutil.rmtree(root)
+    return root, generate(root, rows, seed, end_date)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", default=DEFAULT_SIZE, help=f"one of {', '.join(SIZES)} or a row count")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--end-date", type=date.fromisoformat, default=None, help="YYYY-MM-DD, default today")
+    parser.add_argument("--out", help="directory to write to (default: a new one under benchmarks/data)")
+    args = parser.parse_args()
+
+    rows = parse_size(args.size)
+    if args.out:
+        root, info = args.out, generate(args.out, rows, args.seed, args.end_date)
+    else:
+        root, info = cached_dataset(os.path.join(PROJECT_ROOT, "benchmarks", "data"), rows, args.seed, args.end_date)
+    print(f"{info['rows']:,} transactions over {info['days']:,} days "
+          f"({info['ledger_bytes'] / 1e6:.1f} MB ledger) in {root}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+"""
+Load test: hundreds of concurrent dashboard sessions against a local ledger service.
+
+Builds a throwaway database with synthetic users, starts `main.py serve`
+on it, and runs one thread per simulated session, like Streamlit does.
+Each session does several reruns: settings, transactions and budgets
+loaded together through features.service.store (as dashboard.py does),
+then one batch of the Insights aggregates. Reports rerun latency
+percentiles, throughput and how many reads were coalesced.
+
+Usage (from the project root):
+    python benchmarks/load_test.py [--sessions 300] [--users 20] [--rows 2000] [--rounds 5]
+                                   [--sequential] [--no-service]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+SEED = 42
+CATEGORIES = ["Food", "Transport", "Shopping", "Bills", "Entertainment", "Health", "Other"]
+# Seconds a session waits between reruns, at most
+THINK_SECONDS = 0.05
+SOCKET_WAIT_SECONDS = 60
+
+
+def build_database(root, users, rows):
+    """Writes a ledger, a budget store and settings for each synthetic user under root/database."""
+    from features.budgets import budget_repository
+    from features.ledger import ledger
+
+    rng = random.Random(SEED)
+    first_day = date.today() - timedelta(days=365)
+    os.makedirs(os.path.join(root, "database"), exist_ok=True)
+    cwd = os.getcwd()
+    os.chdir(root)
+    try:
+        for n in range(users):
+            username = f"user{n:03d}"
+            records = []
+            for _ in range(rows):
+                income = rng.random() < 0.05
+                records.append({
+                    "date": (first_day + timedelta(days=rng.randrange(366))).isoformat(),
+                    "type": "income" if income else "expense",
+                    "category": "Salary" if income else rng.choice(CATEGORIES),
+                    "description": f"synthetic {rng.randrange(500)}",
+                    "amount_paisa": rng.randrange(100, 5_000_00) * (20 if income else 1)
+                })
+            records.sort(key=lambda record: record["date"])
+            ledger.append_records(f"database/transactions_{username}.txt", records)
+            for category in CATEGORIES[:4]:
+                budget_repository.set_budget(category, rng.randrange(10_000, 50_000) * 100, username)
+            with open(f"database/settings_{username}.json", "w") as f:
+                json.dump({"currency": "PKR", "symbol": "Rs", "setup_complete": True}, f)
+    finally:
+        os.chdir(cwd)
+
+
+def start_service(root):
+    """Starts `main.py serve` in root. Returns the process once its socket is up."""
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(PROJECT_ROOT, "main.py"), "serve"],
+        cwd=root, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    socket_path = os.path.join(root, "database", ".hisaabd.sock")
+    deadline = time.monotonic() + SOCKET_WAIT_SECONDS
+    while not os.path.exists(socket_path):
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.kill()
+            raise RuntimeError(f"the ledger service did not start:\n{process.stderr.read().decode()[-2000:]}")
+        time.sleep(0.05)
+    return process
+
+
+def rerun(username, sequential):
+    """One dashboard rerun's data access for a user."""
+    from features.service import client, store
+
+    ledger_path = f"database/transactions_{username}.txt"
+    settings_path = f"database/settings_{username}.json"
+    if sequential:
+        # What the dashboard did before: one load after another, nothing shared
+        with open(settings_path) as f:
+            json.load(f)
+        client.call("ledger.records", path=ledger_path, with_positions=True)
+        budgets = client.call("budget.load", username=username)
+    else:
+        _, _, budgets = store.gather(
+            store.read_json(settings_path, {}),
+            store.read_records(ledger_path, with_positions=True),
+            store.call("budget.load", username=username)
+        )
+    client.call_batch([
+        ("assistant.forecast", {"ledger_path": ledger_path}),
+        ("assistant.flagged", {"ledger_path": ledger_path}),
+        ("assistant.upcoming", {"ledger_path": ledger_path, "days": 7}),
+        ("budget.evaluate", {"budgets": budgets, "ledger_path": ledger_path, "warning_percent": 80}),
+    ])
+
+
+def run_sessions(sessions, users, rounds, sequential):
+    """Runs the sessions to completion. Returns (rerun latencies in seconds, errors, elapsed seconds)."""
+    latencies, errors = [], []
+    start_barrier = threading.Barrier(sessions)
+
+    def session(n):
+        rng = random.Random(SEED + n)
+        username = f"user{n % users:03d}"
+        start_barrier.wait()
+        for _ in range(rounds):
+            started = time.perf_counter()
+            try:
+                rerun(username, sequential)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+                continue
+            latencies.append(time.perf_counter() - started)
+            time.sleep(rng.random() * THINK_SECONDS)
+
+    threads = [threading.Thread(target=session, args=(n,)) for n in range(sessions)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=2000, help="transactions per user")
+    parser.add_argument("--rounds", type=int, default=5, help="reruns per session")
+    parser.add_argument("--sequential", action="store_true",
+                        help="load settings, transactions and budgets one after another without coalescing")
+    parser.add_argument("--no-service", action="store_true", help="run everything in this process")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="hisaab_load_")
+    service = None
+    try:
+        print(f"Building {args.users} users x {args.rows} transactions in {root}...")
+        build_database(root, args.users, args.rows)
+        if not args.no_service:
+            service = start_service(root)
+        os.chdir(root)
+
+        from features.service import client, store
+        latencies, errors, elapsed = run_sessions(args.sessions, args.users, args.rounds, args.sequential)
+
+        mode = "sequential loads" if args.sequential else "concurrent, coalesced loads"
+        where = "in-process" if args.no_service else "via the ledger service"
+        print(f"{args.sessions} sessions x {args.rounds} reruns, {mode}, {where}")
+        if latencies:
+            cuts = statistics.quantiles(latencies, n=100)
+            print(f"  reruns: {len(latencies)} in {elapsed:.2f} s ({len(latencies) / elapsed:.0f}/s)")
+            print(f"  latency ms: p50 {cuts[49] * 1000:.1f}  p95 {cuts[94] * 1000:.1f}  "
+                  f"p99 {cuts[98] * 1000:.1f}  max {max(latencies) * 1000:.1f}")
+        local = store.stats()
+        print(f"  client reads: {local['reads']}, coalesced {local['coalesced']}")
+        if service is not None:
+            remote = client.call("service.stats")
+            print(f"  service reads: {remote['reads']}, coalesced {remote['coalesced']}")
+        if errors:
+            print(f"  errors: {len(errors)}, e.g. {errors[0]}")
+        return 1 if errors else 0
+    finally:
+        if service is not None:
+            service.terminate()
+            service.wait(timeout=10)
+        os.chdir(PROJECT_ROOT)
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""
+Benchmark suite: times the ledger operations (see cases.py) on synthetic
+ledgers of several sizes (see generate.py) and saves the results as JSON,
+so two commits can be compared.
+
+Every case runs in a fresh process. Its first run starts without the
+on-disk caches (database/cache), the "cold" time a user sees after an
+upgrade or a repair; the other runs keep them, as most CLI runs do.
+
+Usage (from the project root):
+    python benchmarks/run.py [--sizes 1k,100k] [--cases balance,export_csv] [--repeat 3]
+                             [--output results.json] [--compare BASELINE.json]
+    python benchmarks/run.py --compare OLD.json NEW.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+from datetime import date, datetime
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from benchmarks import cases, generate  # noqa: E402
+
+DATA_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "data")
+RESULTS_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "results")
+DEFAULT_SIZES = "1k,100k"
+DEFAULT_REPEAT = 3
+# A case this much slower (median) than the baseline counts as a regression
+DEFAULT_TOLERANCE = 0.2
+# Seconds one case run may take
+CASE_TIMEOUT_SECONDS = 30 * 60
+
+
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], cwd=PROJECT_ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _run_once(name, dataset_dir):
+    """Runs a case in a new process. Returns its seconds. Raises RuntimeError if it fails."""
+    process = subprocess.run(
+        [sys.executable, os.path.join(PROJECT_ROOT, "benchmarks", "cases.py"), name, dataset_dir],
+        capture_output=True, text=True, timeout=CASE_TIMEOUT_SECONDS
+    )
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr.strip()[-2000:] or f"exit status {process.returncode}")
+    return json.loads(process.stdout.strip().splitlines()[-1])["seconds"]
+
+
+def run_case(name, dataset_dir, repeat):
+    """
+    Times one case: a cold run, then repeat runs with the caches it built.
+
+    Returns:
+        dict: cold_s, runs_s, min_s and median_s, or "error".
+    """
+    shutil.rmtree(os.path.join(dataset_dir, "database", "cache"), ignore_errors=True)
+    try:
+        cold = _run_once(name, dataset_dir)
+        runs = [_run_once(name, dataset_dir) for _ in range(repeat)]
+    except (RuntimeError, subprocess.TimeoutExpired) as e:
+        return {"error": str(e)}
+    return {"cold_s": cold, "runs_s": runs, "min_s": min(runs), "median_s": statistics.median(runs)}
+
+
+def run_suite(sizes, names, repeat, seed, end_date):
+    """
+    Runs the cases on a dataset of each size, generating datasets as needed.
+
+    Returns:
+        dict: size label -> {"dataset": its dataset.json, "cases": name -> timings}.
+    """
+    results = {}
+    for rows in sizes:
+        label = generate.size_label(rows)
+        print(f"[{label}] preparing dataset...", flush=True)
+        dataset_dir, info = generate.cached_dataset(DATA_DIR, rows, seed, end_date)
+        timings = {}
+        for name in names:
+            max_rows = cases.CASES[name]["max_rows"]
+            if max_rows is not None and rows > max_rows:
+                timings[name] = {"skipped": f"only run on ledgers of up to {max_rows:,} rows"}
+                continue
+            timings[name] = run_case(name, dataset_dir, repeat)
+            timing = timings[name]
+            if "error" in timing:
+                print(f"[{label}] {name}: failed: {timing['error'].splitlines()[-1]}", flush=True)
+            else:
+                print(f"[{label}] {name}: median {timing['median_s'] * 1000:,.1f} ms, "
+                      f"cold {timing['cold_s'] * 1000:,.1f} ms", flush=True)
+        results[label] = {"dataset": info, "cases": timings}
+    return results
+
+
+def compare(baseline, current, tolerance=DEFAULT_TOLERANCE):
+    """
+    Prints each case's median against the baseline's.
+
+    Returns:
+        list: (size, case, ratio) of the cases slower than tolerance allows.
+    """
+    regressions = []
+    print(f"{'size':>6}  {'case':<32} {'baseline ms':>12} {'current ms':>12} {'change':>8}")
+    for label, current_size in current["results"].items():
+        baseline_cases = baseline["results"].get(label, {}).get("cases", {})
+        for name, timing in current_size["cases"].items():
+            before = baseline_cases.get(name, {}).get("median_s")
+            after = timing.get("median_s")
+            if before is None or after is None:
+                continue
+            ratio = after / before if before else float("inf")
+            flag = "  SLOWER" if ratio > 1 + tolerance else ""
+            print(f"{label:>6}  {name:<32} {before * 1000:12,.1f} {after * 1000:12,.1f} {ratio - 1:+8.0%}{flag}")
+            if flag:
+                regressions.append((label, name, ratio))
+    return regressions
+
+
+def _load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default=DEFAULT_SIZES,
+                        help=f"comma separated: {', '.join(generate.SIZES)} or row counts")
+    parser.add_argument("--cases", default=",".join(cases.CASES), help="comma separated case names")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="runs per case after the cold one")
+    parser.add_argument("--seed", type=int, default=generate.SEED)
+    parser.add_argument("--end-date", type=date.fromisoformat, default=None,
+                        help="date of the newest transactions, default today")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<time>_<commit>.json)")
+    parser.add_argument("--compare", nargs="+", metavar="RESULTS",
+                        help="baseline results to compare this run with; or two results files to compare")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="slowdown (0.2 = 20%%) reported as a regression")
+    args = parser.parse_args()
+
+    if args.compare and len(args.compare) > 2:
+        parser.error("--compare takes a baseline, or a baseline and a results file")
+    if args.compare and len(args.compare) == 2:
+        return 1 if compare(_load(args.compare[0]), _load(args.compare[1]), args.tolerance) else 0
+
+    names = [name.strip() for name in args.cases.split(",") if name.strip()]
+    unknown = [name for name in names if name not in cases.CASES]
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(unknown)} (choose from {', '.join(cases.CASES)})")
+    try:
+        sizes = [generate.parse_size(size.strip()) for size in args.sizes.split(",") if size.strip()]
+    except ValueError as e:
+        parser.error(str(e))
+
+    commit = _git("rev-parse", "--short", "HEAD")
+    report = {
+        "commit": commit,
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "repeat": args.repeat,
+        "results": run_suite(sizes, names, args.repeat, args.seed, args.end_date),
+    }
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {output}")
+
+    failed = any("error" in timing for size in report["results"].values() for timing in size["cases"].values())
+    regressions = compare(_load(args.compare[0]), report, args.tolerance) if args.compare else []
+    return 1 if failed or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
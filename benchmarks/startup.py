@@ -0,0 +1,122 @@
+"""
+Measures how long the CLI takes to reach its first menu prompt.
+
+Runs `python -X importtime` on everything main() does before asking the
+first question (the startup integrity check, pending alerts and building
+the menu), several times, and fails if the median is over the threshold or
+if a heavy module that only some commands need was imported.
+
+The menu prompt itself needs questionary, and prompt_toolkit with it, so
+importing questionary alone is measured in the same runs as the floor; the
+threshold is how much startup may add on top of it. That holds on slower
+machines too, where a fixed number would not.
+
+Usage (from the project root):
+    python benchmarks/startup.py [--runs 5] [--overhead-ms 100] [--threshold-ms N] [--top 10]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What main() runs before the first prompt is shown
+FIRST_PROMPT_CODE = "import main; main.startup_integrity_check(); main.menu_prompt()"
+
+# The least any first prompt costs: the interpreter and questionary
+FLOOR_CODE = "import questionary"
+
+DEFAULT_RUNS = 5
+# Time to first prompt over the floor's, in milliseconds. Measured with 11
+# runs each: the floor 198-209 ms, the first prompt 226-323 ms (before the
+# command registry, `import main` alone took 301 ms)
+DEFAULT_OVERHEAD_MS = 100
+
+# Modules that must not be imported before the first prompt
+FORBIDDEN_AT_STARTUP = (
+    "numpy",
+    "pandas",
+    "streamlit",
+    "features.smart_assistant",
+    "features.analytics",
+)
+
+
+def parse_importtime(stderr):
+    """
+    Parses `-X importtime` output.
+
+    Returns:
+        list: (module, self microseconds, cumulative microseconds, depth)
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        imports.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return imports
+
+
+def measure_once(code=FIRST_PROMPT_CODE):
+    """Runs the startup path (or other code) once. Returns (wall milliseconds, imports)."""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=PROJECT_ROOT, capture_output=True, text=True
+    )
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"startup failed:\n{result.stderr[-2000:]}")
+    return elapsed_ms, parse_importtime(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    parser.add_argument("--overhead-ms", type=float, default=DEFAULT_OVERHEAD_MS,
+                        help="time allowed over importing questionary alone")
+    parser.add_argument("--threshold-ms", type=float, help="also fail over this absolute time")
+    parser.add_argument("--top", type=int, default=10, help="heaviest top-level imports to list")
+    args = parser.parse_args()
+
+    timings = []
+    floor_timings = []
+    imports = []
+    for _ in range(args.runs):
+        # Interleaved, so both see the same machine load
+        elapsed_ms, imports = measure_once()
+        timings.append(elapsed_ms)
+        floor_timings.append(measure_once(FLOOR_CODE)[0])
+    median_ms = statistics.median(timings)
+    floor_ms = statistics.median(floor_timings)
+
+    top_level = sorted((i for i in imports if i[3] == 0), key=lambda i: i[2], reverse=True)
+    print(f"Time to first prompt: median {median_ms:.0f} ms over {args.runs} runs "
+          f"(min {min(timings):.0f} ms, max {max(timings):.0f} ms)")
+    print(f"Floor (python -c '{FLOOR_CODE}'): median {floor_ms:.0f} ms, startup adds {median_ms - floor_ms:.0f} ms")
+    print(f"Modules imported: {len(imports)}, total import time {sum(i[1] for i in imports) / 1000:.0f} ms")
+    print(f"Heaviest imports (cumulative ms):")
+    for name, _, cumulative_us, _ in top_level[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f}  {name}")
+
+    failures = []
+    if median_ms - floor_ms > args.overhead_ms:
+        failures.append(f"startup adds {median_ms - floor_ms:.0f} ms to the floor, over the {args.overhead_ms:.0f} ms allowed")
+    if args.threshold_ms is not None and median_ms > args.threshold_ms:
+        failures.append(f"median {median_ms:.0f} ms is over the {args.threshold_ms:.0f} ms threshold")
+    imported = {i[0] for i in imports}
+    for forbidden in FORBIDDEN_AT_STARTUP:
+        if any(name == forbidden or name.startswith(forbidden + ".") for name in imported):
+            failures.append(f"{forbidden} is imported before the first prompt")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
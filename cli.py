@@ -0,0 +1,447 @@
+"""
+Non-interactive command line for scripts and cron jobs.
+
+Every subcommand calls the same feature functions as the menu, without
+prompts, and prints either plain text or (with --json) one JSON document on
+stdout. Messages printed by the feature modules go to stderr in --json mode.
+
+    python main.py add --amount 250 --category Food --description "Lunch"
+    python main.py add --stdin < transactions.jsonl
+    python main.py balance --json
+    python main.py search "daraz ord*" --from 2025-03-01 --to 2025-03-31
+    python main.py export csv transactions.csv
+    python main.py export json food.json --category Food --from 2025-01-01
+    python main.py import statement.csv --profile debit_credit
+    python main.py backup
+    python main.py validate --json
+    python main.py report --month 2025-11
+    python main.py serve
+
+Exit codes: 0 success, 1 the command failed or found problems, 2 usage errors.
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+from contextlib import redirect_stdout
+from datetime import date, datetime
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+LEDGER_FILE = "database/transactions.txt"
+TRANSACTION_TYPES = ("expense", "income")
+# features.search.query filter names, as argparse dests
+QUERY_FILTERS = ("date_from", "date_to", "types", "categories", "min_paisa", "max_paisa", "text")
+DEFAULT_CATEGORY = "Other"
+
+# Column names accepted in bulk input, lowercased -> record field. The CSV
+# headers are the ones written by 'export csv', so an export can be re-added.
+FIELD_ALIASES = {
+    "date": "date",
+    "type": "type",
+    "category": "category",
+    "category_or_source": "category",
+    "category/source": "category",
+    "source": "category",
+    "description": "description",
+    "amount": "amount",
+    "amount_paisa": "amount_paisa",
+}
+
+
+class CommandError(Exception):
+    """A failure worth a one-line message rather than a traceback."""
+
+
+def _parse_amount(value) -> int:
+    """Rupees ("12.50", 12.5) -> paisa, rounded half up."""
+    try:
+        paisa = (Decimal(str(value).strip().replace(",", "")) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP)
+    except InvalidOperation:
+        raise ValueError(f"invalid amount '{value}'")
+    if paisa <= 0:
+        raise ValueError("amount must be a positive number")
+    return int(paisa)
+
+
+def _to_record(entry, default_type):
+    """
+    Validates one entry (a dict of FIELD_ALIASES keys) and converts it to a
+    ledger record. Raises ValueError with a message for bad entries.
+    """
+    fields = {FIELD_ALIASES[k.strip().lower()]: v for k, v in entry.items()
+              if k and k.strip().lower() in FIELD_ALIASES and v not in (None, "")}
+    kind = str(fields.get("type", default_type)).strip().lower()
+    if kind not in TRANSACTION_TYPES:
+        raise ValueError(f"invalid transaction type '{kind}'")
+    day = str(fields.get("date", date.today().isoformat())).strip()
+    try:
+        day = date.fromisoformat(day).isoformat()
+    except ValueError:
+        raise ValueError(f"invalid date '{day}', use YYYY-MM-DD")
+    if "amount_paisa" in fields:
+        try:
+            amount_paisa = int(fields["amount_paisa"])
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid amount_paisa '{fields['amount_paisa']}'")
+        if amount_paisa <= 0:
+            raise ValueError("amount must be a positive number")
+    elif "amount" in fields:
+        amount_paisa = _parse_amount(fields["amount"])
+    else:
+        raise ValueError("missing amount")
+    return {
+        "date": day,
+        "type": kind,
+        "category_or_source": str(fields.get("category", "")).strip(),
+        "description": str(fields.get("description", "")).strip(),
+        "amount_paisa": amount_paisa
+    }
+
+
+def _read_entries(stream):
+    """
+    Reads bulk entries from JSON lines or CSV (with a header row); the
+    format is taken from the first non-blank character.
+
+    Yields:
+        tuple: (line_number, entry dict, or an error message string)
+    """
+    text = stream.read()
+    if text.lstrip().startswith("{"):
+        for line_number, line in enumerate(text.splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, f"invalid JSON: {e.msg}"
+                continue
+            yield line_number, entry if isinstance(entry, dict) else "expected a JSON object"
+        return
+    reader = csv.DictReader(io.StringIO(text))
+    for entry in reader:
+        yield reader.line_num, entry
+
+
+def _watch_writes():
+    """Registers the listeners that raise budget and anomaly alerts for writes made in this process."""
+    from features.budgets import budget_alerts  # noqa: F401
+    from features.smart_assistant import anomaly  # noqa: F401
+
+
+def cmd_add(args):
+    from features.service import client
+
+    if args.stdin:
+        entries = _read_entries(sys.stdin)
+    else:
+        if args.amount is None:
+            raise CommandError("add needs --amount, or --stdin for bulk input")
+        entries = [(1, {"date": args.date, "type": args.type, "category": args.category,
+                        "description": args.description, "amount": args.amount})]
+
+    records, errors = [], []
+    for line_number, entry in entries:
+        if isinstance(entry, str):
+            errors.append({"line": line_number, "error": entry})
+            continue
+        try:
+            records.append(_to_record(entry, args.type))
+        except ValueError as e:
+            errors.append({"line": line_number, "error": str(e)})
+
+    if errors and not args.skip_invalid:
+        return {"added": 0, "errors": errors, "ok": False}, \
+            [f"line {e['line']}: {e['error']}" for e in errors] + \
+            [f"Nothing added: {len(errors)} invalid entries (use --skip-invalid to add the rest)"]
+
+    suggested = 0
+    for record in records:
+        if not record["category_or_source"]:
+            suggestion = client.call("assistant.suggest_category", ledger_path=LEDGER_FILE,
+                                     description=record["description"], kind=record["type"],
+                                     amount_paisa=record["amount_paisa"])
+            record["category_or_source"] = suggestion[0] if suggestion else DEFAULT_CATEGORY
+            suggested += suggestion is not None
+    if records:
+        _watch_writes()
+        # One locked append for the whole batch
+        client.call("ledger.append", path=LEDGER_FILE, records=records)
+
+    lines = [f"line {e['line']}: {e['error']} (skipped)" for e in errors]
+    lines.append(f"Added {len(records)} transactions" + (f" ({suggested} categories suggested)" if suggested else ""))
+    return {"added": len(records), "categorized": suggested, "errors": errors, "ok": True}, lines
+
+
+def cmd_balance(args):
+    from features.budgets import budget_engine
+    from features.service import client
+
+    if args.all:
+        months = client.call("budget.monthly_totals", ledger_path=LEDGER_FILE)
+        income = sum(t["income"] for t in months.values())
+        expense = sum(t["expense"] for t in months.values())
+        period = "all"
+    else:
+        period = args.month or budget_engine.current_month()
+        totals = client.call("budget.month_totals", ledger_path=LEDGER_FILE, month=period)
+        income, expense = totals["income"], totals["expense"]
+    result = {"period": period, "income_paisa": income, "expense_paisa": expense, "balance_paisa": income - expense}
+    label = "all time" if args.all else period
+    return result, [
+        f"Total Income ({label}): Rs {income / 100:.2f}",
+        f"Total Expenses ({label}): Rs {expense / 100:.2f}",
+        f"Current Balance ({label}): Rs {(income - expense) / 100:.2f}",
+    ]
+
+
+def _query_filters(args):
+    """The features.search.query filters given on the command line."""
+    return {key: getattr(args, key, None) for key in QUERY_FILTERS}
+
+
+def cmd_search(args):
+    from features.service import client
+
+    try:
+        result = client.call("ledger.query", ledger_path=LEDGER_FILE, filters=_query_filters(args), limit=args.limit)
+    except ValueError as e:
+        raise CommandError(str(e))
+    lines = [
+        f"{t.get('date', '')}  {t.get('type', ''):<7}  {t.get('category_or_source', t.get('category', ''))}: "
+        f"{t.get('description', '')}  Rs {int(t.get('amount_paisa', 0)) / 100:.2f}"
+        for t in result["transactions"]
+    ]
+    shown = f", showing the newest {len(result['transactions'])}" if result["total"] > len(result["transactions"]) else ""
+    lines.append(f"{result['total']} matches{shown}")
+    return {"filters": _query_filters(args), **result}, lines
+
+
+def cmd_export(args):
+    from features.data_management import data_management
+
+    write = data_management.write_transactions_csv if args.format == "csv" else data_management.write_transactions_json
+    try:
+        count = write(args.path, filters=_query_filters(args))
+    except OSError as e:
+        raise CommandError(f"could not write {args.path}: {e}")
+    except ValueError as e:
+        raise CommandError(str(e))
+    return {"format": args.format, "path": args.path, "exported": count}, \
+        [f"Exported {count} transactions to {args.path}"]
+
+
+def cmd_import(args):
+    from features.data_management import data_management
+
+    _watch_writes()
+
+    try:
+        result = data_management.import_statement(args.path, args.profile, args.include_ambiguous, args.dry_run)
+    except FileNotFoundError:
+        raise CommandError(f"file not found: {args.path}")
+    except ValueError as e:
+        raise CommandError(str(e))
+    result["errors"] = [{"row": row, "error": message} for row, message in result["errors"]]
+    lines = [f"row {e['row']}: {e['error']} (skipped)" for e in result["errors"][:20]]
+    lines.append(
+        f"{result['profile']}: {result['new']} new, {result['matched']} already in ledger, "
+        f"{result['ambiguous']} ambiguous; "
+        + (f"would import {result['new'] + (result['ambiguous'] if args.include_ambiguous else 0)}"
+           if args.dry_run else f"imported {result['imported']}")
+    )
+    return result, lines
+
+
+def cmd_backup(args):
+    from features.data_management import backup_store
+
+    manifest, stats = backup_store.create_snapshot()
+    removed, deleted_chunks = backup_store.prune_snapshots()
+    result = {
+        "id": manifest["id"],
+        "files": len(manifest["files"]),
+        "missing": stats["missing"],
+        "new_chunks": stats["new_chunks"],
+        "reused_chunks": stats["reused_chunks"],
+        "bytes_written": stats["bytes_written"],
+        "pruned_snapshots": len(removed),
+        "deleted_chunks": deleted_chunks
+    }
+    return result, [
+        f"Backup created: {manifest['id']} ({len(manifest['files'])} files, "
+        f"{stats['bytes_written'] / 1024:.1f} KB written)",
+    ] + ([f"Removed {len(removed)} old snapshots"] if removed else [])
+
+
+def cmd_validate(args):
+    from features.data_management import integrity
+
+    report = integrity.validate_database(max_samples=args.samples)
+    try:
+        integrity.write_report(report)
+    except OSError:
+        pass
+    lines = []
+    for path, result in report["files"].items():
+        issues = ", ".join(f"{kind}: {count}" for kind, count in result["issues"].items()) or "OK"
+        lines.append(f"{path} ({result['format']}, {result['records']} records): {issues}")
+    lines.append("No issues found" if report["ok"] else "Issues found")
+    return report, lines
+
+
+def cmd_report(args):
+    from features.data_management import data_management
+
+    report = data_management.build_monthly_report(args.month)
+    if report is None:
+        raise CommandError("no data to generate a monthly report")
+    summary = report["summary"]
+    lines = [
+        f"Report for {report['month']}",
+        f"  Income:   Rs {summary['total_income']}",
+        f"  Expenses: Rs {summary['total_expenses']}",
+        f"  Net:      Rs {summary['net_balance']}",
+    ]
+    for category, budget in report["budget_performance"].items():
+        lines.append(f"  {category}: Rs {budget['spent']} of Rs {budget['budgeted']} "
+                     f"({budget['utilization_percent']}, {budget['status']})")
+    return report, lines
+
+
+def cmd_serve(args):
+    from features.service import daemon
+
+    print(f"Ledger service listening on {args.socket} (Ctrl+C to stop)", file=sys.stderr)
+    try:
+        daemon.serve(args.socket, warm=not args.no_warm)
+    except RuntimeError as e:
+        raise CommandError(str(e))
+    except KeyboardInterrupt:
+        pass
+    return {"socket": args.socket, "stopped": True}, ["Ledger service stopped"]
+
+
+def _day(text):
+    try:
+        datetime.strptime(text, "%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date '{text}', use YYYY-MM-DD")
+    return text
+
+
+def _amount(text):
+    try:
+        return _parse_amount(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _month(text):
+    try:
+        datetime.strptime(text, "%Y-%m")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid month '{text}', use YYYY-MM")
+    return text
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="hisaab", description="HisaabX finance tracker (run without arguments for the menu).")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--json", action="store_true", help="print the result as JSON")
+    commands = parser.add_subparsers(dest="command", required=True, metavar="command")
+
+    add = commands.add_parser("add", parents=[common], help="add transactions")
+    add.add_argument("--amount", help="amount in rupees, e.g. 12.50")
+    add.add_argument("--type", choices=TRANSACTION_TYPES, default="expense")
+    add.add_argument("--category", help="category or income source (suggested if left out)")
+    add.add_argument("--description", default="")
+    add.add_argument("--date", help="YYYY-MM-DD, default today")
+    add.add_argument("--stdin", action="store_true",
+                     help="read many transactions from stdin as JSON lines or CSV with a header row")
+    add.add_argument("--skip-invalid", action="store_true",
+                     help="add the valid entries even if some are invalid (default: add nothing)")
+    add.set_defaults(handler=cmd_add)
+
+    balance = commands.add_parser("balance", parents=[common], help="income, expenses and balance")
+    period = balance.add_mutually_exclusive_group()
+    period.add_argument("--month", type=_month, help="YYYY-MM, default this month")
+    period.add_argument("--all", action="store_true", help="all time")
+    balance.set_defaults(handler=cmd_balance)
+
+    # Filters of features.search.query, shared by search and export
+    filters = argparse.ArgumentParser(add_help=False)
+    filters.add_argument("--from", dest="date_from", type=_day, metavar="YYYY-MM-DD", help="first date, YYYY-MM-DD")
+    filters.add_argument("--to", dest="date_to", type=_day, metavar="YYYY-MM-DD", help="last date, YYYY-MM-DD")
+    filters.add_argument("--type", dest="types", action="append", choices=TRANSACTION_TYPES)
+    filters.add_argument("--category", dest="categories", action="append", metavar="CATEGORY",
+                         help="category or income source (repeat for several)")
+    filters.add_argument("--min", dest="min_paisa", type=_amount, metavar="AMOUNT", help="smallest amount in rupees")
+    filters.add_argument("--max", dest="max_paisa", type=_amount, metavar="AMOUNT", help="largest amount in rupees")
+
+    search = commands.add_parser("search", parents=[common, filters], help="find transactions by description or category")
+    search.add_argument("text", metavar="query",
+                        help="words that must all match; end a word with * to match words starting with it")
+    search.add_argument("--limit", type=int, default=100, help="transactions to list, newest first")
+    search.set_defaults(handler=cmd_search)
+
+    export = commands.add_parser("export", parents=[common, filters], help="export transactions (all, or filtered)")
+    export.add_argument("format", choices=("csv", "json"))
+    export.add_argument("path")
+    export.add_argument("--search", dest="text", help="description words, as for search")
+    export.set_defaults(handler=cmd_export)
+
+    import_ = commands.add_parser("import", parents=[common], help="import a CSV export or bank statement")
+    import_.add_argument("path")
+    import_.add_argument("--profile", help="statement format name (see bank_profiles), detected if left out")
+    import_.add_argument("--include-ambiguous", action="store_true",
+                         help="also import rows that may already be in the ledger")
+    import_.add_argument("--dry-run", action="store_true", help="report without writing")
+    import_.set_defaults(handler=cmd_import)
+
+    backup = commands.add_parser("backup", parents=[common], help="create a backup snapshot")
+    backup.set_defaults(handler=cmd_backup)
+
+    validate = commands.add_parser("validate", parents=[common], help="check every data file")
+    validate.add_argument("--samples", type=int, default=0, help="problem lines to sample per file")
+    validate.set_defaults(handler=cmd_validate)
+
+    report = commands.add_parser("report", parents=[common], help="monthly report with budget performance")
+    report.add_argument("--month", type=_month, help="YYYY-MM, default this month")
+    report.set_defaults(handler=cmd_report)
+
+    serve = commands.add_parser("serve", parents=[common],
+                                help="keep ledgers warm in memory and answer queries on a Unix socket")
+    serve.add_argument("--socket", default="database/.hisaabd.sock", help="socket path")
+    serve.add_argument("--no-warm", action="store_true", help="load ledgers on first use instead of at start")
+    serve.set_defaults(handler=cmd_serve)
+    return parser
+
+
+def main(argv=None):
+    """Runs one subcommand. Returns the process exit code."""
+    args = build_parser().parse_args(argv)
+    try:
+        if args.json:
+            # Anything the feature modules print must not corrupt the JSON
+            with redirect_stdout(sys.stderr):
+                result, lines = args.handler(args)
+        else:
+            result, lines = args.handler(args)
+    except CommandError as e:
+        if args.json:
+            print(json.dumps({"ok": False, "error": str(e)}))
+        else:
+            print(f"hisaab {args.command}: {e}", file=sys.stderr)
+        return 1
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print("\n".join(lines))
+    return 0 if result.get("ok", True) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,8 +8,24 @@ import hashlib
 import base64
 from PIL import Image
 import io
+import sys
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# `streamlit run day-7/dashboard.py` only puts day-7/ on the import path;
+# add the project root so the shared feature modules can be imported.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from features.budgets import budget_alerts, budget_engine, budget_repository
+from features.categorization import classifier
+from features.data_management.backup_scheduler import start_background_backups
+from features.diagnostics import instrumentation, profiler
+from features.ledger import ledger
+from features.service import client, frame_cache, store
+# anomaly registers its write listener on import: the dashboard's own writes
+# then raise spending alerts even when no ledger service is running
+from features.smart_assistant import anomaly, forecast, recurring  # noqa: F401
 
 print("--- Reloading Dashboard ---")
+instrumentation.set_process("dashboard")
 
 # Page Configuration
 st.set_page_config(
@@ -63,17 +79,18 @@ st.markdown("""
         align-items: center;
         padding: 10px 0 30px 0;
     }
-    .search-bar {
+    .st-key-tx_search {
+        max-width: 300px;
+    }
+    .st-key-tx_search div[data-baseweb="input"] {
         background: white;
-        padding: 10px 20px;
         border-radius: 30px;
         box-shadow: var(--shadow-soft);
         border: 1px solid var(--glass-border);
-        width: 300px;
-        color: var(--text-light);
-        display: flex;
-        align-items: center;
-        gap: 10px;
+    }
+    .st-key-tx_search input {
+        background: white;
+        padding: 10px 20px;
     }
     .profile-pill {
         background: white;
@@ -241,8 +258,15 @@ st.markdown("""
 
 # --- Constants & Setup ---
 USERS_FILE = "database/users.txt"
+# Comma-separated usernames who get the Diagnostics page. Its timings, memory
+# use and profiler settings cover every session of the server, so the page is
+# for whoever runs the server, not for any visitor
+ADMIN_USERS_ENV_VAR = "HISAAB_ADMIN_USERS"
 os.makedirs("database", exist_ok=True)
 
+# Periodic incremental backups of every file in database/, on a background thread
+start_background_backups()
+
 EXPENSE_CATEGORIES = ["Food", "Transport", "Shopping", "Bills", "Entertainment", "Health", "Other"]
 INCOME_SOURCES = ["Salary", "Freelance", "Business", "Investment", "Gift", "Other"]
 
@@ -369,13 +393,7 @@ def load_user_settings():
     if 'username' not in st.session_state:
         return {}
     settings_file = f"database/settings_{st.session_state.username}.json"
-    if not os.path.exists(settings_file):
-        return {}
-    try:
-        with open(settings_file, "r") as f:
-            return json.load(f)
-    except:
-        return {}
+    return dict(store.run(store.read_json(settings_file, {})) or {})
 
 def save_user_settings(settings):
     if 'username' not in st.session_state:
@@ -384,34 +402,64 @@ def save_user_settings(settings):
     with open(settings_file, "w") as f:
         json.dump(settings, f)
 
+@instrumentation.timed("dashboard.transactions_frame", rows=len)
+def _transactions_frame(snapshot):
+    """DataFrame of a ledger snapshot, indexed by each record's line position."""
+    if not snapshot:
+        return pd.DataFrame()
+    # Positions are line indexes in the file, used by edit/delete, and stay
+    # correct even when a damaged line is skipped
+    pairs = [(position, t) for position, t in zip(snapshot["positions"], snapshot["records"]) if "amount_paisa" in t]
+    if not pairs:
+        return pd.DataFrame()
+    # Snapshots can be shared with other sessions, so the records themselves are not modified
+    df = pd.DataFrame([t for _, t in pairs], index=[position for position, _ in pairs])
+    df["amount"] = df["amount_paisa"] / 100
+    df["date"] = pd.to_datetime(df["date"])
+    return df
+
+def _budgets_frame(budgets):
+    if not budgets:
+        return pd.DataFrame()
+    return pd.DataFrame([{"Category": cat, "Budget": paisa / 100} for cat, paisa in budgets.items()])
+
+def _session_id():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else None
+
+def _read_ledger(user_file):
+    try:
+        return client.call("ledger.records", path=user_file, with_positions=True)
+    except OSError:
+        return None
+
+def _ledger_frame(user_file, session_id):
+    """
+    The transactions DataFrame of a ledger, shared by every session viewing
+    it (see features.service.frame_cache): read-only, derive new frames by
+    filtering or assign() instead of modifying it.
+    """
+    return frame_cache.get_or_build(("transactions", user_file), frame_cache.file_version(user_file),
+                                    lambda: _transactions_frame(_read_ledger(user_file)), session_id)
+
+def _query_frame(df, filters):
+    """
+    The rows of the user's transactions frame that match filters (see
+    features.search.query), newest first; the ledger index picks them
+    instead of masking every row.
+    """
+    if df.empty or not any(filters.values()):
+        return df
+    positions = client.call("ledger.query_positions",
+                            ledger_path=f"database/transactions_{st.session_state.username}.txt", filters=filters)
+    return df.loc[pd.Index(positions).intersection(df.index, sort=False)]
+
 def load_transactions():
     if 'username' not in st.session_state:
         return pd.DataFrame()
     
     user_file = f"database/transactions_{st.session_state.username}.txt"
-    transactions = []
-    if not os.path.exists(user_file):
-        return pd.DataFrame()
-    try:
-        with open(user_file, "r") as f:
-            for line in f:
-                line = line.strip()
-                if line:
-                    try:
-                        t = json.loads(line)
-                        t["amount"] = t["amount_paisa"] / 100
-                        transactions.append(t)
-                    except:
-                        continue
-    except:
-        return pd.DataFrame()
-        
-    if not transactions:
-        return pd.DataFrame()
-        
-    df = pd.DataFrame(transactions)
-    df["date"] = pd.to_datetime(df["date"])
-    return df
+    return _ledger_frame(user_file, _session_id())
 
 def save_transaction(date, type_, category, description, amount):
     if 'username' not in st.session_state:
@@ -425,48 +473,44 @@ def save_transaction(date, type_, category, description, amount):
         "description": description,
         "amount_paisa": int(amount * 100)
     }
-    with open(user_file, "a") as f:
-        f.write(json.dumps(t) + "\n")
+    store.run(store.append(user_file, [t]))
 
 def load_budgets():
     if 'username' not in st.session_state:
         return pd.DataFrame()
         
-    user_file = f"database/budgets_{st.session_state.username}.txt"
-    budgets = []
-    if not os.path.exists(user_file):
-        return pd.DataFrame()
-        
-    try:
-        with open(user_file, "r") as f:
-            for line in f:
-                if "," in line:
-                    cat, limit = line.strip().split(",")
-                    budgets.append({"Category": cat, "Budget": float(limit)})
-    except:
-        return pd.DataFrame()
-        
-    return pd.DataFrame(budgets)
+    return _budgets_frame(store.run(store.call("budget.load", username=st.session_state.username)))
+
+@instrumentation.timed("dashboard.load_user_data")
+def load_user_data():
+    """
+    Loads the signed-in user's settings, transactions and budgets for a rerun.
+
+    The three loads run concurrently instead of one after another, and
+    other sessions reading the same user's files at the same moment share
+    the reads (see features.service.store). The transactions DataFrame is
+    shared with them too, and is read-only.
+
+    Returns:
+        tuple: (settings dict, transactions DataFrame, budgets DataFrame)
+    """
+    if 'username' not in st.session_state:
+        return {}, pd.DataFrame(), pd.DataFrame()
+    u = st.session_state.username
+    settings, df, budgets = store.gather(
+        store.read_json(f"database/settings_{u}.json", {}),
+        store.offload(_ledger_frame, f"database/transactions_{u}.txt", _session_id()),
+        store.call("budget.load", username=u)
+    )
+    return dict(settings or {}), df, _budgets_frame(budgets)
 
 def save_budget(category, limit):
     if 'username' not in st.session_state:
         return
         
-    user_file = f"database/budgets_{st.session_state.username}.txt"
-    # Load existing to update or append
-    budgets = {}
-    if os.path.exists(user_file):
-        with open(user_file, "r") as f:
-            for line in f:
-                if "," in line:
-                    c, l = line.strip().split(",")
-                    budgets[c] = float(l)
-    
-    budgets[category] = limit
-    
-    with open(user_file, "w") as f:
-        for c, l in budgets.items():
-            f.write(f"{c},{l}\n")
+    # Replaces the category's limit from today on; past months keep the old one
+    store.run(store.call("budget.set", category=category, amount_paisa=int(round(limit * 100)),
+                         username=st.session_state.username))
 
 def delete_transaction(index):
     if 'username' not in st.session_state:
@@ -484,9 +528,7 @@ def delete_transaction(index):
         if 0 <= index < len(transactions):
             transactions.pop(index)
             
-        with open(user_file, "w") as f:
-            for t in transactions:
-                f.write(t + "\n")
+        store.run(store.rewrite(user_file, transactions))
     except:
         pass
 
@@ -494,24 +536,7 @@ def delete_budget(category):
     if 'username' not in st.session_state:
         return
         
-    user_file = f"database/budgets_{st.session_state.username}.txt"
-    if not os.path.exists(user_file):
-        return
-        
-    lines = []
-    try:
-        with open(user_file, "r") as f:
-            for line in f:
-                if "," in line:
-                    c, l = line.strip().split(",")
-                    if c != category:
-                        lines.append(line.strip())
-        
-        with open(user_file, "w") as f:
-            for line in lines:
-                f.write(line + "\n")
-    except:
-        pass
+    store.run(store.call("budget.delete", category=category, username=st.session_state.username))
 
 def edit_transaction(index, new_data):
     if 'username' not in st.session_state:
@@ -528,18 +553,18 @@ def edit_transaction(index, new_data):
             
         if 0 <= index < len(transactions):
             # Update the specific transaction
-            t = json.loads(transactions[index])
+            t = ledger.decode_line(transactions[index])
+            if t is None:
+                return
             t.update(new_data)
             # Ensure amount_paisa is updated if amount changed
             if "amount" in new_data:
                 t["amount_paisa"] = int(new_data["amount"] * 100)
                 del t["amount"] # Don't store float in file
             
-            transactions[index] = json.dumps(t)
+            transactions[index] = ledger.encode_record(t)
             
-        with open(user_file, "w") as f:
-            for t in transactions:
-                f.write(t + "\n")
+        store.run(store.rewrite(user_file, transactions))
     except:
         pass
 
@@ -554,7 +579,7 @@ def get_user_files():
     u = st.session_state.username
     return (
         f"database/transactions_{u}.txt",
-        f"database/budgets_{u}.txt",
+        budget_repository.store_path(u),
         f"database/settings_{u}.json"
     )
 
@@ -584,11 +609,22 @@ if 'auth_mode' not in st.session_state:
     st.session_state.auth_mode = "Login"
 if 'onboarding_step' not in st.session_state:
     st.session_state.onboarding_step = 1
+# Saved with the profile of a slow rerun, to know what the user was looking at
+PROFILE_CONTEXT_KEYS = ["page", "username", "analytics_date_range", "analytics_types", "analytics_categories"]
+
+def _rerun_context():
+    return {key: st.session_state[key] for key in PROFILE_CONTEXT_KEYS if key in st.session_state}
 
 def navigate_to(page_name):
     st.session_state.page = page_name
     st.rerun()
 
+
+def _is_admin():
+    """True if the logged-in user is listed in HISAAB_ADMIN_USERS."""
+    admins = {name.strip() for name in os.environ.get(ADMIN_USERS_ENV_VAR, "").split(",") if name.strip()}
+    return st.session_state.get("logged_in", False) and st.session_state.get("username") in admins
+
 # --- Helper Functions ---
 
 def get_img_as_base64(file):
@@ -795,7 +831,9 @@ def main():
         return
 
     # --- Onboarding Flow ---
-    settings = load_user_settings()
+    # Settings, transactions and budgets are loaded together once per rerun;
+    # every write below is followed by st.rerun(), so they never go stale
+    settings, user_df, user_budgets_df = load_user_data()
     if not settings.get("setup_complete", False):
         c1, c2, c3 = st.columns([1, 2, 1])
         with c2:
@@ -868,6 +906,10 @@ def main():
 
     # --- Main Dashboard (Logged In & Onboarded) ---
     symbol = settings.get("symbol", "₹")
+
+    # Budget thresholds crossed by saves since the last run
+    for event in budget_alerts.pop_alerts(f"database/transactions_{st.session_state.username}.txt"):
+        st.toast(budget_alerts.format_alert(event, symbol), icon="🚨" if event.get("threshold", 0) >= 100 else "⚠️")
     
     # Sidebar
     with st.sidebar:
@@ -882,6 +924,8 @@ def main():
             "Budgets": "🎯",
             "Settings": "⚙️"
         }
+        if _is_admin():
+            menu_items["Diagnostics"] = "🩺"
         
         for item, icon in menu_items.items():
             if st.button(f"{icon} {item}", use_container_width=True, type="primary" if st.session_state.page == item else "secondary"):
@@ -889,6 +933,7 @@ def main():
         
         st.markdown("<br>", unsafe_allow_html=True)
         if st.button("🚪 Logout", use_container_width=True):
+            frame_cache.forget_session(_session_id())
             st.session_state.logged_in = False
             st.session_state.onboarding_step = 1
             st.rerun()
@@ -899,11 +944,9 @@ def main():
     # --- Top Bar ---
     c_search, c_profile = st.columns([4, 1])
     with c_search:
-        st.markdown("""
-        <div class="search-bar">
-            <span>🔍</span> Search transactions...
-        </div>
-        """, unsafe_allow_html=True)
+        # Results are listed on the Transactions page
+        st.text_input("Search transactions", key="tx_search", placeholder="🔍 Search transactions...",
+                      label_visibility="collapsed", on_change=lambda: st.session_state.update(page="Transactions"))
     with c_profile:
         st.markdown(f"""
         <div class="profile-pill" style="justify-content: center;">
@@ -916,8 +959,8 @@ def main():
 
     # --- Dashboard ---
     if st.session_state.page == "Dashboard":
-        df = load_transactions()
-        budgets_df = load_budgets()
+        df = user_df
+        budgets_df = user_budgets_df
         
         now = datetime.now()
         current_month_df = df[(df["date"].dt.month == now.month) & (df["date"].dt.year == now.year)] if not df.empty else pd.DataFrame()
@@ -1023,12 +1066,42 @@ def main():
 
         with col_right:
             st.subheader("Insights")
+            user_file = f"database/transactions_{st.session_state.username}.txt"
+            if not current_month_df.empty:
+                month_forecast = client.call("assistant.forecast", ledger_path=user_file)
+                projected = month_forecast["total"][month_forecast["model"]] / 100
+                projected_balance = month_forecast["balance"]["projected"] / 100
+                st.markdown(f"""
+                <div style="background: #eff6ff; padding: 15px; border-radius: 16px; border: 1px solid #dbeafe; margin-bottom: 10px;">
+                    <div style="color: #2563eb; font-weight: 600; margin-bottom: 5px;">📈 Month-end Forecast</div>
+                    <div style="font-size: 0.9rem; color: #1e3a8a;">Spending: {symbol}{projected:,.0f}</div>
+                    <div style="font-size: 0.9rem; color: #1e3a8a;">Balance: {symbol}{projected_balance:,.0f}</div>
+                </div>
+                """, unsafe_allow_html=True)
+                # Expenses far outside their category's usual range this month
+                for flagged in client.call("assistant.flagged", ledger_path=user_file, month=now.strftime("%Y-%m"))[:3]:
+                    st.markdown(f"""
+                    <div style="background: #f5f3ff; padding: 15px; border-radius: 16px; border: 1px solid #ede9fe; margin-bottom: 10px;">
+                        <div style="color: #7c3aed; font-weight: 600; margin-bottom: 5px;">🔍 Unusual {flagged['category']} expense</div>
+                        <div style="font-size: 0.9rem; color: #4c1d95;">{symbol}{flagged['amount_paisa'] / 100:,.0f} on {flagged['date']} (usually under {symbol}{flagged['quantile'] / 100:,.0f})</div>
+                    </div>
+                    """, unsafe_allow_html=True)
+            # Subscriptions and bills expected in the next week
+            for series in client.call("assistant.upcoming", ledger_path=user_file, days=7)[:3]:
+                st.markdown(f"""
+                <div style="background: #f0fdf4; padding: 15px; border-radius: 16px; border: 1px solid #dcfce7; margin-bottom: 10px;">
+                    <div style="color: #16a34a; font-weight: 600; margin-bottom: 5px;">🔁 {series['description']} due</div>
+                    <div style="font-size: 0.9rem; color: #14532d;">{symbol}{series['amount_paisa'] / 100:,.0f} ({series['period']}) expected on {series['next_date']}</div>
+                </div>
+                """, unsafe_allow_html=True)
             # Budget Warnings
             if not budgets_df.empty and not current_month_df.empty:
-                for _, row in budgets_df.iterrows():
-                    cat = row["Category"]
-                    limit = row["Budget"]
-                    spent = current_month_df[(current_month_df["type"] == "expense") & (current_month_df["category"] == cat)]["amount"].sum()
+                budget_limits = client.call("budget.load", username=st.session_state.username)
+                for status in client.call("budget.evaluate", budgets=budget_limits, ledger_path=user_file,
+                                          warning_percent=80):
+                    cat = status["category"]
+                    limit = status["budget_paisa"] / 100
+                    spent = status["spent_paisa"] / 100
                     
                     if spent > limit:
                         st.markdown(f"""
@@ -1040,8 +1113,8 @@ def main():
                             </div>
                         </div>
                         """, unsafe_allow_html=True)
-                    elif spent > limit * 0.8:
-                        pct = (spent/limit)*100
+                    elif status["status"] != budget_engine.STATUS_OK:
+                        pct = status["utilization_percent"]
                         st.markdown(f"""
                         <div style="background: #fffbeb; padding: 15px; border-radius: 16px; border: 1px solid #fef3c7; margin-bottom: 10px;">
                             <div style="color: #d97706; font-weight: 600; margin-bottom: 5px;">⚠️ {cat} Warning</div>
@@ -1051,7 +1124,15 @@ def main():
                             </div>
                         </div>
                         """, unsafe_allow_html=True)
-            else:
+                # Under budget today, but on pace to go over by month end
+                for cat, projected_paisa, limit_paisa in forecast.likely_overspend(month_forecast, budget_limits):
+                    st.markdown(f"""
+                    <div style="background: #fffbeb; padding: 15px; border-radius: 16px; border: 1px solid #fef3c7; margin-bottom: 10px;">
+                        <div style="color: #d97706; font-weight: 600; margin-bottom: 5px;">🔮 {cat} Forecast</div>
+                        <div style="font-size: 0.9rem; color: #78350f;">On pace for {symbol}{projected_paisa / 100:,.0f} of {symbol}{limit_paisa / 100:,.0f}</div>
+                    </div>
+                    """, unsafe_allow_html=True)
+            elif current_month_df.empty:
                 st.markdown("""
                 <div style="background: white; padding: 20px; border-radius: 20px; text-align: center; box-shadow: var(--shadow-soft);">
                     <div style="font-size: 2rem;">✨</div>
@@ -1063,25 +1144,45 @@ def main():
     elif st.session_state.page == "Transactions":
         st.title("📝 Transactions")
         with st.expander("➕ Add New", expanded=True):
+            # Type and description live outside the form so changing them
+            # reruns the page: the category list follows the type, and a
+            # category is suggested from the description
+            c1, c2 = st.columns(2)
+            with c1:
+                type_ = st.selectbox("Type", ["expense", "income"], index=0 if st.session_state.get('default_type') == 'expense' else 1)
+            with c2:
+                desc = st.text_input("Description", key="new_tx_desc")
+            opts = EXPENSE_CATEGORIES if type_ == "expense" else INCOME_SOURCES
+            cat_index = opts.index(st.session_state.default_cat) if 'default_cat' in st.session_state and st.session_state.default_cat in opts else 0
+            suggestion = client.call(
+                "assistant.suggest_category", ledger_path=f"database/transactions_{st.session_state.username}.txt",
+                description=desc, kind=type_, username=st.session_state.username
+            )
+            if suggestion and suggestion[0] in opts and 'default_cat' not in st.session_state:
+                cat_index = opts.index(suggestion[0])
+                how = "your category rules" if suggestion[2] == classifier.SOURCE_RULE else f"your history, {suggestion[1]:.0%} sure"
+                st.caption(f"💡 Suggested category: {suggestion[0]} ({how})")
             with st.form("add_tx"):
                 c1, c2 = st.columns(2)
                 with c1:
                     date = st.date_input("Date", datetime.now())
-                    type_ = st.selectbox("Type", ["expense", "income"], index=0 if st.session_state.get('default_type') == 'expense' else 1)
-                with c2:
-                    opts = EXPENSE_CATEGORIES if type_ == "expense" else INCOME_SOURCES
-                    cat = st.selectbox("Category", opts, index=opts.index(st.session_state.default_cat) if 'default_cat' in st.session_state and st.session_state.default_cat in opts else 0)
                     amt = st.number_input(f"Amount ({symbol})", min_value=1.0, step=10.0)
-                desc = st.text_input("Description")
+                with c2:
+                    cat = st.selectbox("Category", opts, index=cat_index)
                 if st.form_submit_button("Save", use_container_width=True):
                     save_transaction(date, type_, cat, desc, amt)
                     st.success("Saved!")
                     if 'default_type' in st.session_state: del st.session_state['default_type']
                     if 'default_cat' in st.session_state: del st.session_state['default_cat']
+                    del st.session_state['new_tx_desc']
                     st.rerun()
         
         st.markdown("### History")
-        df = load_transactions()
+        df = user_df
+        query = st.session_state.get("tx_search", "").strip()
+        if query and not df.empty and 'editing_tx' not in st.session_state:
+            df = _query_frame(df, {"text": query})
+            st.caption(f"🔍 {len(df):,} transactions match '{query}'")
         
         # Edit Mode Handling
         if 'editing_tx' in st.session_state:
@@ -1159,32 +1260,26 @@ def main():
                 # Date Range (Default to current month)
                 today = datetime.now()
                 start_of_month = today.replace(day=1)
-                date_range = st.date_input("Date Range", [start_of_month, today])
+                date_range = st.date_input("Date Range", [start_of_month, today], key="analytics_date_range")
             with c2:
                 # Account/Type Filter
-                tx_type = st.multiselect("Transaction Type", ["income", "expense"], default=["income", "expense"])
+                tx_type = st.multiselect("Transaction Type", ["income", "expense"], default=["income", "expense"],
+                                         key="analytics_types")
             with c3:
                 # Category Filter
                 all_cats = EXPENSE_CATEGORIES + INCOME_SOURCES
-                selected_cats = st.multiselect("Categories", all_cats, default=all_cats)
+                selected_cats = st.multiselect("Categories", all_cats, default=all_cats, key="analytics_categories")
         
         # Filter Data
-        df = load_transactions()
-        if not df.empty:
-            # Date Filter
-            if len(date_range) == 2:
-                df = df[(df["date"].dt.date >= date_range[0]) & (df["date"].dt.date <= date_range[1])]
-            
-            # Type Filter
-            if tx_type:
-                df = df[df["type"].isin(tx_type)]
-                
-            # Category Filter
-            if selected_cats:
-                df = df[df["category"].isin(selected_cats)]
+        df = _query_frame(user_df, {
+            "date_from": date_range[0].isoformat() if len(date_range) == 2 else None,
+            "date_to": date_range[1].isoformat() if len(date_range) == 2 else None,
+            "types": tx_type,
+            "categories": selected_cats
+        })
         
         # --- Tabs ---
-        tab1, tab2, tab3 = st.tabs(["📊 Reports", "📈 Balance Trend", "💰 Cash Flow"])
+        tab1, tab2, tab3, tab4 = st.tabs(["📊 Reports", "📈 Balance Trend", "💰 Cash Flow", "🔁 Recurring"])
         
         with tab1:
             st.subheader("Incomes & Expenses Report")
@@ -1257,8 +1352,8 @@ def main():
             st.subheader("Balance Trend")
             if not df.empty:
                 # Daily Balance Calculation
-                daily_df = df.copy()
-                daily_df["signed_amount"] = daily_df.apply(lambda x: x["amount"] if x["type"] == "income" else -x["amount"], axis=1)
+                # A new frame sharing df's columns: df itself is shared and read-only
+                daily_df = df.assign(signed_amount=df["amount"].where(df["type"] == "income", -df["amount"]))
                 daily_trend = daily_df.groupby("date")["signed_amount"].sum().cumsum().reset_index()
                 
                 st.line_chart(daily_trend, x="date", y="signed_amount", color="#667eea")
@@ -1274,6 +1369,31 @@ def main():
             else:
                 st.info("No data available.")
 
+        with tab4:
+            st.subheader("Recurring Payments & Subscriptions")
+            # Detected from the whole ledger, so the filters above do not apply
+            series_list = client.call(
+                "assistant.recurring", ledger_path=f"database/transactions_{st.session_state.username}.txt", kind=None
+            )
+            if series_list:
+                monthly_out = sum(recurring.monthly_cost(item) for item in series_list if item["type"] == "expense") / 100
+                monthly_in = sum(recurring.monthly_cost(item) for item in series_list if item["type"] == "income") / 100
+                c1, c2 = st.columns(2)
+                c1.metric("Recurring Expenses / Month", f"{symbol}{monthly_out:,.2f}")
+                c2.metric("Recurring Income / Month", f"{symbol}{monthly_in:,.2f}")
+                st.dataframe(pd.DataFrame([{
+                    "Description": item["description"],
+                    "Category": item["category"],
+                    "Type": item["type"].title(),
+                    "Every": item["period"].title(),
+                    "Amount": f"{symbol}{item['amount_paisa'] / 100:,.2f}",
+                    "Last": item["last_date"],
+                    "Next": item["next_date"],
+                    "Seen": item["occurrences"]
+                } for item in series_list]), use_container_width=True, hide_index=True)
+            else:
+                st.info("No recurring payments found yet.")
+
     elif st.session_state.page == "Budgets":
         st.title("🎯 Budgets")
         with st.form("bud_form"):
@@ -1285,7 +1405,7 @@ def main():
                 st.rerun()
         
         st.markdown("### Active Budgets")
-        bdf = load_budgets()
+        bdf = user_budgets_df
         
         # Edit Mode Handling
         if 'editing_budget' in st.session_state:
@@ -1327,6 +1447,21 @@ def main():
                     st.rerun()
                 st.markdown("---")
 
+        with st.expander("📅 Budget vs Actual History"):
+            rows = client.call("budget.vs_actual", ledger_path=f"database/transactions_{st.session_state.username}.txt",
+                               username=st.session_state.username)
+            if rows:
+                hdf = pd.DataFrame(rows)
+                hdf["Budget"] = hdf["budget_paisa"] / 100
+                hdf["Spent"] = hdf["spent_paisa"] / 100
+                hdf["Used %"] = hdf["utilization_percent"].round(1)
+                st.dataframe(
+                    hdf[["month", "category", "Budget", "Spent", "Used %", "status"]].rename(columns={"month": "Month", "category": "Category", "status": "Status"}),
+                    hide_index=True, use_container_width=True
+                )
+            else:
+                st.caption("No budget history yet.")
+
     elif st.session_state.page == "Settings":
         st.title("⚙️ Settings")
         
@@ -1380,5 +1515,102 @@ def main():
             time.sleep(0.5)
             st.rerun()
 
+    elif st.session_state.page == "Diagnostics" and _is_admin():
+        st.title("🩺 Diagnostics")
+        st.caption("Where this dashboard server's time goes: every session is counted. Times include nested calls.")
+
+        timing_on = st.toggle("Record timings", value=instrumentation.enabled())
+        if timing_on != instrumentation.enabled():
+            if timing_on:
+                instrumentation.enable()
+            else:
+                instrumentation.disable()
+            st.rerun()
+
+        sources = {}
+        local = instrumentation.snapshot()
+        if local:
+            sources[instrumentation.process()] = local
+        service = client.call("service.metrics") if client.service_running() else None
+        if service and service["entries"]:
+            sources["service"] = service["entries"]
+
+        if not sources:
+            st.info("Nothing recorded yet. Use the app with timings on, then come back.")
+        for process, entries in sources.items():
+            st.markdown(f"### {'Ledger service' if process == 'service' else 'This server'}")
+            tdf = pd.DataFrame(entries)
+            tdf["Mean ms"] = tdf["wall_s"] * 1000 / tdf["calls"]
+            tdf["Total ms"] = tdf["wall_s"] * 1000
+            tdf["CPU ms"] = tdf["cpu_s"] * 1000
+            tdf["Slowest ms"] = tdf["max_wall_s"] * 1000
+            st.dataframe(
+                tdf[["name", "calls", "Total ms", "Mean ms", "CPU ms", "Slowest ms", "rows"]]
+                    .rename(columns={"name": "Function", "calls": "Calls", "rows": "Rows"}),
+                hide_index=True, use_container_width=True
+            )
+
+        c1, c2 = st.columns(2)
+        with c1:
+            st.download_button("⬇️ Prometheus metrics", instrumentation.prometheus_text(sources),
+                               file_name="hisaab_metrics.prom", mime="text/plain",
+                               disabled=not sources, use_container_width=True)
+        with c2:
+            if st.button("Reset timings", use_container_width=True):
+                instrumentation.reset()
+                st.rerun()
+
+        st.markdown("### Memory")
+        usage = frame_cache.usage()
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Shared frames", f"{usage['total_bytes'] / 2**20:,.1f} MB",
+                  help=f"Limit {usage['budget_bytes'] / 2**20:,.0f} MB ({frame_cache.BUDGET_ENV_VAR})")
+        c2.metric("Hits / misses", f"{usage['hits']:,} / {usage['misses']:,}")
+        c3.metric("Evictions", f"{usage['evictions']:,}")
+        # Other sessions and users stay anonymous, as in profile captures
+        own_session = _session_id()
+        own_file = f"database/transactions_{st.session_state.username}.txt"
+        if usage["sessions"]:
+            st.dataframe(pd.DataFrame([
+                {"Session": "This session" if s["session"] == own_session else f"Session {i}",
+                 "Frames": s["frames"], "MB used": s["bytes"] / 2**20,
+                 "MB only this session": s["exclusive_bytes"] / 2**20, "Idle s": round(s["idle_s"])}
+                for i, s in enumerate(usage["sessions"], 1)
+            ]), hide_index=True, use_container_width=True)
+        if usage["entries"]:
+            st.dataframe(pd.DataFrame([
+                {"Frame": f"{e['key'][0]} ({'yours' if e['key'][1:] == (own_file,) else 'another user'})",
+                 "MB": e["bytes"] / 2**20, "Sessions": e["sessions"], "Idle s": round(e["idle_s"])}
+                for e in usage["entries"]
+            ]), hide_index=True, use_container_width=True)
+
+        st.markdown("### Slow Reruns")
+        threshold_ms = st.number_input("Profile reruns slower than (ms, 0 = off)", min_value=0, step=100,
+                                       value=int(profiler.threshold() * 1000))
+        if threshold_ms != int(profiler.threshold() * 1000):
+            profiler.set_threshold(threshold_ms / 1000)
+        captures = profiler.list_captures()
+        if not captures:
+            st.caption("No slow reruns captured.")
+        else:
+            st.dataframe(pd.DataFrame([
+                {"When": c["created"], "Page": c["name"], "Seconds": c["duration_s"], "Samples": c["samples"],
+                 "Filters": json.dumps({k: v for k, v in c["context"].items() if k not in ("page", "username")})}
+                for c in captures
+            ]), hide_index=True, use_container_width=True)
+            chosen = st.selectbox("Capture", captures, format_func=lambda c: f"{c['created']} · {c['name']} · {c['duration_s']:.2f} s")
+            try:
+                hot = profiler.hot_functions(chosen["id"])
+                folded = profiler.read_folded(chosen["id"])
+            except FileNotFoundError:
+                st.warning("That capture was rotated away.")
+            else:
+                st.dataframe(pd.DataFrame(hot, columns=["Function", "Self samples", "Total samples"]),
+                             hide_index=True, use_container_width=True)
+                st.download_button("⬇️ Collapsed stacks (flame graph input)", folded,
+                                   file_name=f"rerun_{chosen['id']}.folded", mime="text/plain")
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with instrumentation.measure(f"dashboard.rerun.{st.session_state.page}"), \
+            profiler.watch(st.session_state.page, _rerun_context):
+        main()
\ No newline at end of file
@@ -6,53 +6,38 @@ from rich.panel import Panel
 from rich.text import Text
 from rich.bar import Bar
 
+from features.diagnostics import instrumentation
+from features.ledger import ledger
+from features.service import client
+
 # Assuming these paths based on the project structure
 TRANSACTIONS_FILE = "database/transactions.txt"
-BUDGET_FILE = "database/budget.txt"
 
 console = Console()
 
+@instrumentation.timed(rows=len)
 def load_transactions():
     transactions = []
     try:
-        with open(TRANSACTIONS_FILE, "r") as f:
-            for line in f:
-                parts = line.strip().split(",")
-                if len(parts) == 6:
-                    try:
-                        # Date, Type, Category, Amount (paisa), Description, ID
-                        transactions.append({
-                            "date": datetime.datetime.strptime(parts[0], "%Y-%m-%d").date(),
-                            "type": parts[1],
-                            "category": parts[2],
-                            "amount": int(parts[3]),  # Storing as paisa/cents
-                            "description": parts[4],
-                            "id": parts[5]
-                        })
-                    except ValueError:
-                        console.print(f"[red]Skipping malformed transaction line: {line.strip()}[/red]")
-                else:
-                    console.print(f"[red]Skipping malformed transaction line: {line.strip()}[/red]")
+        snapshot = client.call("ledger.records", path=TRANSACTIONS_FILE)
     except FileNotFoundError:
         console.print(f"[yellow]No transactions found at {TRANSACTIONS_FILE}. Starting fresh.[/yellow]")
+        return transactions
+    for record in snapshot["records"]:
+        try:
+            transactions.append({
+                "date": datetime.datetime.strptime(record["date"], "%Y-%m-%d").date(),
+                "type": record["type"],
+                "category": ledger.category_of(record),
+                "amount": int(record["amount_paisa"]),  # Storing as paisa/cents
+                "description": record.get("description", ""),
+            })
+        except (KeyError, TypeError, ValueError):
+            console.print(f"[red]Skipping malformed transaction: {record}[/red]")
     return transactions
 
 def load_budgets():
-    budgets = {}
-    try:
-        with open(BUDGET_FILE, "r") as f:
-            for line in f:
-                parts = line.strip().split(",")
-                if len(parts) == 2:
-                    try:
-                        budgets[parts[0]] = int(parts[1]) # Category: Amount (paisa)
-                    except ValueError:
-                        console.print(f"[red]Skipping malformed budget line: {line.strip()}[/red]")
-                else:
-                    console.print(f"[red]Skipping malformed budget line: {line.strip()}[/red]")
-    except FileNotFoundError:
-        console.print(f"[yellow]No budget found at {BUDGET_FILE}.[/yellow]")
-    return budgets
+    return client.call("budget.load")
 
 def get_transactions_for_month(transactions, year, month):
     return [t for t in transactions if t["date"].year == year and t["date"].month == month]
@@ -280,6 +265,7 @@ def calculate_financial_health_score(transactions, budgets):
     else:
         console.print("- Keep up the great work! Consider setting more aggressive financial goals.")
 
+@instrumentation.timed()
 def display_analytics():
     transactions = load_transactions()
     budgets = load_budgets()
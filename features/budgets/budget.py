@@ -4,14 +4,15 @@ from rich.table import Table
 from rich.progress import Progress, BarColumn, TextColumn, track
 from rich.text import Text
 from datetime import datetime
-import os
-import json
+
+from features.budgets import budget_engine
+from features.diagnostics import instrumentation
+from features.service import client
 
 # Initialize Rich Console
 console = Console()
 
 # File paths
-BUDGET_FILE = "database/budgets.txt"
 TRANSACTIONS_FILE = "database/transactions.txt"
 
 # Categories for budgeting
@@ -19,54 +20,10 @@ BUDGET_CATEGORIES = [
     "Food", "Transport", "Shopping", "Bills", "Entertainment", "Health", "Other"
 ]
 
-def _ensure_budget_file_exists():
-    """Ensures the budget file exists."""
-    if not os.path.exists(BUDGET_FILE):
-        with open(BUDGET_FILE, "w") as f:
-            f.write("")
-
-
-def _load_budgets():
-    _ensure_budget_file_exists()
-    budgets = {}
-    with open(BUDGET_FILE, "r") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                entry = json.loads(line)
-                budgets[entry["category"]] = entry["amount_paisa"]
-            except json.JSONDecodeError:
-                pass
-    return budgets
-
-
-def _load_transactions():
-    """Loads transactions from the transactions file."""
-    transactions = []
-    if not os.path.exists(TRANSACTIONS_FILE):
-        return transactions
-    with open(TRANSACTIONS_FILE, "r") as f:
-        for line in f:
-            parts = line.strip().split(',')
-            if len(parts) == 5:
-                # date, type, category, description, amount_paisa
-                transactions.append({
-                    "date": datetime.strptime(parts[0], "%Y-%m-%d"),
-                    "type": parts[1],
-                    "category_or_source": parts[2],
-                    "description": parts[3],
-                    "amount_paisa": int(parts[4])
-                })
-    return transactions
-
 def add_budget():
     """
     Allows the user to set a monthly budget for a specific category.
     """
-    _ensure_budget_file_exists()
-
     console.print("\n[bold cyan]Set Monthly Budget[/bold cyan]")
 
     category = questionary.select(
@@ -94,45 +51,27 @@ def add_budget():
         except ValueError:
             console.print("[bold red]Invalid amount. Please enter a number (e.g., 100.50).[/bold red]")
 
-    # Save to budgets.txt
-    # Overwrite existing budget for the same category if it exists
-    budgets = _load_budgets()
-    budgets[category] = amount_paisa
-    with open(BUDGET_FILE, "w") as f:
-        for cat, amount in budgets.items():
-            f.write(f"{cat},{amount}\n")
+    # Replaces the category's budget from today on; past months keep the old one
+    client.call("budget.set", category=category, amount_paisa=amount_paisa)
 
     console.print(f"[bold green]Budget of Rs {amount_float:.2f} set for {category}.[/bold green]")
 
+@instrumentation.timed()
 def view_budgets():
     """
     Displays a summary of monthly budgets, spending, and utilization.
     """
     console.print("\n[bold cyan]Monthly Budget Summary[/bold cyan]")
 
-    budgets = _load_budgets()
-    transactions = _load_transactions()
+    budgets = client.call("budget.load")
 
     if not budgets:
         console.print("[yellow]No budgets set yet. Use 'Set Budget' to add one.[/yellow]")
         return
 
-    current_month = datetime.now().month
-    current_year = datetime.now().year
-
-    spent_by_category = {category: 0 for category in budgets.keys()}
     total_budget_paisa = 0
     total_spent_paisa = 0
 
-    for transaction in transactions:
-        if transaction["type"] == "expense" and \
-           transaction["date"].month == current_month and \
-           transaction["date"].year == current_year:
-            category = transaction["category_or_source"]
-            if category in spent_by_category:
-                spent_by_category[category] += transaction["amount_paisa"]
-            # If an expense category is not in budgets, it's not tracked against a budget
-
     table = Table(title=f"Budgets for {datetime.now().strftime('%B %Y')}")
     table.add_column("Category", style="cyan", no_wrap=True)
     table.add_column("Budget", style="magenta")
@@ -143,10 +82,13 @@ def view_budgets():
 
     categories_over_budget = []
 
-    for category, budget_amount_paisa in budgets.items():
-        spent_amount_paisa = spent_by_category.get(category, 0)
-        remaining_paisa = budget_amount_paisa - spent_amount_paisa
-        
+    for status in client.call("budget.evaluate", budgets=budgets, ledger_path=TRANSACTIONS_FILE):
+        category = status["category"]
+        budget_amount_paisa = status["budget_paisa"]
+        spent_amount_paisa = status["spent_paisa"]
+        remaining_paisa = status["remaining_paisa"]
+        utilization_percent = status["utilization_percent"]
+
         total_budget_paisa += budget_amount_paisa
         total_spent_paisa += spent_amount_paisa
 
@@ -154,21 +96,14 @@ def view_budgets():
         spent_amount_display = f"Rs {spent_amount_paisa / 100:.2f}"
         remaining_amount_display = f"Rs {remaining_paisa / 100:.2f}"
 
-        if budget_amount_paisa > 0:
-            utilization_percent = (spent_amount_paisa / budget_amount_paisa) * 100
-        else:
-            utilization_percent = 0 # No budget, no utilization
-
         # Color coding for remaining and status
+        status_text = status["status"]
         remaining_style = "green"
-        status_text = "OK"
-        if utilization_percent >= 100:
+        if status_text == budget_engine.STATUS_OVER:
             remaining_style = "bold red"
-            status_text = "OVER"
             categories_over_budget.append(category)
-        elif utilization_percent >= 70:
+        elif status_text == budget_engine.STATUS_WARNING:
             remaining_style = "yellow"
-            status_text = "Warning"
         
         # Progress bar
         progress_bar_length = 10
@@ -178,9 +113,9 @@ def view_budgets():
         utilization_display = Text()
         utilization_display.append(f"{utilization_percent:.1f}% ", style="blue")
         
-        if utilization_percent >= 100:
+        if status_text == budget_engine.STATUS_OVER:
             utilization_display.append(bar, style="bold red")
-        elif utilization_percent >= 70:
+        elif status_text == budget_engine.STATUS_WARNING:
             utilization_display.append(bar, style="yellow")
         else:
             utilization_display.append(bar, style="green")
@@ -232,6 +167,66 @@ def view_budgets():
         console.print("\n[bold red]You have exceeded your overall budget![/bold red]")
 
 
+@instrumentation.timed()
+def view_budget_report():
+    """
+    Shows budget vs actual spending for past months, using the budget that
+    was in force in each month rather than today's budget.
+    """
+    console.print("\n[bold cyan]Budget vs Actual Report[/bold cyan]")
+
+    months_str = questionary.text("How many months back? (leave empty for all history)").ask()
+    if months_str is None:
+        return
+
+    start_month = None
+    if months_str.strip():
+        try:
+            months_back = int(months_str)
+            if months_back <= 0:
+                raise ValueError
+        except ValueError:
+            console.print("[bold red]Please enter a positive whole number.[/bold red]")
+            return
+        year, month = datetime.now().year, datetime.now().month - (months_back - 1)
+        while month <= 0:
+            month += 12
+            year -= 1
+        start_month = f"{year:04d}-{month:02d}"
+
+    rows = client.call("budget.vs_actual", ledger_path=TRANSACTIONS_FILE, start_month=start_month)
+    if not rows:
+        console.print("[yellow]No budgets were in force in that period.[/yellow]")
+        return
+
+    table = Table(title="Budget vs Actual")
+    table.add_column("Month", style="cyan", no_wrap=True)
+    table.add_column("Category", style="cyan")
+    table.add_column("Budget", style="magenta")
+    table.add_column("Spent", style="red")
+    table.add_column("Utilization", style="blue")
+    table.add_column("Status", style="white")
+
+    status_styles = {
+        budget_engine.STATUS_OK: "green",
+        budget_engine.STATUS_WARNING: "yellow",
+        budget_engine.STATUS_OVER: "bold red"
+    }
+    for row in rows:
+        table.add_row(
+            datetime.strptime(row["month"], "%Y-%m").strftime("%b %Y"),
+            row["category"],
+            f"Rs {row['budget_paisa'] / 100:.2f}",
+            f"Rs {row['spent_paisa'] / 100:.2f}",
+            f"{row['utilization_percent']:.1f}%",
+            Text(row["status"], style=status_styles[row["status"]])
+        )
+    console.print(table)
+
+    over = sum(1 for row in rows if row["status"] == budget_engine.STATUS_OVER)
+    console.print(f"Budgets exceeded in [bold red]{over}[/bold red] of {len(rows)} budget-months.")
+
+
 if __name__ == "__main__":
     # For testing purposes, you can uncomment one of these:
     # add_budget()
@@ -0,0 +1,117 @@
+import json
+import os
+from datetime import datetime
+
+from features.budgets import budget_engine, budget_repository
+from features.ledger import ledger
+
+# Alerts wait here until the CLI or dashboard shows them. Subdirectories of
+# database/ are skipped by backups and the integrity validator.
+OUTBOX_DIR = "database/outbox"
+
+# Utilization percentages that raise an alert when a write crosses them
+ALERT_THRESHOLDS = (budget_engine.WARNING_PERCENT, budget_engine.OVER_PERCENT)
+
+
+def _outbox_path(ledger_path):
+    name = os.path.splitext(os.path.basename(ledger_path))[0]
+    return os.path.join(OUTBOX_DIR, f"alerts_{name}.jsonl")
+
+
+def _crossed(before, after, budget_paisa):
+    """Thresholds passed on the way from before to after (both in paisa)."""
+    return [
+        threshold for threshold in ALERT_THRESHOLDS
+        if before * 100 < threshold * budget_paisa <= after * 100
+    ]
+
+
+def _on_ledger_write(path, records, start, end):
+    """
+    Checks only the categories touched by an append against their budgets.
+
+    Runs after budget_engine's listener (it is registered first, on import),
+    so the counters already include the new records.
+    """
+    if not records:
+        return
+    month = budget_engine.current_month()
+    added = {}
+    for record in records:
+        if record.get("type") == "expense" and str(record.get("date", "")).startswith(month):
+            category = ledger.category_of(record)
+            added[category] = added.get(category, 0) + record.get("amount_paisa", 0)
+    if not added:
+        return
+
+    budgets = budget_repository.load_budgets(budget_repository.owner_of_ledger(path))
+    spend = None
+    events = []
+    for category, amount in added.items():
+        budget_paisa = budgets.get(category)
+        if not budget_paisa or budget_paisa <= 0:
+            continue
+        if spend is None:
+            spend = budget_engine.month_spend(path, month)
+        after = spend.get(category, 0)
+        for threshold in _crossed(after - amount, after, budget_paisa):
+            events.append({
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                "month": month,
+                "category": category,
+                "threshold": threshold,
+                "spent_paisa": after,
+                "budget_paisa": budget_paisa
+            })
+    if events:
+        publish(path, events)
+
+
+ledger.add_write_listener(_on_ledger_write)
+
+
+def publish(ledger_path, events):
+    """Appends alert events to the ledger's outbox in a single write."""
+    os.makedirs(OUTBOX_DIR, exist_ok=True)
+    with open(_outbox_path(ledger_path), "a", encoding="utf-8") as f:
+        f.write("".join(json.dumps(event) + "\n" for event in events))
+
+
+def pop_alerts(ledger_path):
+    """
+    Returns and removes the pending alerts for a ledger.
+
+    The outbox is renamed before it is read, so an alert written while the
+    caller is reading goes to a fresh outbox instead of being lost.
+    """
+    path = _outbox_path(ledger_path)
+    claimed = path + ".claimed"
+    try:
+        os.replace(path, claimed)
+    except OSError:
+        return []
+    events = []
+    with open(claimed, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError:
+                pass
+    os.remove(claimed)
+    return events
+
+
+def format_alert(event, symbol="Rs "):
+    """One line describing an alert, without markup."""
+    if event.get("kind") == "anomaly":
+        # Published by smart_assistant.anomaly for expenses far outside their category's history
+        return (f"Unusual expense: {symbol}{event['amount_paisa'] / 100:,.2f} on {event['category']} "
+                f"({event['date']}) is {' and '.join(event['reasons'])} compared with your usual "
+                f"{event['category']} spending")
+    spent = event["spent_paisa"] / 100
+    budget = event["budget_paisa"] / 100
+    if event["threshold"] >= budget_engine.OVER_PERCENT:
+        return (f"{event['category']} is over budget: {symbol}{spent:,.2f} spent of "
+                f"{symbol}{budget:,.2f} (over by {symbol}{spent - budget:,.2f})")
+    return (f"{event['category']} has passed {event['threshold']}% of its budget: "
+            f"{symbol}{spent:,.2f} of {symbol}{budget:,.2f}")
@@ -0,0 +1,217 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+from features.ledger import ledger
+from features.diagnostics import instrumentation
+
+# Spend counters are derived data: deleting the cache only costs one rebuild
+CACHE_DIR = "database/cache"
+COUNTERS_VERSION = 3
+
+# Utilization thresholds used by the CLI (GEMINI.md: yellow from 70%, red at 100%)
+WARNING_PERCENT = 70
+OVER_PERCENT = 100
+
+STATUS_OK = "OK"
+STATUS_WARNING = "Warning"
+STATUS_OVER = "OVER"
+
+# ledger path -> counters dict, see _empty_counters()
+_counters = {}
+_lock = threading.Lock()
+
+
+def _empty_counters():
+    # months: {"2025-11": {"expense": {category: paisa}, "income": {source: paisa}}}
+    # days:   {"2025-11-24": {category: paisa}} of expenses, for forecasting
+    # offset: how many bytes of the ledger are already counted
+    # inode, generation, tail, mtime_ns: what the counted bytes were, so a
+    #         rewrite is noticed even when it reuses the inode and the size
+    #         (see ledger.catch_up)
+    return {"version": COUNTERS_VERSION, "inode": None, "offset": 0, "months": {}, "days": {}}
+
+
+def _key(ledger_path):
+    return os.path.normpath(ledger_path)
+
+
+def _cache_path(ledger_path):
+    name = os.path.splitext(os.path.basename(ledger_path))[0]
+    return os.path.join(CACHE_DIR, f"spend_{name}.json")
+
+
+def _load_cached(ledger_path):
+    try:
+        with open(_cache_path(ledger_path), "r") as f:
+            counters = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return _empty_counters()
+    if not isinstance(counters, dict) or counters.get("version") != COUNTERS_VERSION:
+        return _empty_counters()
+    return counters
+
+
+def _save_cached(ledger_path, counters):
+    path = _cache_path(ledger_path)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump(counters, f)
+        os.replace(path + ".tmp", path)
+    except OSError:
+        pass  # The counters are still correct in memory and rebuild next start
+
+
+def _add(counters, record):
+    """Adds one transaction to the counters. Returns False if it is unusable."""
+    try:
+        month = record["date"][:7]
+        kind = record["type"]
+        amount = int(record["amount_paisa"])
+    except (KeyError, TypeError, ValueError):
+        return False
+    if kind not in ("expense", "income"):
+        return False
+    by_type = counters["months"].setdefault(month, {"expense": {}, "income": {}})
+    bucket = by_type[kind]
+    category = ledger.category_of(record)
+    bucket[category] = bucket.get(category, 0) + amount
+    if kind == "expense":
+        day = counters["days"].setdefault(record["date"][:10], {})
+        day[category] = day.get(category, 0) + amount
+    return True
+
+
+def _current(ledger_path):
+    """Returns the up to date counters for a ledger. Call with _lock held."""
+    key = _key(ledger_path)
+    counters = _counters.get(key)
+    if counters is None:
+        counters = _load_cached(ledger_path)
+    counters, changed = ledger.catch_up(ledger_path, counters, _empty_counters, _add)
+    if changed:
+        _save_cached(ledger_path, counters)
+    _counters[key] = counters
+    return counters
+
+
+def _on_ledger_write(path, records, start, end):
+    """
+    Keeps loaded counters in step with writes made by this process.
+
+    Appends that continue exactly where the counters stopped are added
+    directly; anything else (a rewrite, or counters that were already
+    behind) is left to the catch-up in _current().
+    """
+    key = _key(path)
+    with _lock:
+        counters = _counters.get(key)
+        if counters is None:
+            return
+        if not ledger.apply_append(path, counters, records, start, end, _add):
+            _counters.pop(key, None)
+            return
+        _save_cached(path, counters)
+
+
+ledger.add_write_listener(_on_ledger_write)
+
+
+def current_month():
+    return datetime.now().strftime("%Y-%m")
+
+
+@instrumentation.timed()
+def month_spend(ledger_path, month=None):
+    """
+    Returns {category: paisa} of expenses for one month.
+
+    Args:
+        ledger_path (str): Ledger file (CLI or per-user dashboard ledger).
+        month (str): "YYYY-MM", defaults to the current month.
+    """
+    with _lock:
+        months = _current(ledger_path)["months"]
+        return dict(months.get(month or current_month(), {}).get("expense", {}))
+
+
+@instrumentation.timed()
+def month_totals(ledger_path, month=None):
+    """Returns {"income": paisa, "expense": paisa} for one month."""
+    with _lock:
+        by_type = _current(ledger_path)["months"].get(month or current_month(), {})
+        return {kind: sum(by_type.get(kind, {}).values()) for kind in ("income", "expense")}
+
+
+@instrumentation.timed(rows=len)
+def monthly_totals(ledger_path):
+    """Returns {"YYYY-MM": {"income": paisa, "expense": paisa}} for every month."""
+    with _lock:
+        months = _current(ledger_path)["months"]
+        return {
+            month: {kind: sum(by_type.get(kind, {}).values()) for kind in ("income", "expense")}
+            for month, by_type in months.items()
+        }
+
+
+def spend_by_month(ledger_path):
+    """Returns {"YYYY-MM": {category: paisa}} of expenses for every month."""
+    with _lock:
+        months = _current(ledger_path)["months"]
+        return {month: dict(by_type.get("expense", {})) for month, by_type in months.items()}
+
+
+@instrumentation.timed(rows=len)
+def daily_spend(ledger_path, first_day, last_day):
+    """
+    Returns {"YYYY-MM-DD": {category: paisa}} of expenses for the days from
+    first_day to last_day inclusive (ISO strings); days without spending are left out.
+    """
+    with _lock:
+        days = _current(ledger_path)["days"]
+        return {day: dict(spend) for day, spend in days.items() if first_day <= day <= last_day}
+
+
+def status_for(utilization_percent, warning_percent=WARNING_PERCENT):
+    """Maps a utilization percentage to STATUS_OK / STATUS_WARNING / STATUS_OVER."""
+    if utilization_percent >= OVER_PERCENT:
+        return STATUS_OVER
+    if utilization_percent >= warning_percent:
+        return STATUS_WARNING
+    return STATUS_OK
+
+
+@instrumentation.timed(rows=len)
+def evaluate_budgets(budgets, ledger_path, month=None, warning_percent=WARNING_PERCENT):
+    """
+    Compares budgets with the month's spend counters.
+
+    Only one counter lookup is made per budget, so this costs O(#budgets)
+    no matter how long the ledger is.
+
+    Args:
+        budgets (dict): {category: budget in paisa}.
+        ledger_path (str): Ledger whose spending is compared.
+        month (str): "YYYY-MM", defaults to the current month.
+        warning_percent (float): Utilization at which a budget is a warning.
+
+    Returns:
+        list: One dict per budget, in the order given, with category,
+        budget_paisa, spent_paisa, remaining_paisa, utilization_percent and status.
+    """
+    spend = month_spend(ledger_path, month)
+    results = []
+    for category, budget_paisa in budgets.items():
+        spent_paisa = spend.get(category, 0)
+        utilization = (spent_paisa / budget_paisa) * 100 if budget_paisa > 0 else 0
+        results.append({
+            "category": category,
+            "budget_paisa": budget_paisa,
+            "spent_paisa": spent_paisa,
+            "remaining_paisa": budget_paisa - spent_paisa,
+            "utilization_percent": utilization,
+            "status": status_for(utilization, warning_percent)
+        })
+    return results
@@ -0,0 +1,169 @@
+import json
+import os
+from bisect import bisect_right
+from datetime import date, datetime
+
+from features.budgets import budget_engine
+
+# Every budget change is appended as one JSON line:
+#   {"category": "Food", "amount_paisa": 500000, "effective_from": "2025-11-01"}
+# amount_paisa 0 means the budget was removed from that date on.
+HISTORY_FILE = "database/budget_history.txt"
+# Budgets migrated from before history was kept apply to all earlier months
+EARLIEST_DATE = "0001-01-01"
+
+# history path -> ((mtime_ns, size), index)
+_indexes = {}
+
+
+def _build_index(path):
+    """
+    Builds {category: (effective_from dates, amounts)} with dates sorted.
+
+    ISO dates sort as strings, so the index is two parallel lists per
+    category searched with bisect. A later line with the same date wins.
+    """
+    entries = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for order, line in enumerate(f):
+                try:
+                    entry = json.loads(line)
+                    entries.append((entry["effective_from"], order, entry["category"], int(entry["amount_paisa"])))
+                except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+                    continue
+    except FileNotFoundError:
+        pass
+
+    index = {}
+    for effective_from, _, category, amount_paisa in sorted(entries):
+        dates, amounts = index.setdefault(category, ([], []))
+        if dates and dates[-1] == effective_from:
+            amounts[-1] = amount_paisa
+        else:
+            dates.append(effective_from)
+            amounts.append(amount_paisa)
+    return index
+
+
+def load_index(path=HISTORY_FILE):
+    """Returns the interval index for a history file, rebuilt only when the file changes."""
+    try:
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        signature = None
+    cached = _indexes.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    index = _build_index(path) if signature else {}
+    _indexes[path] = (signature, index)
+    return index
+
+
+def _as_iso(day):
+    if isinstance(day, datetime):
+        day = day.date()
+    return day.isoformat() if isinstance(day, date) else day
+
+
+def _in_force(dates, amounts, day):
+    position = bisect_right(dates, day) - 1
+    if position < 0 or amounts[position] <= 0:
+        return None
+    return amounts[position]
+
+
+def budget_in_force(category, on_date, path=HISTORY_FILE):
+    """Returns the budget (paisa) for a category on a date, or None if there was none."""
+    entry = load_index(path).get(category)
+    if entry is None:
+        return None
+    return _in_force(entry[0], entry[1], _as_iso(on_date))
+
+
+def budgets_in_force(on_date, path=HISTORY_FILE):
+    """Returns {category: paisa} of every budget in force on a date."""
+    day = _as_iso(on_date)
+    budgets = {}
+    for category, (dates, amounts) in load_index(path).items():
+        amount = _in_force(dates, amounts, day)
+        if amount is not None:
+            budgets[category] = amount
+    return budgets
+
+
+def record_budget(category, amount_paisa, effective_from=None, path=HISTORY_FILE):
+    """
+    Appends a budget change. Pass amount_paisa=0 when a budget is removed.
+
+    Args:
+        effective_from (date or str): First day the amount applies, defaults to today.
+    """
+    entry = {
+        "category": category,
+        "amount_paisa": int(amount_paisa),
+        "effective_from": _as_iso(effective_from or date.today())
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+def _month_range(start_month, end_month):
+    year, month = int(start_month[:4]), int(start_month[5:7])
+    months = []
+    while f"{year:04d}-{month:02d}" <= end_month:
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def budget_vs_actual(ledger_path, path=HISTORY_FILE, start_month=None, end_month=None):
+    """
+    Compares each month's spend with the budgets in force that month.
+
+    Spend comes from budget_engine's monthly counters and budgets from the
+    interval index, so the cost is one bisect per (month, budgeted
+    category) and the ledger is never rescanned.
+
+    Args:
+        ledger_path (str): Ledger whose spending is compared.
+        path (str): Budget history file.
+        start_month (str): "YYYY-MM", defaults to the first month with spending.
+        end_month (str): "YYYY-MM", defaults to the current month.
+
+    Returns:
+        list: One dict per (month, category) with month, category,
+        budget_paisa, spent_paisa, remaining_paisa, utilization_percent and status.
+    """
+    index = load_index(path)
+    spend_by_month = budget_engine.spend_by_month(ledger_path)
+    end_month = end_month or budget_engine.current_month()
+    start_month = start_month or min(spend_by_month, default=end_month)
+
+    rows = []
+    for month in _month_range(start_month, end_month):
+        # The budget that counts is the one in force at the end of the month;
+        # "-31" sorts after every real day of the month as a string
+        month_end = month + "-31"
+        spend = spend_by_month.get(month, {})
+        for category in sorted(index):
+            dates, amounts = index[category]
+            budget_paisa = _in_force(dates, amounts, month_end)
+            if budget_paisa is None:
+                continue
+            spent_paisa = spend.get(category, 0)
+            utilization = spent_paisa / budget_paisa * 100
+            rows.append({
+                "month": month,
+                "category": category,
+                "budget_paisa": budget_paisa,
+                "spent_paisa": spent_paisa,
+                "remaining_paisa": budget_paisa - spent_paisa,
+                "utilization_percent": utilization,
+                "status": budget_engine.status_for(utilization)
+            })
+    return rows
@@ -0,0 +1,151 @@
+import json
+import os
+import threading
+from datetime import date
+
+from features.budgets import budget_history
+from features.diagnostics import instrumentation
+
+# Budgets live in one format only: the budget history JSON lines written by
+# budget_history (integer paisa, with effective_from dates). The budgets in
+# force today are the "current" budgets every screen shows.
+DATABASE_DIR = "database"
+MIGRATED_SUFFIX = ".migrated"
+
+# store path -> ((mtime_ns, size), day, {category: paisa})
+_cache = {}
+_migrated = set()
+_lock = threading.Lock()
+
+
+def store_path(username=None):
+    """database/budget_history.txt for the CLI, budget_history_<user>.txt for a dashboard user."""
+    name = f"budget_history_{username}.txt" if username else "budget_history.txt"
+    return os.path.join(DATABASE_DIR, name)
+
+
+def owner_of_ledger(ledger_path):
+    """transactions_<user>.txt -> user, the CLI ledger -> None."""
+    name = os.path.splitext(os.path.basename(ledger_path))[0]
+    return name[len("transactions_"):] if name.startswith("transactions_") else None
+
+
+def _legacy_sources(username):
+    """
+    Files written before the repository existed, as (path, amounts in rupees?,
+    authoritative?). Authoritative files were the ones being kept up to date,
+    so their amounts override the store; others only fill in missing categories.
+    """
+    if username:
+        return [(os.path.join(DATABASE_DIR, f"budgets_{username}.txt"), True, True)]
+    return [
+        # budget.add_budget: "category,paisa" (or JSON lines from older versions)
+        (os.path.join(DATABASE_DIR, "budgets.txt"), False, True),
+        # Read by the analytics and smart assistant screens but never written
+        (os.path.join(DATABASE_DIR, "budget.txt"), False, False),
+    ]
+
+
+def _parse_legacy(path, rupees):
+    budgets = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                if line.startswith("{"):
+                    entry = json.loads(line)
+                    category, amount_paisa = entry["category"], int(entry["amount_paisa"])
+                else:
+                    category, _, amount = line.rpartition(",")
+                    amount_paisa = int(round(float(amount) * 100)) if rupees else int(amount)
+            except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+                continue
+            if category and amount_paisa > 0:
+                budgets[category] = amount_paisa
+    return budgets
+
+
+def migrate_legacy(username=None):
+    """
+    Moves legacy budget files into the store and renames them to *.migrated.
+
+    Categories the store has never seen are back-dated to
+    budget_history.EARLIEST_DATE; changed amounts take effect today.
+
+    Returns:
+        list: The legacy files that were migrated.
+    """
+    path = store_path(username)
+    migrated = []
+    for legacy_path, rupees, authoritative in _legacy_sources(username):
+        if not os.path.exists(legacy_path):
+            continue
+        index = budget_history.load_index(path)
+        in_force = budget_history.budgets_in_force(date.today(), path)
+        for category, amount_paisa in _parse_legacy(legacy_path, rupees).items():
+            if category not in index:
+                budget_history.record_budget(category, amount_paisa, budget_history.EARLIEST_DATE, path)
+            elif authoritative and in_force.get(category) != amount_paisa:
+                budget_history.record_budget(category, amount_paisa, path=path)
+        try:
+            os.replace(legacy_path, legacy_path + MIGRATED_SUFFIX)
+        except FileNotFoundError:
+            pass  # Another thread or process finished this migration
+        migrated.append(legacy_path)
+    return migrated
+
+
+def _ensure_migrated(username):
+    if username in _migrated:
+        return
+    migrate_legacy(username)
+    _migrated.add(username)
+
+
+@instrumentation.timed(rows=len)
+def load_budgets(username=None):
+    """
+    Returns {category: paisa} of the budgets in force today.
+
+    The result is cached and only rebuilt when the store file changes or
+    the day rolls over, so hot paths pay one stat call, not a file parse.
+    """
+    path = store_path(username)
+    today = date.today().isoformat()
+    with _lock:
+        _ensure_migrated(username)
+        try:
+            stat = os.stat(path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            signature = None
+        cached = _cache.get(path)
+        if cached is None or cached[0] != signature or cached[1] != today:
+            budgets = budget_history.budgets_in_force(today, path) if signature else {}
+            cached = (signature, today, budgets)
+            _cache[path] = cached
+        return dict(cached[2])
+
+
+def set_budget(category, amount_paisa, username=None, effective_from=None):
+    """Sets a category's budget from effective_from (default today) onwards."""
+    path = store_path(username)
+    with _lock:
+        _ensure_migrated(username)
+        budget_history.record_budget(category, amount_paisa, effective_from, path)
+        _cache.pop(path, None)
+
+
+def delete_budget(category, username=None):
+    """Removes a category's budget from today onwards; past months keep it."""
+    set_budget(category, 0, username)
+
+
+@instrumentation.timed(rows=len)
+def budget_vs_actual(ledger_path, username=None, start_month=None, end_month=None):
+    """budget_history.budget_vs_actual() against this owner's budget store."""
+    with _lock:
+        _ensure_migrated(username)
+    return budget_history.budget_vs_actual(ledger_path, store_path(username), start_month, end_month)
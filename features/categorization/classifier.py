@@ -0,0 +1,184 @@
+import json
+import math
+import os
+import re
+import threading
+
+from features.categorization import rules
+from features.ledger import ledger
+from features.diagnostics import instrumentation
+
+CACHE_DIR = "database/cache"
+MODEL_VERSION = 1
+
+# Laplace smoothing of the word counts
+ALPHA = 1.0
+# Amounts are one extra "word": which power of AMOUNT_BAND_BASE they fall in
+AMOUNT_BAND_BASE = 2
+# Nothing is suggested until a type has this many labelled transactions
+MIN_TRAINING = 5
+# ...or when the best category is less likely than this
+MIN_CONFIDENCE = 0.4
+
+SOURCE_RULE = "rule"
+SOURCE_MODEL = "model"
+
+# ledger path -> model dict, see _empty_model()
+_models = {}
+_lock = threading.Lock()
+
+
+def _empty_model():
+    # types: {"expense": {"docs":   {category: transactions seen},
+    #                     "words":  {category: tokens seen},
+    #                     "counts": {token: {category: count}}}, "income": ...}
+    return {"version": MODEL_VERSION, "inode": None, "offset": 0, "types": {}}
+
+
+def _cache_path(ledger_path):
+    name = os.path.splitext(os.path.basename(ledger_path))[0]
+    return os.path.join(CACHE_DIR, f"classifier_{name}.json")
+
+
+def _load_cached(ledger_path):
+    try:
+        with open(_cache_path(ledger_path), "r") as f:
+            model = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if not isinstance(model, dict) or model.get("version") != MODEL_VERSION:
+        return None
+    return model
+
+
+def _save_cached(ledger_path, model):
+    path = _cache_path(ledger_path)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump(model, f, separators=(",", ":"))
+        os.replace(path + ".tmp", path)
+    except OSError:
+        pass
+
+
+def tokens(description, amount_paisa=None):
+    """The words of a description (letters only, lowercased) plus an amount band token."""
+    words = [word for word in re.sub(r"[^a-z]+", " ", str(description or "").lower()).split() if len(word) > 1]
+    if amount_paisa and amount_paisa > 0:
+        words.append(f"#amount{int(math.log(amount_paisa, AMOUNT_BAND_BASE))}")
+    return words
+
+
+def _learn(model, record):
+    """Adds one labelled transaction to the counts."""
+    kind = record.get("type")
+    category = ledger.category_of(record)
+    if kind not in rules.TRANSACTION_TYPES or not category:
+        return
+    try:
+        amount_paisa = int(record.get("amount_paisa", 0))
+    except (TypeError, ValueError):
+        amount_paisa = 0
+    words = tokens(record.get("description", ""), amount_paisa)
+    by_type = model["types"].setdefault(kind, {"docs": {}, "words": {}, "counts": {}})
+    by_type["docs"][category] = by_type["docs"].get(category, 0) + 1
+    by_type["words"][category] = by_type["words"].get(category, 0) + len(words)
+    for word in words:
+        per_category = by_type["counts"].setdefault(word, {})
+        per_category[category] = per_category.get(category, 0) + 1
+
+
+def _current(ledger_path):
+    """Returns the up to date model for a ledger. Call with _lock held."""
+    key = os.path.normpath(ledger_path)
+    model = _models.get(key)
+    if model is None:
+        model = _load_cached(ledger_path)
+    model, changed = ledger.catch_up(ledger_path, model, _empty_model, _learn)
+    if changed:
+        _save_cached(ledger_path, model)
+    _models[key] = model
+    return model
+
+
+def _on_ledger_write(path, records, start, end):
+    """
+    Trains on appended transactions as they are saved.
+
+    Edits and deletes rewrite the ledger, which drops the model; it is
+    retrained from the file the next time a suggestion is asked for.
+    """
+    key = os.path.normpath(path)
+    with _lock:
+        model = _models.get(key)
+        if model is None:
+            return
+        if not ledger.apply_append(path, model, records, start, end, _learn):
+            _models.pop(key, None)
+            return
+        _save_cached(path, model)
+
+
+ledger.add_write_listener(_on_ledger_write)
+
+
+def predict(model, description, kind, amount_paisa=None):
+    """
+    Ranks categories for a transaction with multinomial naive Bayes.
+
+    Costs one dictionary lookup per word and category, so it runs in
+    microseconds. Words never seen in training are ignored.
+
+    Returns:
+        list: (category, probability) pairs, most likely first; empty when
+        the type has too little training data or no word is known.
+    """
+    by_type = model["types"].get(kind)
+    if by_type is None or sum(by_type["docs"].values()) < MIN_TRAINING:
+        return []
+    counts = by_type["counts"]
+    known = [counts[word] for word in tokens(description, amount_paisa) if word in counts]
+    if not known:
+        return []
+    total_docs = sum(by_type["docs"].values())
+    vocabulary = len(counts)
+    scores = {}
+    for category, docs in by_type["docs"].items():
+        denominator = math.log(by_type["words"][category] + ALPHA * vocabulary)
+        score = math.log(docs / total_docs)
+        for per_category in known:
+            score += math.log(per_category.get(category, 0) + ALPHA) - denominator
+        scores[category] = score
+    best = max(scores.values())
+    weights = {category: math.exp(score - best) for category, score in scores.items()}
+    total = sum(weights.values())
+    return sorted(((category, weight / total) for category, weight in weights.items()),
+                  key=lambda item: item[1], reverse=True)
+
+
+@instrumentation.timed()
+def suggest_category(ledger_path, description, kind, amount_paisa=None, username=None):
+    """
+    Suggests a category for a transaction being entered.
+
+    The owner's category rules win when one applies; otherwise the naive
+    Bayes model trained on the ledger is asked.
+
+    Args:
+        ledger_path (str): CLI or per-user dashboard ledger.
+        username (str): Dashboard user whose category rules apply (None for the CLI).
+
+    Returns:
+        tuple: (category, confidence, SOURCE_RULE / SOURCE_MODEL), or None.
+    """
+    if not description:
+        return None
+    category = rules.load_classifier(username)(description, kind, amount_paisa or 0)
+    if category is not None:
+        return category, 1.0, SOURCE_RULE
+    with _lock:
+        ranked = predict(_current(ledger_path), description, kind, amount_paisa)
+    if ranked and ranked[0][1] >= MIN_CONFIDENCE:
+        return ranked[0][0], ranked[0][1], SOURCE_MODEL
+    return None
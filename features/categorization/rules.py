@@ -0,0 +1,362 @@
+import json
+import os
+import re
+import threading
+
+import questionary
+from rich.console import Console
+from rich.table import Table
+
+from features.ledger import ledger
+
+console = Console()
+
+# Rules are a JSON list kept next to the ledger they categorize:
+# database/category_rules.json for the CLI, category_rules_<user>.json for a
+# dashboard user. Each rule is
+#   {"pattern": "netflix", "match": "substring" | "regex", "category": "Entertainment",
+#    "type": "expense" | "income" (optional), "min_paisa": 0, "max_paisa": 50000 (optional),
+#    "priority": 0 (optional, higher wins; ties go to the earlier rule)}
+DATABASE_DIR = "database"
+MATCH_SUBSTRING = "substring"
+MATCH_REGEX = "regex"
+TRANSACTION_TYPES = ("expense", "income")
+
+# rules path -> ((mtime_ns, size), classify)
+_cache = {}
+_lock = threading.Lock()
+
+
+def rules_path(username=None):
+    """database/category_rules.json for the CLI, category_rules_<user>.json for a dashboard user."""
+    name = f"category_rules_{username}.json" if username else "category_rules.json"
+    return os.path.join(DATABASE_DIR, name)
+
+
+# Regex features that stop a pattern from sharing one alternation with the
+# others: back references (group numbers shift once merged, and named groups
+# are made anonymous) and global inline flags (only allowed at the very start)
+_UNMERGEABLE_RE = re.compile(r"\\(?:[1-9]|g<)|\(\?P=|\(\?[aiLmsux]+\)")
+
+
+def _rule_regex(rule):
+    """The regex source of one rule, with its own named groups made anonymous."""
+    if rule.get("match", MATCH_SUBSTRING) == MATCH_REGEX:
+        return re.sub(r"\(\?P<\w+>", "(?:", rule.get("pattern", ""))
+    return re.escape(rule.get("pattern", ""))
+
+
+def _mergeable(rule):
+    """True if a regex rule can join the merged alternation unchanged in meaning."""
+    return not _UNMERGEABLE_RE.search(rule.get("pattern", ""))
+
+
+def validate_rule(rule):
+    """Raises ValueError if a rule dict is unusable."""
+    if not isinstance(rule, dict) or not rule.get("category"):
+        raise ValueError("a rule needs a category")
+    if rule.get("match", MATCH_SUBSTRING) not in (MATCH_SUBSTRING, MATCH_REGEX):
+        raise ValueError(f"unknown match kind '{rule.get('match')}'")
+    if rule.get("type") not in (None,) + TRANSACTION_TYPES:
+        raise ValueError(f"invalid transaction type '{rule.get('type')}'")
+    if not rule.get("pattern") and rule.get("min_paisa") is None and rule.get("max_paisa") is None:
+        raise ValueError("a rule needs a pattern or an amount range")
+    try:
+        # As compile_rules() runs it on its own; merging is only an optimization
+        re.compile(rule.get("pattern", "") if rule.get("match") == MATCH_REGEX else _rule_regex(rule),
+                   re.IGNORECASE | re.DOTALL)
+    except re.error as e:
+        raise ValueError(f"invalid pattern: {e}")
+
+
+def load_rules(username=None):
+    """Returns the valid rules of an owner, in file order."""
+    try:
+        with open(rules_path(username), "r", encoding="utf-8") as f:
+            rules = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return []
+    valid = []
+    for rule in rules if isinstance(rules, list) else []:
+        try:
+            validate_rule(rule)
+        except ValueError:
+            continue
+        valid.append(rule)
+    return valid
+
+
+def save_rules(rules, username=None):
+    """Replaces an owner's rules file."""
+    for rule in rules:
+        validate_rule(rule)
+    path = rules_path(username)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(rules, f, indent=2)
+    os.replace(path + ".tmp", path)
+    with _lock:
+        _cache.pop(path, None)
+
+
+def _trie_regex(literals):
+    """
+    Builds one regex matching any of the literals, factored by shared prefixes.
+
+    The regex engine then walks the literals like a trie (one branch per next
+    character) instead of trying every literal in turn, and the greedy
+    optional tails make it return the longest literal at a position.
+    """
+    trie = {}
+    for literal in literals:
+        node = trie
+        for char in literal:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node):
+        ends_here = "" in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if ends_here else body
+
+    return build(trie)
+
+
+def compile_rules(rules):
+    """
+    Compiles rules into a single classifier function.
+
+    All rule decisions (priority order, type filtering, pattern merging) are
+    made here once. Substring rules are merged into one prefix-factored
+    regex, run as a lookahead at every position of the description, which
+    finds every literal that occurs in one linear pass (like an Aho-Corasick
+    automaton); regex rules are merged into one alternation tried in priority
+    order. Classifying a row therefore costs two regex scans however many
+    rules there are, so a 100k-row import is a single linear pass. Regexes
+    that cannot be merged without changing their meaning (back references,
+    global inline flags) are run on their own after the scans.
+
+    Args:
+        rules (list): Rule dicts as stored by save_rules().
+
+    Returns:
+        function: classify(description, type, amount_paisa) -> category, or
+        None when no rule applies.
+    """
+    # rank: position in priority order, lower wins; ties keep file order
+    ranked = sorted(range(len(rules)), key=lambda i: -rules[i].get("priority", 0))
+    rank_of = {i: rank for rank, i in enumerate(ranked)}
+
+    literals = {}       # lowercase literal -> rule indices
+    regex_rules = []    # rule indices, best rank first
+    always = []         # amount-only rules
+    for i in ranked:
+        rule = rules[i]
+        if not rule.get("pattern"):
+            always.append(i)
+        elif rule.get("match", MATCH_SUBSTRING) == MATCH_REGEX:
+            regex_rules.append(i)
+        else:
+            literals.setdefault(rule["pattern"].lower(), []).append(i)
+
+    # Only the longest literal starting at each position is reported, so each
+    # literal carries the rules of every literal contained in it
+    contained = {
+        literal: sorted((i for other, indices in literals.items() if other in literal for i in indices),
+                        key=rank_of.get)
+        for literal in literals
+    }
+    literal_scan = re.compile(f"(?=({_trie_regex(literals)}))", re.DOTALL).finditer if literals else None
+    singles = {i: re.compile(rules[i]["pattern"], re.IGNORECASE | re.DOTALL) for i in regex_rules}
+    merged = [i for i in regex_rules if _mergeable(rules[i])]
+    try:
+        regex_scan = re.compile(
+            "|".join(f"(?=(?P<r{i}>{_rule_regex(rules[i])}))" for i in merged), re.IGNORECASE | re.DOTALL
+        ).finditer if merged else None
+    except re.error:
+        # Something the check above missed; every regex then runs on its own
+        merged, regex_scan = [], None
+    separate = set(regex_rules) - set(merged)
+
+    def applies(rule, kind, amount_paisa):
+        return rule.get("type") in (None, kind) and \
+            (rule.get("min_paisa") is None or amount_paisa >= rule["min_paisa"]) and \
+            (rule.get("max_paisa") is None or amount_paisa <= rule["max_paisa"])
+
+    def classify(description, kind, amount_paisa):
+        description = description or ""
+        matched = set(always)
+        if literal_scan is not None:
+            for found in literal_scan(description.lower()):
+                matched.update(contained[found.group(1)])
+        shadowed_after = len(rules)
+        if regex_scan is not None:
+            # At each position the alternation reports the best-ranked regex
+            # that matches there; lower-ranked ones are checked below if needed
+            found_regex = {int(found.lastgroup[1:]) for found in regex_scan(description)}
+            if found_regex:
+                shadowed_after = min(rank_of[i] for i in found_regex)
+                matched |= found_regex
+        for i in sorted(matched, key=rank_of.get):
+            rule = rules[i]
+            if applies(rule, kind, amount_paisa):
+                best = rank_of[i]
+                break
+        else:
+            best = len(rules)
+        # A merged regex can only be hidden behind a better-ranked regex that
+        # matched at the same position, and only matters if it would beat the
+        # winner; regexes left out of the merge are always checked here
+        for i in regex_rules:
+            if rank_of[i] >= best:
+                break
+            if (rank_of[i] > shadowed_after or i in separate) and i not in matched and \
+                    applies(rules[i], kind, amount_paisa) and singles[i].search(description):
+                return rules[i]["category"]
+        return rules[ranked[best]]["category"] if best < len(rules) else None
+
+    return classify
+
+
+def load_classifier(username=None):
+    """
+    Returns the compiled classifier for an owner's rules.
+
+    The compiled function is cached until the rules file changes.
+    """
+    path = rules_path(username)
+    try:
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        signature = None
+    with _lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+    classify = compile_rules(load_rules(username) if signature else [])
+    with _lock:
+        _cache[path] = (signature, classify)
+    return classify
+
+
+def categorize(records, classify):
+    """
+    Sets the category of every record a rule applies to, in place.
+
+    Returns:
+        int: How many records changed category.
+    """
+    changed = 0
+    for record in records:
+        category = classify(record.get("description", ""), record.get("type"), record.get("amount_paisa", 0))
+        if category is None:
+            continue
+        key = "category" if "category" in record and "category_or_source" not in record else "category_or_source"
+        if record.get(key) != category:
+            record[key] = category
+            changed += 1
+    return changed
+
+
+def recategorize_ledger(ledger_path, classify):
+    """
+    Re-applies the rules to a whole ledger in one pass and rewrites it.
+
+    Lines that do not decode are kept byte for byte so 'Repair Ledger' can
+    still recover them; the file is only rewritten if something changed.
+
+    Returns:
+        int: How many transactions changed category.
+    """
+    if not os.path.exists(ledger_path):
+        return 0
+    changed = 0
+
+    def recategorize(f):
+        nonlocal changed
+        lines = []
+        for line in f:
+            if not line.strip():
+                continue
+            record = ledger.decode_line(line)
+            if record is not None and categorize([record], classify):
+                changed += 1
+                lines.append(record)
+            else:
+                lines.append(line)
+        return lines if changed else None
+
+    # Read and rewrite under one lock, so a transaction added meanwhile is kept
+    ledger.update_records(ledger_path, recategorize)
+    return changed
+
+
+def manage_rules():
+    """CLI screen to list, add and remove the CLI ledger's category rules."""
+    rules = load_rules()
+    table = Table(title="Category Rules")
+    table.add_column("#", justify="right")
+    table.add_column("Match", style="cyan")
+    table.add_column("Pattern", style="white")
+    table.add_column("Type", style="magenta")
+    table.add_column("Amount Range", justify="right")
+    table.add_column("Category", style="blue")
+    table.add_column("Priority", justify="right")
+    for n, rule in enumerate(rules, 1):
+        low, high = rule.get("min_paisa"), rule.get("max_paisa")
+        amount_range = "" if low is None and high is None else \
+            f"{'' if low is None else f'Rs {low / 100:.2f}'} - {'' if high is None else f'Rs {high / 100:.2f}'}"
+        table.add_row(str(n), rule.get("match", MATCH_SUBSTRING), rule.get("pattern", ""),
+                      rule.get("type") or "any", amount_range, rule["category"], str(rule.get("priority", 0)))
+    console.print(table if rules else "[yellow]No category rules yet.[/yellow]")
+
+    action = questionary.select("Category rules:", choices=["Add Rule", "Remove Rule", "Back"]).ask()
+    if action == "Add Rule":
+        match = questionary.select("Match descriptions by:", choices=[MATCH_SUBSTRING, MATCH_REGEX]).ask()
+        rule = {
+            "pattern": questionary.text("Text or regular expression to look for in the description:").ask() or "",
+            "match": match,
+            "category": questionary.text("Category to assign:").ask() or ""
+        }
+        kind = questionary.select("Applies to:", choices=["any", "expense", "income"]).ask()
+        if kind != "any":
+            rule["type"] = kind
+        try:
+            for key, prompt in (("min_paisa", "Minimum amount (blank for none):"),
+                                ("max_paisa", "Maximum amount (blank for none):")):
+                text = (questionary.text(prompt).ask() or "").strip()
+                if text:
+                    rule[key] = int(round(float(text) * 100))
+            priority = (questionary.text("Priority (higher wins, default 0):").ask() or "").strip()
+            if priority:
+                rule["priority"] = int(priority)
+            save_rules(rules + [rule])
+        except ValueError as e:
+            console.print(f"[red]Rule not saved: {e}[/red]")
+            return
+        console.print("[green]Rule added. Use 'Recategorize History' to apply it to past transactions.[/green]")
+    elif action == "Remove Rule" and rules:
+        choice = questionary.select(
+            "Rule to remove:",
+            choices=[questionary.Choice(f"{n}. {r.get('pattern', '')} -> {r['category']}", value=n - 1)
+                     for n, r in enumerate(rules, 1)]
+        ).ask()
+        if choice is not None:
+            save_rules(rules[:choice] + rules[choice + 1:])
+            console.print("[green]Rule removed.[/green]")
+
+
+def recategorize_history(ledger_path="database/transactions.txt"):
+    """CLI command that re-applies the category rules to every past transaction."""
+    if not load_rules():
+        console.print("[yellow]No category rules yet. Add some under 'Manage Category Rules'.[/yellow]")
+        return
+    if not questionary.confirm("Re-apply the category rules to every past transaction?").ask():
+        console.print("[red]Recategorization cancelled by user.[/red]")
+        return
+    changed = recategorize_ledger(ledger_path, load_classifier())
+    console.print(f"[green]Recategorized {changed} transactions.[/green]")
@@ -0,0 +1,59 @@
+import threading
+import traceback
+
+from features.data_management import backup_store
+
+# How often the dashboard process snapshots the database directory
+BACKUP_INTERVAL_SECONDS = 30 * 60
+
+_scheduler_lock = threading.Lock()
+_scheduler_thread = None
+_stop_event = threading.Event()
+last_result = {"manifest_id": None, "stats": None, "error": None}
+
+
+def _run_once():
+    """Takes one snapshot (if anything changed) and applies retention."""
+    try:
+        manifest, stats = backup_store.create_snapshot(skip_if_unchanged=True)
+        if manifest is not None:
+            last_result["manifest_id"] = manifest["id"]
+            backup_store.prune_snapshots()
+        last_result["stats"] = stats
+        last_result["error"] = None
+    except Exception as e:
+        last_result["error"] = str(e)
+        traceback.print_exc()
+
+
+def _loop(interval_seconds):
+    # Snapshot right away, then on every interval until stopped
+    while True:
+        _run_once()
+        if _stop_event.wait(interval_seconds):
+            break
+
+
+def start_background_backups(interval_seconds=BACKUP_INTERVAL_SECONDS):
+    """
+    Starts the backup thread for this process if it is not running yet.
+
+    Safe to call on every Streamlit rerun: only the first call starts a
+    thread. Chunking and compression run on that daemon thread, never on
+    the thread that is rendering the page.
+    """
+    global _scheduler_thread
+    with _scheduler_lock:
+        if _scheduler_thread is not None and _scheduler_thread.is_alive():
+            return _scheduler_thread
+        _stop_event.clear()
+        _scheduler_thread = threading.Thread(
+            target=_loop, args=(interval_seconds,), name="hisaab-backup", daemon=True
+        )
+        _scheduler_thread.start()
+        return _scheduler_thread
+
+
+def stop_background_backups():
+    """Signals the backup thread to exit after its current snapshot."""
+    _stop_event.set()
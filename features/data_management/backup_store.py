@@ -0,0 +1,425 @@
+import functools
+import hashlib
+import json
+import os
+import time
+import zlib
+from datetime import datetime
+
+from features.diagnostics import instrumentation
+from features.ledger import ledger
+
+DATABASE_DIR = "database"
+
+# Content-addressed backup store:
+#   backups/store/chunks/<ab>/<digest>   zlib-compressed chunk contents
+#   backups/store/manifests/<id>.json    one small manifest per snapshot
+STORE_DIR = os.path.join("backups", "store")
+CHUNKS_DIR = os.path.join(STORE_DIR, "chunks")
+MANIFESTS_DIR = os.path.join(STORE_DIR, "manifests")
+
+# Chunks are cut on line boundaries chosen by the content of the line, so an
+# edit or an append only changes the chunks around it. With a 1-in-512 cut
+# chance per line, a JSON-lines ledger gets ~60 KB chunks on average.
+MIN_CHUNK_BYTES = 16 * 1024
+MAX_CHUNK_BYTES = 512 * 1024
+BOUNDARY_MASK = 0x1FF
+# Chunk ids are truncated SHA-256 digests (160 bits, as in git) to keep manifests small
+DIGEST_CHARS = 40
+
+# A snapshot is retried if files change while it is being read
+SNAPSHOT_ATTEMPTS = 5
+SNAPSHOT_RETRY_DELAY = 0.05
+
+# Retention tiers: keep the KEEP_LAST most recent snapshots, plus the newest
+# snapshot of each of the last N days/weeks/months
+KEEP_LAST = 10
+KEEP_DAILY = 7
+KEEP_WEEKLY = 4
+KEEP_MONTHLY = 12
+
+
+def _store_locked(function):
+    """
+    Runs function holding the store's lock (backups/store/.store.lock), across
+    threads and processes: pruning deletes chunks no manifest references,
+    which includes the chunks of a snapshot still being written.
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        os.makedirs(STORE_DIR, exist_ok=True)
+        with ledger.locked(os.path.join(STORE_DIR, "store")):
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+def _chunk_path(digest):
+    return os.path.join(CHUNKS_DIR, digest[:2], digest)
+
+
+def split_chunks(data: bytes):
+    """
+    Splits bytes into content-defined chunks that end on line boundaries.
+
+    Returns:
+        list: (offset, length) pairs covering all of data.
+    """
+    chunks = []
+    start = 0
+    pos = 0
+    size = len(data)
+    while pos < size:
+        newline = data.find(b"\n", pos)
+        line_end = size if newline == -1 else newline + 1
+        chunk_len = line_end - start
+        if chunk_len >= MAX_CHUNK_BYTES or (
+            chunk_len >= MIN_CHUNK_BYTES and zlib.crc32(data[pos:line_end]) & BOUNDARY_MASK == 0
+        ):
+            chunks.append((start, chunk_len))
+            start = line_end
+        pos = line_end
+    if start < size:
+        chunks.append((start, size - start))
+    return chunks
+
+
+def _store_chunk(data: bytes, stats):
+    """Writes a chunk unless the store already has it. Returns its digest."""
+    digest = hashlib.sha256(data).hexdigest()[:DIGEST_CHARS]
+    path = _chunk_path(digest)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        compressed = zlib.compress(data, 6)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(compressed)
+        os.replace(tmp_path, path)
+        stats["new_chunks"] += 1
+        stats["bytes_written"] += len(compressed)
+    else:
+        stats["reused_chunks"] += 1
+    return digest
+
+
+def _verified_prefix(data: bytes, previous_chunks):
+    """
+    Returns how many of the previous snapshot's chunks are still an exact
+    prefix of data, and the byte offset where they end.
+
+    The last previous chunk is never reused: it was cut by end-of-file rather
+    than by a content boundary, so appended data belongs in the same chunk.
+    """
+    offset = 0
+    count = 0
+    for digest, length in previous_chunks[:-1]:
+        piece = data[offset:offset + length]
+        if len(piece) != length or hashlib.sha256(piece).hexdigest()[:DIGEST_CHARS] != digest:
+            break
+        offset += length
+        count += 1
+    return count, offset
+
+
+def discover_data_files(database_dir=DATABASE_DIR):
+    """
+    Lists every data file directly under the database directory: the CLI
+    ledger and budgets, each user's transactions/budgets/settings files and
+    users.txt. Temporary files and derived caches in subdirectories are skipped.
+    """
+    if not os.path.isdir(database_dir):
+        return []
+    files = []
+    for name in sorted(os.listdir(database_dir)):
+        path = os.path.join(database_dir, name)
+        if name.startswith(".") or name.endswith(".tmp") or not os.path.isfile(path):
+            continue
+        files.append(path.replace(os.sep, "/"))
+    return files
+
+
+def _signature(st):
+    return (st.st_size, st.st_mtime_ns)
+
+
+def _read_consistent(file_paths, previous_files):
+    """
+    Reads the files that changed since the previous snapshot, making sure no
+    file was modified while the set was being read.
+
+    Every file is stat'ed before and after the reads; if any signature moved,
+    a writer got in between and the whole set is read again. This gives a
+    point-in-time view across files without writers having to take locks.
+
+    Returns:
+        dict: path -> (stat_result, bytes or None if unchanged since last snapshot)
+    """
+    for _ in range(SNAPSHOT_ATTEMPTS):
+        before = {}
+        for path in file_paths:
+            try:
+                before[path] = os.stat(path)
+            except FileNotFoundError:
+                continue
+
+        contents = {}
+        for path, st in before.items():
+            previous = previous_files.get(path)
+            if previous and (previous["size"], previous["mtime_ns"]) == _signature(st):
+                contents[path] = (st, None)
+                continue
+            try:
+                with open(path, "rb") as f:
+                    contents[path] = (st, f.read())
+            except FileNotFoundError:
+                break
+
+        after = {}
+        for path in before:
+            try:
+                after[path] = _signature(os.stat(path))
+            except FileNotFoundError:
+                pass
+        if len(contents) == len(before) and after == {p: _signature(st) for p, st in before.items()}:
+            return contents
+        time.sleep(SNAPSHOT_RETRY_DELAY)
+
+    raise RuntimeError("Data files kept changing while taking the snapshot; try again.")
+
+
+def _snapshot_file(st, data, previous_entry, stats):
+    """Builds the manifest entry for one file, storing only new chunks."""
+    if data is None:
+        stats["reused_chunks"] += len(previous_entry["chunks"])
+        return previous_entry
+
+    chunks = []
+    offset = 0
+    if previous_entry:
+        reused, offset = _verified_prefix(data, previous_entry["chunks"])
+        chunks.extend(previous_entry["chunks"][:reused])
+        stats["reused_chunks"] += reused
+
+    tail = data[offset:]
+    for start, length in split_chunks(tail):
+        chunks.append([_store_chunk(tail[start:start + length], stats), length])
+
+    return {
+        "size": len(data),
+        "mtime_ns": st.st_mtime_ns,
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "chunks": chunks
+    }
+
+
+def list_snapshots():
+    """Returns manifests of all retained snapshots, newest first."""
+    if not os.path.isdir(MANIFESTS_DIR):
+        return []
+    manifests = []
+    for name in os.listdir(MANIFESTS_DIR):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(MANIFESTS_DIR, name), "r") as f:
+                manifests.append(json.load(f))
+        except (json.JSONDecodeError, OSError):
+            continue
+    manifests.sort(key=lambda m: m["created"], reverse=True)
+    return manifests
+
+
+@instrumentation.timed()
+@_store_locked
+def create_snapshot(file_paths=None, skip_if_unchanged=False):
+    """
+    Snapshots the given files into the store, writing only chunks the store
+    does not already have.
+
+    Args:
+        file_paths (list): Paths (relative to the project root) to back up.
+            Defaults to every file found by discover_data_files().
+        skip_if_unchanged (bool): Don't write a manifest when no file changed
+            since the latest snapshot (used by the background scheduler).
+
+    Returns:
+        tuple: (manifest, stats) where stats counts new/reused chunks,
+        bytes written, missing files and the elapsed milliseconds. The
+        manifest is None when the snapshot was skipped.
+    """
+    started = time.perf_counter()
+    if file_paths is None:
+        file_paths = discover_data_files()
+    os.makedirs(MANIFESTS_DIR, exist_ok=True)
+    snapshots = list_snapshots()
+    previous_files = snapshots[0]["files"] if snapshots else {}
+
+    contents = _read_consistent(file_paths, previous_files)
+    stats = {
+        "new_chunks": 0,
+        "reused_chunks": 0,
+        "bytes_written": 0,
+        "missing": [path for path in file_paths if path not in contents]
+    }
+
+    unchanged = set(contents) == set(previous_files) and all(data is None for _, data in contents.values())
+    if skip_if_unchanged and unchanged:
+        stats["elapsed_ms"] = (time.perf_counter() - started) * 1000
+        return None, stats
+
+    files = {}
+    for file_path in file_paths:
+        if file_path in contents:
+            st, data = contents[file_path]
+            files[file_path] = _snapshot_file(st, data, previous_files.get(file_path), stats)
+
+    now = datetime.now()
+    snapshot_id = now.strftime("%Y%m%d_%H%M%S_%f")
+    manifest = {"id": snapshot_id, "created": now.isoformat(timespec="microseconds"), "files": files}
+    manifest_path = os.path.join(MANIFESTS_DIR, f"{snapshot_id}.json")
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f, separators=(",", ":"))
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+    stats["bytes_written"] += os.path.getsize(manifest_path)
+    stats["elapsed_ms"] = (time.perf_counter() - started) * 1000
+    return manifest, stats
+
+
+def _read_chunk(digest):
+    """Reads and decompresses a chunk, checking it still matches its digest."""
+    with open(_chunk_path(digest), "rb") as f:
+        try:
+            data = zlib.decompress(f.read())
+        except zlib.error:
+            raise ValueError(f"Backup chunk {digest} is corrupted")
+    if hashlib.sha256(data).hexdigest()[:DIGEST_CHARS] != digest:
+        raise ValueError(f"Backup chunk {digest} is corrupted")
+    return data
+
+
+def _load_manifest(snapshot_id):
+    with open(os.path.join(MANIFESTS_DIR, f"{snapshot_id}.json"), "r") as f:
+        return json.load(f)
+
+
+def _assemble_file(entry, out):
+    """Writes a file's chunks to out and returns the SHA-256 of what was written."""
+    file_hash = hashlib.sha256()
+    for digest, _ in entry["chunks"]:
+        data = _read_chunk(digest)
+        file_hash.update(data)
+        if out is not None:
+            out.write(data)
+    return file_hash.hexdigest()
+
+
+def verify_snapshot(snapshot_id):
+    """
+    Checks that every file of a snapshot can be rebuilt and matches the
+    checksum recorded when it was taken.
+
+    Returns:
+        list: (path, problem) pairs; empty if the snapshot is intact.
+    """
+    problems = []
+    for file_path, entry in _load_manifest(snapshot_id)["files"].items():
+        try:
+            file_hash = _assemble_file(entry, None)
+        except (OSError, ValueError) as e:
+            problems.append((file_path, str(e)))
+            continue
+        if "sha256" in entry and file_hash != entry["sha256"]:
+            problems.append((file_path, "checksum mismatch"))
+    return problems
+
+
+@instrumentation.timed(rows=len)
+@_store_locked
+def restore_snapshot(snapshot_id, target_root="."):
+    """
+    Rebuilds every file of a snapshot from its chunks.
+
+    All files are first assembled into temporary files and checked against
+    the SHA-256 recorded in the manifest; only when every file verifies are
+    they swapped in, so a damaged backup never overwrites live data.
+
+    Returns:
+        list: The restored file paths.
+    """
+    manifest = _load_manifest(snapshot_id)
+
+    staged = []
+    try:
+        for file_path, entry in manifest["files"].items():
+            destination = os.path.join(target_root, file_path)
+            os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+            tmp_path = destination + ".restore.tmp"
+            staged.append((file_path, tmp_path, destination))
+            with open(tmp_path, "wb") as out:
+                file_hash = _assemble_file(entry, out)
+            if "sha256" in entry and file_hash != entry["sha256"]:
+                raise ValueError(f"Checksum mismatch for {file_path}; restore aborted")
+    except Exception:
+        for _, tmp_path, _ in staged:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        raise
+
+    for _, tmp_path, destination in staged:
+        os.replace(tmp_path, destination)
+    return [file_path for file_path, _, _ in staged]
+
+
+def _select_retained(snapshots):
+    """Picks the snapshot ids kept by the daily/weekly/monthly tiers."""
+    keep = {manifest["id"] for manifest in snapshots[:KEEP_LAST]}
+
+    tiers = [
+        (KEEP_DAILY, lambda d: d.date()),
+        (KEEP_WEEKLY, lambda d: d.isocalendar()[:2]),
+        (KEEP_MONTHLY, lambda d: (d.year, d.month)),
+    ]
+    for limit, bucket_of in tiers:
+        seen_buckets = set()
+        for manifest in snapshots:  # newest first, so each bucket keeps its newest
+            bucket = bucket_of(datetime.fromisoformat(manifest["created"]))
+            if bucket in seen_buckets:
+                continue
+            if len(seen_buckets) >= limit:
+                break
+            seen_buckets.add(bucket)
+            keep.add(manifest["id"])
+    return keep
+
+
+@_store_locked
+def prune_snapshots():
+    """
+    Applies the retention tiers, then deletes chunks no retained snapshot uses.
+
+    Returns:
+        tuple: (removed snapshot ids, number of chunks deleted)
+    """
+    snapshots = list_snapshots()
+    keep = _select_retained(snapshots)
+
+    removed = []
+    referenced = set()
+    for manifest in snapshots:
+        if manifest["id"] in keep:
+            for entry in manifest["files"].values():
+                referenced.update(digest for digest, _ in entry["chunks"])
+        else:
+            os.remove(os.path.join(MANIFESTS_DIR, f"{manifest['id']}.json"))
+            removed.append(manifest["id"])
+
+    deleted_chunks = 0
+    if removed and os.path.isdir(CHUNKS_DIR):
+        for prefix in os.listdir(CHUNKS_DIR):
+            prefix_dir = os.path.join(CHUNKS_DIR, prefix)
+            for digest in os.listdir(prefix_dir):
+                if digest not in referenced:
+                    os.remove(os.path.join(prefix_dir, digest))
+                    deleted_chunks += 1
+    return removed, deleted_chunks
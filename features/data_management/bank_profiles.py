@@ -0,0 +1,314 @@
+import csv
+import io
+import json
+import os
+from datetime import date, datetime
+
+# Extra, user-defined profiles can be dropped into this file (a JSON list of
+# profile dicts with the same keys as BANK_PROFILES below).
+CUSTOM_PROFILES_FILE = "database/bank_profiles.json"
+SNIFF_BYTES = 4096
+SNIFF_ROWS = 20
+
+# Each profile describes one bank's CSV dialect.
+#   columns:      field -> accepted header names (matched case-insensitively)
+#   date_format:  strptime format of the date column
+#   decimal:      decimal separator used in amounts
+#   thousands:    thousands separator used in amounts ("" for none)
+#   sign:         how income and expense are told apart
+#                   "type_column"  - a Type column says expense / income
+#                   "signed"       - negative amounts are expenses
+#                   "inverted"     - positive amounts are expenses (card statements)
+#                   "debit_credit" - separate debit and credit columns
+BANK_PROFILES = [
+    {
+        "name": "hisaab_export",
+        "label": "HisaabX export (Date, Type, Category/Source, Description, Amount)",
+        "delimiter": ",",
+        "columns": {
+            "date": ["Date"],
+            "type": ["Type"],
+            "category": ["Category/Source"],
+            "description": ["Description"],
+            "amount": ["Amount"],
+        },
+        "date_format": "%Y-%m-%d",
+        "decimal": ".",
+        "thousands": "",
+        "sign": "type_column",
+    },
+    {
+        "name": "debit_credit",
+        "label": "Bank statement with separate Debit / Credit columns",
+        "delimiter": ",",
+        "columns": {
+            "date": ["Transaction Date", "Date", "Txn Date", "Value Date"],
+            "description": ["Description", "Narration", "Details", "Particulars"],
+            "debit": ["Debit", "Withdrawal", "Withdrawals", "Dr"],
+            "credit": ["Credit", "Deposit", "Deposits", "Cr"],
+        },
+        "date_format": "%d/%m/%Y",
+        "decimal": ".",
+        "thousands": ",",
+        "sign": "debit_credit",
+    },
+    {
+        "name": "signed_amount",
+        "label": "Single signed Amount column (negative = expense)",
+        "delimiter": ",",
+        "columns": {
+            "date": ["Date", "Transaction Date", "Booking Date"],
+            "description": ["Description", "Narration", "Details", "Payee"],
+            "amount": ["Amount", "Amount (PKR)"],
+        },
+        "date_format": "%d/%m/%Y",
+        "decimal": ".",
+        "thousands": ",",
+        "sign": "signed",
+    },
+    {
+        "name": "signed_amount_eu",
+        "label": "Semicolon separated, comma decimals (1.234,50)",
+        "delimiter": ";",
+        "columns": {
+            "date": ["Date", "Booking Date", "Value Date"],
+            "description": ["Description", "Details", "Payee"],
+            "amount": ["Amount"],
+        },
+        "date_format": "%d.%m.%Y",
+        "decimal": ",",
+        "thousands": ".",
+        "sign": "signed",
+    },
+    {
+        "name": "credit_card",
+        "label": "Credit card statement (positive = purchase)",
+        "delimiter": ",",
+        "columns": {
+            "date": ["Posting Date", "Transaction Date", "Date"],
+            "description": ["Merchant", "Description"],
+            "amount": ["Amount", "Billing Amount"],
+        },
+        "date_format": "%m/%d/%Y",
+        "decimal": ".",
+        "thousands": ",",
+        "sign": "inverted",
+    },
+]
+
+
+def load_profiles():
+    """Returns the built-in profiles followed by any custom ones on disk."""
+    profiles = list(BANK_PROFILES)
+    if os.path.exists(CUSTOM_PROFILES_FILE):
+        try:
+            with open(CUSTOM_PROFILES_FILE, "r") as f:
+                profiles.extend(json.load(f))
+        except (json.JSONDecodeError, OSError):
+            pass
+    return profiles
+
+
+def _resolve_columns(profile, header):
+    """
+    Maps each profile field to its column index in this file's header.
+    Returns None if a required field is missing.
+    """
+    positions = {name.strip().lower(): i for i, name in enumerate(header)}
+    resolved = {}
+    for field, aliases in profile["columns"].items():
+        for alias in aliases:
+            if alias.lower() in positions:
+                resolved[field] = positions[alias.lower()]
+                break
+    required = {"date", "description"}
+    required |= {"debit", "credit"} if profile["sign"] == "debit_credit" else {"amount"}
+    if profile["sign"] == "type_column":
+        required.add("type")
+    if not required <= resolved.keys():
+        return None
+    return resolved
+
+
+def _make_amount_parser(decimal_sep, thousands_sep):
+    """Builds a str -> signed paisa function for one number style."""
+    table = {ord(" "): None, ord(" "): None}
+    if thousands_sep:
+        table[ord(thousands_sep)] = None
+    if decimal_sep != ".":
+        table[ord(decimal_sep)] = "."
+
+    def parse_amount(text):
+        text = text.strip()
+        if not text:
+            return 0
+        negative = text.startswith("(") and text.endswith(")")
+        if negative:
+            text = text[1:-1]
+        value = int(round(float(text.translate(table)) * 100))
+        return -value if negative else value
+
+    return parse_amount
+
+
+def _make_date_parser(date_format):
+    """Picks the fastest parser for a date format, returning ISO strings."""
+    if date_format == "%Y-%m-%d":
+        return lambda text: date.fromisoformat(text.strip()).isoformat()
+    return lambda text: datetime.strptime(text.strip(), date_format).date().isoformat()
+
+
+def compile_profile(profile, header):
+    """
+    Compiles a profile against a file header into a specialized row parser.
+
+    All per-profile decisions (column positions, date and number format,
+    sign convention) are made here once, so the returned function does no
+    lookups on the profile while parsing rows.
+
+    Args:
+        profile (dict): One of the profile dicts from load_profiles().
+        header (list): The header row of the file being imported.
+
+    Returns:
+        function or None: row (list of str) -> transaction dict, raising
+        ValueError for rows that cannot be parsed. None if the header does
+        not fit the profile.
+    """
+    columns = _resolve_columns(profile, header)
+    if columns is None:
+        return None
+
+    parse_date = _make_date_parser(profile["date_format"])
+    parse_amount = _make_amount_parser(profile["decimal"], profile["thousands"])
+    date_col = columns["date"]
+    description_col = columns["description"]
+    category_col = columns.get("category")
+
+    def category_of(row):
+        if category_col is None or category_col >= len(row) or not row[category_col].strip():
+            return "Other"
+        return row[category_col].strip()
+
+    sign = profile["sign"]
+    if sign == "debit_credit":
+        debit_col, credit_col = columns["debit"], columns["credit"]
+
+        def signed_amount(row):
+            return parse_amount(row[credit_col]) - parse_amount(row[debit_col])
+    elif sign == "type_column":
+        amount_col, type_col = columns["amount"], columns["type"]
+
+        def signed_amount(row):
+            amount = abs(parse_amount(row[amount_col]))
+            kind = row[type_col].strip().lower()
+            if kind not in ("expense", "income"):
+                raise ValueError(f"invalid transaction type '{kind}'")
+            return amount if kind == "income" else -amount
+    elif sign == "inverted":
+        amount_col = columns["amount"]
+
+        def signed_amount(row):
+            return -parse_amount(row[amount_col])
+    else:
+        amount_col = columns["amount"]
+
+        def signed_amount(row):
+            return parse_amount(row[amount_col])
+
+    def parse_row(row):
+        try:
+            amount_paisa = signed_amount(row)
+            transaction_date = parse_date(row[date_col])
+            description = row[description_col].strip()
+        except IndexError:
+            raise ValueError("row has fewer columns than the header")
+        if amount_paisa == 0:
+            raise ValueError("amount is zero")
+        return {
+            "date": transaction_date,
+            "type": "income" if amount_paisa > 0 else "expense",
+            "category_or_source": category_of(row),
+            "description": description,
+            "amount_paisa": abs(amount_paisa)
+        }
+
+    return parse_row
+
+
+def detect_profile(file_path: str, profiles=None):
+    """
+    Sniffs the first few KB of a CSV file and picks the profile that fits it.
+
+    Profiles whose headers match are tried on the sampled rows, and the one
+    that parses the most rows wins (this is what separates dd/mm from mm/dd).
+
+    Returns:
+        tuple: (profile, delimiter) or (None, delimiter) if nothing fits.
+    """
+    with open(file_path, "r", newline="", encoding="utf-8-sig") as f:
+        sample = f.read(SNIFF_BYTES)
+
+    try:
+        delimiter = csv.Sniffer().sniff(sample, delimiters=",;\t|").delimiter
+    except csv.Error:
+        delimiter = ","
+
+    rows = list(csv.reader(io.StringIO(sample), delimiter=delimiter))
+    if not rows:
+        return None, delimiter
+    header, sample_rows = rows[0], [r for r in rows[1:SNIFF_ROWS + 1] if r]
+    # The last sampled row may have been cut off by the byte limit
+    if len(sample) == SNIFF_BYTES and len(sample_rows) > 1:
+        sample_rows = sample_rows[:-1]
+
+    best_profile, best_score = None, (-1, -1)
+    for profile in profiles or load_profiles():
+        if profile.get("delimiter", delimiter) != delimiter:
+            continue
+        parse_row = compile_profile(profile, header)
+        if parse_row is None:
+            continue
+        parsed = 0
+        for row in sample_rows:
+            try:
+                parse_row(row)
+                parsed += 1
+            except ValueError:
+                pass
+        # Prefer more parsed rows, then profiles that claim more columns
+        score = (parsed, len(profile["columns"]))
+        if score > best_score:
+            best_profile, best_score = profile, score
+
+    return best_profile, delimiter
+
+
+def parse_statement(file_path: str, profile, delimiter: str):
+    """
+    Parses a whole statement with a compiled profile.
+
+    Args:
+        delimiter (str): The sniffed delimiter (see detect_profile), used
+            only when the profile does not declare its own.
+
+    Returns:
+        tuple: (transactions, errors) where errors is a list of
+        (row_number, message) for rows that were skipped.
+    """
+    transactions = []
+    errors = []
+    with open(file_path, "r", newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f, delimiter=profile.get("delimiter", delimiter))
+        header = next(reader, None)
+        parse_row = compile_profile(profile, header or [])
+        if parse_row is None:
+            raise ValueError(f"File header does not match profile '{profile['name']}'")
+        for row_num, row in enumerate(reader, 2):
+            if not row:
+                continue
+            try:
+                transactions.append(parse_row(row))
+            except ValueError as e:
+                errors.append((row_num, str(e)))
+    return transactions, errors
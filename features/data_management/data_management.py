@@ -1,19 +1,50 @@
+import calendar
 import csv
+import json
 import os
 from datetime import datetime
 from rich.console import Console
+from rich.table import Table
+from features.data_management.reconcile import reconcile
+from features.data_management import bank_profiles
+from features.data_management import integrity
+from features.categorization import rules
+from features.ledger import ledger
+from features.diagnostics import instrumentation
+from features.search import query
 
 # Assuming the TRANSACTIONS_FILE path is relative to the project root
 TRANSACTIONS_FILE = "database/transactions.txt"
 console = Console()
 
+@instrumentation.timed(rows=len)
 def _read_all_transactions():
     """Reads all transactions from the transactions file."""
     transactions = []
     try:
         with open(TRANSACTIONS_FILE, "r") as f:
             for line in f:
-                parts = line.strip().split(',')
+                line = line.strip()
+                if not line:
+                    continue
+                if line.startswith("{"):
+                    # JSON-lines format written by transactions._save_transaction
+                    data = ledger.decode_line(line)
+                    if data is None:
+                        continue
+                    try:
+                        transactions.append({
+                            "date": data["date"],
+                            "type": data["type"],
+                            "category_or_source": data.get("category_or_source", data.get("category", "")),
+                            "description": data.get("description", ""),
+                            "amount_paisa": int(data["amount_paisa"])
+                        })
+                    except (KeyError, ValueError):
+                        continue
+                    continue
+                # Legacy comma-separated format
+                parts = line.split(',')
                 if len(parts) == 5:
                     transactions.append({
                         "date": parts[0],
@@ -28,6 +59,59 @@ def _read_all_transactions():
         console.print(f"[red]Error reading transactions file: {e}[/red]")
     return transactions
 
+@instrumentation.timed(rows=len)
+def _query_transactions(filters=None):
+    """
+    Reads the transactions matching filters (see features.search.query),
+    oldest first, through the ledger index.
+    """
+    if not os.path.exists(TRANSACTIONS_FILE):
+        console.print(f"[yellow]No transactions file found at {TRANSACTIONS_FILE}.[/yellow]")
+        return []
+    transactions = []
+    for data in query.execute(TRANSACTIONS_FILE, filters, newest_first=False)["transactions"]:
+        try:
+            transactions.append({
+                "date": data["date"],
+                "type": data["type"],
+                "category_or_source": ledger.category_of(data),
+                "description": data.get("description", ""),
+                "amount_paisa": int(data["amount_paisa"])
+            })
+        except (KeyError, ValueError):
+            continue
+    return transactions
+
+@instrumentation.timed(rows=int)
+def write_transactions_csv(file_path: str, transactions=None, filters=None) -> int:
+    """
+    Writes transactions to a CSV file without printing anything.
+
+    Args:
+        transactions (list): What to write; default the ones matching filters
+            (see features.search.query), all of them without filters.
+
+    Returns:
+        int: How many transactions were written. Raises OSError on write
+        errors, ValueError for invalid filters.
+    """
+    if transactions is None:
+        transactions = _query_transactions(filters)
+    with open(file_path, "w", newline="") as csvfile:
+        fieldnames = ["Date", "Type", "Category/Source", "Description", "Amount"]
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+
+        writer.writeheader()
+        for t in transactions:
+            writer.writerow({
+                "Date": t["date"],
+                "Type": t["type"],
+                "Category/Source": t["category_or_source"],
+                "Description": t["description"],
+                "Amount": f"{t['amount_paisa'] / 100:.2f}" # Convert paisa back to currency format
+            })
+    return len(transactions)
+
 def export_transactions_to_csv(file_path: str):
     """
     Exports all transactions to a CSV file.
@@ -35,46 +119,35 @@ def export_transactions_to_csv(file_path: str):
     Args:
         file_path (str): The path to the output CSV file.
     """
-    transactions = _read_all_transactions()
+    transactions = _query_transactions()
 
     if not transactions:
         console.print("[yellow]No transactions to export.[/yellow]")
         return
 
     try:
-        with open(file_path, "w", newline="") as csvfile:
-            fieldnames = ["Date", "Type", "Category/Source", "Description", "Amount"]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-
-            writer.writeheader()
-            for t in transactions:
-                writer.writerow({
-                    "Date": t["date"],
-                    "Type": t["type"],
-                    "Category/Source": t["category_or_source"],
-                    "Description": t["description"],
-                    "Amount": f"{t['amount_paisa'] / 100:.2f}" # Convert paisa back to currency format
-                })
+        write_transactions_csv(file_path, transactions)
         console.print(f"[green]Transactions successfully exported to {file_path}[/green]")
     except IOError as e:
         console.print(f"[red]Error writing to CSV file: {e}[/red]")
     except Exception as e:
         console.print(f"[red]An unexpected error occurred: {e}[/red]")
 
-import json
-
-def export_transactions_to_json(file_path: str):
+@instrumentation.timed(rows=int)
+def write_transactions_json(file_path: str, transactions=None, filters=None) -> int:
     """
-    Exports all transactions to a JSON file.
+    Writes transactions to a JSON file without printing anything.
 
     Args:
-        file_path (str): The path to the output JSON file.
-    """
-    transactions = _read_all_transactions()
+        transactions (list): What to write; default the ones matching filters
+            (see features.search.query), all of them without filters.
 
-    if not transactions:
-        console.print("[yellow]No transactions to export.[/yellow]")
-        return
+    Returns:
+        int: How many transactions were written. Raises OSError on write
+        errors, ValueError for invalid filters.
+    """
+    if transactions is None:
+        transactions = _query_transactions(filters)
 
     # Convert amount_paisa to actual currency for JSON export
     transactions_for_json = []
@@ -84,42 +157,58 @@ def export_transactions_to_json(file_path: str):
         del t_copy["amount_paisa"] # Remove paisa version
         transactions_for_json.append(t_copy)
 
+    with open(file_path, "w") as jsonfile:
+        json.dump(transactions_for_json, jsonfile, indent=4)
+    return len(transactions_for_json)
+
+def export_transactions_to_json(file_path: str):
+    """
+    Exports all transactions to a JSON file.
+
+    Args:
+        file_path (str): The path to the output JSON file.
+    """
+    transactions = _query_transactions()
+
+    if not transactions:
+        console.print("[yellow]No transactions to export.[/yellow]")
+        return
+
     try:
-        with open(file_path, "w") as jsonfile:
-            json.dump(transactions_for_json, jsonfile, indent=4)
+        write_transactions_json(file_path, transactions)
         console.print(f"[green]Transactions successfully exported to {file_path}[/green]")
     except IOError as e:
         console.print(f"[red]Error writing to JSON file: {e}[/red]")
     except Exception as e:
         console.print(f"[red]An unexpected error occurred: {e}[/red]")
 
-from features.budgets.budget import _load_budgets # Import budget loading function
+from features.budgets import budget_engine, budget_repository
 
-def export_monthly_report_to_json(file_path: str):
+@instrumentation.timed()
+def build_monthly_report(month: str = None):
     """
-    Exports a comprehensive monthly report to a JSON file.
-    This report includes transactions, budget summary, and basic analytics.
+    Builds the monthly report: the month's transactions, totals and budget performance.
 
     Args:
-        file_path (str): The path to the output JSON file.
+        month (str): "YYYY-MM", defaults to the current month.
+
+    Returns:
+        dict or None: The report, or None when there are no transactions or budgets at all.
     """
-    transactions = _read_all_transactions()
-    budgets = _load_budgets()
+    budgets = budget_repository.load_budgets()
+    has_transactions = os.path.exists(TRANSACTIONS_FILE) and query.execute(TRANSACTIONS_FILE, limit=0)["records"] > 0
 
-    if not transactions and not budgets:
-        console.print("[yellow]No data to generate a monthly report.[/yellow]")
-        return
+    if not has_transactions and not budgets:
+        return None
 
-    current_month = datetime.now().month
-    current_year = datetime.now().year
-    current_month_str = datetime.now().strftime("%Y-%m")
+    current_month_str = month or datetime.now().strftime("%Y-%m")
 
-    # 1. Transaction Summary for current month
-    monthly_transactions = [
-        t for t in transactions
-        if datetime.strptime(t["date"], "%Y-%m-%d").month == current_month and
-           datetime.strptime(t["date"], "%Y-%m-%d").year == current_year
-    ]
+    # 1. Transaction Summary for the month, read through the ledger index's date order
+    year, month_number = map(int, current_month_str.split("-"))
+    monthly_transactions = _query_transactions({
+        "date_from": f"{current_month_str}-01",
+        "date_to": f"{current_month_str}-{calendar.monthrange(year, month_number)[1]:02d}"
+    }) if has_transactions else []
 
     total_income_paisa = sum(t["amount_paisa"] for t in monthly_transactions if t["type"] == "income")
     total_expense_paisa = sum(t["amount_paisa"] for t in monthly_transactions if t["type"] == "expense")
@@ -133,31 +222,19 @@ def export_monthly_report_to_json(file_path: str):
         del t_copy["amount_paisa"]
         transactions_for_report.append(t_copy)
 
-    # 2. Budget Summary for current month
+    # 2. Budget Summary for the month
     budget_summary = {}
-    spent_by_category = {category: 0 for category in budgets.keys()}
-
-    for transaction in monthly_transactions:
-        if transaction["type"] == "expense":
-            category = transaction["category_or_source"]
-            if category in spent_by_category:
-                spent_by_category[category] += transaction["amount_paisa"]
-
-    for category, budget_amount_paisa in budgets.items():
-        spent_amount_paisa = spent_by_category.get(category, 0)
-        remaining_paisa = budget_amount_paisa - spent_amount_paisa
-        utilization_percent = (spent_amount_paisa / budget_amount_paisa) * 100 if budget_amount_paisa > 0 else 0
-
-        budget_summary[category] = {
-            "budgeted": f"{budget_amount_paisa / 100:.2f}",
-            "spent": f"{spent_amount_paisa / 100:.2f}",
-            "remaining": f"{remaining_paisa / 100:.2f}",
-            "utilization_percent": f"{utilization_percent:.2f}%",
-            "status": "OVER" if utilization_percent >= 100 else ("Warning" if utilization_percent >= 70 else "OK")
+    for status in budget_engine.evaluate_budgets(budgets, TRANSACTIONS_FILE, current_month_str):
+        budget_summary[status["category"]] = {
+            "budgeted": f"{status['budget_paisa'] / 100:.2f}",
+            "spent": f"{status['spent_paisa'] / 100:.2f}",
+            "remaining": f"{status['remaining_paisa'] / 100:.2f}",
+            "utilization_percent": f"{status['utilization_percent']:.2f}%",
+            "status": status["status"]
         }
 
     # 3. Assemble the full report
-    monthly_report = {
+    return {
         "report_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "month": current_month_str,
         "summary": {
@@ -176,6 +253,20 @@ def export_monthly_report_to_json(file_path: str):
         "recommendations": []
     }
 
+def export_monthly_report_to_json(file_path: str):
+    """
+    Exports a comprehensive monthly report to a JSON file.
+    This report includes transactions, budget summary, and basic analytics.
+
+    Args:
+        file_path (str): The path to the output JSON file.
+    """
+    monthly_report = build_monthly_report()
+
+    if monthly_report is None:
+        console.print("[yellow]No data to generate a monthly report.[/yellow]")
+        return
+
     try:
         with open(file_path, "w") as jsonfile:
             json.dump(monthly_report, jsonfile, indent=4)
@@ -187,9 +278,34 @@ def export_monthly_report_to_json(file_path: str):
 
 import questionary # Import questionary for user confirmation
 
+def _display_reconciliation(result):
+    """Shows the matched / new / ambiguous buckets produced by reconcile()."""
+    summary = Table(title="Reconciliation Summary")
+    summary.add_column("Bucket", style="cyan")
+    summary.add_column("Rows", justify="right")
+    summary.add_column("Action", style="white")
+    summary.add_row("[green]Matched[/green]", str(len(result["matched"])), "Already in ledger, will be skipped")
+    summary.add_row("[blue]New[/blue]", str(len(result["new"])), "Will be imported")
+    summary.add_row("[yellow]Ambiguous[/yellow]", str(len(result["ambiguous"])), "Several possible matches, needs review")
+    console.print(summary)
+
+    if result["ambiguous"]:
+        table = Table(title="Ambiguous Rows (first 10)")
+        table.add_column("Date", style="cyan", no_wrap=True)
+        table.add_column("Description", style="white")
+        table.add_column("Amount", justify="right")
+        table.add_column("Possible Ledger Matches", style="yellow")
+        for entry in result["ambiguous"][:10]:
+            row = entry["row"]
+            candidates = "; ".join(f"{c['date']} {c['description'] or '-'}" for c in entry["candidates"])
+            table.add_row(row["date"], row["description"], f"Rs {row['amount_paisa'] / 100:.2f}", candidates)
+        console.print(table)
+
+
 def import_transactions_from_csv(file_path: str):
     """
-    Imports transactions from a CSV file, with validation and duplicate checking.
+    Imports transactions from a CSV file, with validation and fuzzy
+    reconciliation against the existing ledger.
 
     Args:
         file_path (str): The path to the input CSV file.
@@ -198,15 +314,8 @@ def import_transactions_from_csv(file_path: str):
         console.print(f"[red]Error: CSV file not found at {file_path}[/red]")
         return
 
-    existing_transactions = _read_all_transactions()
-    existing_transaction_set = set()
-    for t in existing_transactions:
-        # Create a unique tuple for each transaction to easily check for duplicates
-        existing_transaction_set.add((t["date"], t["type"], t["category_or_source"], t["description"], t["amount_paisa"]))
-
     transactions_to_import = []
     skipped_count = 0
-    imported_count = 0
 
     try:
         with open(file_path, "r", newline="") as csvfile:
@@ -236,18 +345,11 @@ def import_transactions_from_csv(file_path: str):
                     # Validate amount
                     amount_float = float(amount_str)
                     if amount_float <= 0:
-                        console.print(f"[yellow]Skipping row {row_num}: Amount must be a positive number.[/red]")
+                        console.print(f"[yellow]Skipping row {row_num}: Amount must be a positive number.[/yellow]")
                         skipped_count += 1
                         continue
                     amount_paisa = int(round(amount_float * 100))
 
-                    # Check for duplicate
-                    transaction_tuple = (date_str, transaction_type, category_or_source, description, amount_paisa)
-                    if transaction_tuple in existing_transaction_set:
-                        console.print(f"[yellow]Skipping row {row_num}: Duplicate transaction found.[/yellow]")
-                        skipped_count += 1
-                        continue
-
                     transactions_to_import.append({
                         "date": date_str,
                         "type": transaction_type,
@@ -266,101 +368,213 @@ def import_transactions_from_csv(file_path: str):
                     console.print(f"[yellow]Skipping row {row_num}: Unexpected error - {ex}.[/yellow]")
                     skipped_count += 1
 
-        if not transactions_to_import:
-            console.print("[yellow]No new valid transactions to import.[/yellow]")
-            return
+        _reconcile_and_import(transactions_to_import, skipped_count)
 
-        console.print(f"\n[bold blue]Import Summary:[/bold blue]")
-        console.print(f"  [green]Valid transactions ready to import: {len(transactions_to_import)}[/green]")
-        console.print(f"  [yellow]Transactions skipped (duplicates or errors): {skipped_count}[/yellow]")
+    except FileNotFoundError:
+        console.print(f"[red]Error: CSV file not found at {file_path}[/red]")
+    except Exception as e:
+        console.print(f"[red]An unexpected error occurred during CSV import: {e}[/red]")
 
-        confirm = questionary.confirm("Do you want to proceed with importing these transactions?").ask()
 
-        if confirm:
-            with open(TRANSACTIONS_FILE, "a") as f:
-                for t in transactions_to_import:
-                    f.write(f"{t['date']},{t['type']},{t['category_or_source']},{t['description']},{t['amount_paisa']}\n")
-                    imported_count += 1
-            console.print(f"[green]Successfully imported {imported_count} new transactions.[/green]")
+def import_bank_statement(file_path: str):
+    """
+    Imports a bank statement CSV using an auto-detected bank profile,
+    then reconciles it against the ledger like import_transactions_from_csv.
+
+    Args:
+        file_path (str): The path to the bank statement CSV file.
+    """
+    if not os.path.exists(file_path):
+        console.print(f"[red]Error: CSV file not found at {file_path}[/red]")
+        return
+
+    try:
+        profiles = bank_profiles.load_profiles()
+        detected, delimiter = bank_profiles.detect_profile(file_path, profiles)
+
+        choices = [questionary.Choice(p["label"], value=p) for p in profiles]
+        default = next((c for c in choices if c.value is detected), None)
+        if detected:
+            console.print(f"[blue]Detected format: {detected['label']}[/blue]")
         else:
+            console.print("[yellow]Could not detect the statement format automatically.[/yellow]")
+        profile = questionary.select("Statement format:", choices=choices, default=default).ask()
+        if profile is None:
             console.print("[red]Import cancelled by user.[/red]")
+            return
 
-    except FileNotFoundError:
-        console.print(f"[red]Error: CSV file not found at {file_path}[/red]")
+        transactions_to_import, errors = bank_profiles.parse_statement(file_path, profile, delimiter)
+        for row_num, message in errors[:20]:
+            console.print(f"[yellow]Skipping row {row_num}: {message}.[/yellow]")
+        if len(errors) > 20:
+            console.print(f"[yellow]... and {len(errors) - 20} more rows with errors.[/yellow]")
+
+        _reconcile_and_import(transactions_to_import, len(errors))
+
+    except ValueError as ve:
+        console.print(f"[red]Error: {ve}[/red]")
     except Exception as e:
-        console.print(f"[red]An unexpected error occurred during CSV import: {e}[/red]")
+        console.print(f"[red]An unexpected error occurred during statement import: {e}[/red]")
+
+
+def _reconcile_and_import(transactions_to_import, skipped_count):
+    """
+    Reconciles parsed rows against the ledger, shows the buckets and appends
+    the rows the user confirms.
+    """
+    if not transactions_to_import:
+        console.print("[yellow]No valid transactions found to import.[/yellow]")
+        return
+
+    result = reconcile(transactions_to_import, _read_all_transactions())
+
+    console.print(f"\n[bold blue]Import Summary:[/bold blue]")
+    _display_reconciliation(result)
+    console.print(f"  [yellow]Rows skipped (validation errors): {skipped_count}[/yellow]")
+
+    rows_to_write = list(result["new"])
+    if result["ambiguous"]:
+        include_ambiguous = questionary.confirm(
+            f"Import the {len(result['ambiguous'])} ambiguous rows as new transactions too?",
+            default=False
+        ).ask()
+        if include_ambiguous:
+            rows_to_write.extend(entry["row"] for entry in result["ambiguous"])
+
+    if not rows_to_write:
+        console.print("[yellow]No new transactions to import.[/yellow]")
+        return
+
+    # Bank categories rarely match ours; the user's category rules decide
+    recategorized = rules.categorize(rows_to_write, rules.load_classifier())
+    if recategorized:
+        console.print(f"  [blue]Rows categorized by your category rules: {recategorized}[/blue]")
+
+    confirm = questionary.confirm(f"Do you want to proceed with importing {len(rows_to_write)} transactions?").ask()
+
+    if confirm:
+        ledger.append_records(TRANSACTIONS_FILE, rows_to_write)
+        console.print(f"[green]Successfully imported {len(rows_to_write)} new transactions.[/green]")
+    else:
+        console.print("[red]Import cancelled by user.[/red]")
+
+@instrumentation.timed(rows=lambda result: result["new"] + result["matched"] + result["ambiguous"])
+def import_statement(file_path: str, profile_name: str = None, include_ambiguous: bool = False, dry_run: bool = False):
+    """
+    Imports a CSV export or bank statement without any prompts, for scripts.
+
+    Rows are parsed with the named (or auto-detected) bank profile,
+    reconciled against the ledger, categorized by the category rules and
+    appended in one write.
+
+    Args:
+        file_path (str): CSV file to import.
+        profile_name (str): A profile "name" from bank_profiles; detected if None.
+        include_ambiguous (bool): Also import rows that might already be in the ledger.
+        dry_run (bool): Report what would be imported without writing.
+
+    Returns:
+        dict: profile, errors (list of (row_number, message)), matched, new,
+        ambiguous, imported and categorized counts.
+    """
+    profiles = bank_profiles.load_profiles()
+    detected, delimiter = bank_profiles.detect_profile(file_path, profiles)
+    if profile_name:
+        profile = next((p for p in profiles if p["name"] == profile_name), None)
+        if profile is None:
+            raise ValueError(f"Unknown statement format '{profile_name}'")
+    elif detected is None:
+        raise ValueError("Could not detect the statement format automatically")
+    else:
+        profile = detected
+
+    transactions_to_import, errors = bank_profiles.parse_statement(file_path, profile, delimiter)
+    result = reconcile(transactions_to_import, _read_all_transactions()) if transactions_to_import else \
+        {"matched": [], "new": [], "ambiguous": []}
+    rows_to_write = list(result["new"])
+    if include_ambiguous:
+        rows_to_write.extend(entry["row"] for entry in result["ambiguous"])
+    categorized = rules.categorize(rows_to_write, rules.load_classifier())
+    if rows_to_write and not dry_run:
+        ledger.append_records(TRANSACTIONS_FILE, rows_to_write)
+
+    return {
+        "profile": profile["name"],
+        "errors": errors,
+        "matched": len(result["matched"]),
+        "new": len(result["new"]),
+        "ambiguous": len(result["ambiguous"]),
+        "imported": 0 if dry_run else len(rows_to_write),
+        "categorized": categorized
+    }
+
 
 import zipfile
-import shutil
 import glob
+from features.data_management import backup_store
 
-# Define backup directory and files to backup
+# Backups cover every data file under database/ (see backup_store.discover_data_files)
 BACKUP_DIR = "backups"
-BUDGET_FILE = "database/budget.txt" # Assuming this is the correct path for budget file
-FILES_TO_BACKUP = [TRANSACTIONS_FILE, BUDGET_FILE]
-MAX_BACKUPS = 10
+LEGACY_BACKUP_PATTERN = "finance_tracker_backup_*.zip"
 
 def create_backup():
     """
-    Creates a timestamped zip archive of the database files and manages old backups.
+    Creates an incremental snapshot of all database files in the backup store
+    and applies the daily/weekly/monthly retention policy.
     """
-    os.makedirs(BACKUP_DIR, exist_ok=True)
-
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_filename = os.path.join(BACKUP_DIR, f"finance_tracker_backup_{timestamp}.zip")
-
     try:
-        with zipfile.ZipFile(backup_filename, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for file_path in FILES_TO_BACKUP:
-                if os.path.exists(file_path):
-                    zipf.write(file_path, os.path.basename(file_path))
-                else:
-                    console.print(f"[yellow]Warning: File not found for backup: {file_path}[/yellow]")
-        console.print(f"[green]Backup created successfully: {backup_filename}[/green]")
-        _cleanup_old_backups()
+        manifest, stats = backup_store.create_snapshot()
+        for file_path in stats["missing"]:
+            console.print(f"[yellow]Warning: File not found for backup: {file_path}[/yellow]")
+        console.print(f"[green]Backup created successfully: {manifest['id']} ({len(manifest['files'])} files)[/green]")
+        console.print(
+            f"  {stats['new_chunks']} new chunks, {stats['reused_chunks']} reused, "
+            f"{stats['bytes_written'] / 1024:.1f} KB written in {stats['elapsed_ms']:.0f} ms"
+        )
+        removed, deleted_chunks = backup_store.prune_snapshots()
+        if removed:
+            console.print(f"[yellow]Removed {len(removed)} old snapshots ({deleted_chunks} unused chunks).[/yellow]")
     except Exception as e:
         console.print(f"[red]Error creating backup: {e}[/red]")
 
-def _cleanup_old_backups():
-    """
-    Deletes oldest backup files, keeping only the MAX_BACKUPS most recent ones.
-    """
-    backup_files = sorted(glob.glob(os.path.join(BACKUP_DIR, "finance_tracker_backup_*.zip")), key=os.path.getmtime)
-    if len(backup_files) > MAX_BACKUPS:
-        for old_backup in backup_files[:-MAX_BACKUPS]:
-            try:
-                os.remove(old_backup)
-                console.print(f"[yellow]Removed old backup: {old_backup}[/yellow]")
-            except Exception as e:
-                console.print(f"[red]Error removing old backup {old_backup}: {e}[/red]")
+def _restore_legacy_zip(backup_path):
+    """Restores one of the old full zip backups into the database directory."""
+    with zipfile.ZipFile(backup_path, 'r') as zipf:
+        # Ensure the database directory exists
+        database_dir = os.path.dirname(TRANSACTIONS_FILE)
+        if not database_dir:
+            database_dir = "database" # Fallback
+        os.makedirs(database_dir, exist_ok=True)
+        zipf.extractall(database_dir)
+        return zipf.namelist()
 
 def restore_from_backup():
     """
-    Restores database files from a selected backup archive.
+    Restores database files from a selected snapshot (or a legacy zip backup).
     """
-    if not os.path.exists(BACKUP_DIR):
-        console.print(f"[red]Backup directory '{BACKUP_DIR}' not found.[/red]")
-        return
-
-    backup_files = sorted(glob.glob(os.path.join(BACKUP_DIR, "finance_tracker_backup_*.zip")), key=os.path.getmtime, reverse=True)
+    snapshots = backup_store.list_snapshots()
+    legacy_backups = sorted(glob.glob(os.path.join(BACKUP_DIR, LEGACY_BACKUP_PATTERN)), key=os.path.getmtime, reverse=True)
 
-    if not backup_files:
+    if not snapshots and not legacy_backups:
         console.print("[yellow]No backups found to restore.[/yellow]")
         return
 
-    selected_backup = questionary.select(
-        "Select a backup to restore:",
-        choices=[os.path.basename(f) for f in backup_files]
-    ).ask()
+    choices = []
+    for manifest in snapshots:
+        created = datetime.fromisoformat(manifest["created"]).strftime("%Y-%m-%d %H:%M:%S")
+        choices.append(questionary.Choice(f"{created} ({len(manifest['files'])} files)", value=("snapshot", manifest["id"])))
+    for path in legacy_backups:
+        choices.append(questionary.Choice(f"{os.path.basename(path)} (legacy zip)", value=("zip", path)))
 
-    if not selected_backup:
+    selected = questionary.select("Select a backup to restore:", choices=choices).ask()
+
+    if not selected:
         console.print("[red]Restore cancelled by user.[/red]")
         return
 
-    backup_path = os.path.join(BACKUP_DIR, selected_backup)
-
+    kind, backup_ref = selected
     confirm = questionary.confirm(
-        f"This will overwrite current data with the contents of '{selected_backup}'. Are you sure?"
+        "This will overwrite current data with the contents of the selected backup. Are you sure?"
     ).ask()
 
     if not confirm:
@@ -368,103 +582,115 @@ def restore_from_backup():
         return
 
     try:
-        with zipfile.ZipFile(backup_path, 'r') as zipf:
-            # Ensure the database directory exists
-            database_dir = os.path.dirname(TRANSACTIONS_FILE)
-            if not database_dir:
-                database_dir = "database" # Fallback
-            os.makedirs(database_dir, exist_ok=True)
-            zipf.extractall(database_dir)
-            
-            # Check which files were restored
-            restored_files = zipf.namelist()
-            console.print(f"[green]Successfully restored {', '.join(restored_files)} from {selected_backup}[/green]")
+        if kind == "snapshot":
+            restored_files = backup_store.restore_snapshot(backup_ref)
+        else:
+            restored_files = _restore_legacy_zip(backup_ref)
+        console.print(f"[green]Successfully restored {', '.join(restored_files)}[/green]")
 
-    except FileNotFoundError:
-        console.print(f"[red]Error: Backup file not found at {backup_path}[/red]")
+    except FileNotFoundError as e:
+        console.print(f"[red]Error: Backup data missing: {e}[/red]")
+    except ValueError as e:
+        console.print(f"[red]Backup failed verification, nothing was restored: {e}[/red]")
     except Exception as e:
         console.print(f"[red]An unexpected error occurred during restore: {e}[/red]")
 
     
-def validate_data_integrity():
+def validate_data_integrity(show_samples: bool = True):
     """
-    Checks the integrity of transactions.txt and budgets.txt files.
-    Reports any malformed entries or inconsistencies.
+    Checks every file in the database directory, whatever its format, and
+    writes a machine-readable report to integrity.REPORT_FILE.
+
+    Args:
+        show_samples (bool): Print the sampled problem lines for each file.
+
+    Returns:
+        dict: The report produced by integrity.validate_database().
     """
     console.print("\n[bold blue]Running Data Integrity Check...[/bold blue]")
-    issues_found = False
+    report = integrity.validate_database()
+
+    table = Table(title="Data Integrity Report")
+    table.add_column("File", style="cyan")
+    table.add_column("Format", style="magenta")
+    table.add_column("Records", justify="right")
+    table.add_column("Issues", style="white")
+    for path, result in report["files"].items():
+        if result["issues"]:
+            issues = ", ".join(f"[red]{kind}: {count}[/red]" for kind, count in result["issues"].items())
+        else:
+            issues = "[green]OK[/green]"
+        table.add_row(path, result["format"], str(result["records"]), issues)
+    console.print(table)
+
+    if show_samples:
+        for path, result in report["files"].items():
+            for sample in result["samples"]:
+                console.print(f"[red]Issue in {path}, line {sample['line']}: {sample['issue']}[/red] {sample['text']}")
 
-    # Validate transactions.txt
-    console.print("\n[bold underline]Validating Transactions Data:[/bold underline]")
     try:
-        with open(TRANSACTIONS_FILE, "r") as f:
-            for i, line in enumerate(f, 1):
-                parts = line.strip().split(',')
-                if len(parts) != 5:
-                    console.print(f"[red]Issue in transactions.txt, line {i}: Malformed line (expected 5 parts, got {len(parts)}): {line.strip()}[/red]")
-                    issues_found = True
-                    continue
-                
-                date_str, type_str, category_or_source, description, amount_paisa_str = parts
+        integrity.write_report(report)
+    except OSError as e:
+        console.print(f"[red]Could not write integrity report: {e}[/red]")
 
-                # Validate Date
-                try:
-                    datetime.strptime(date_str, "%Y-%m-%d")
-                except ValueError:
-                    console.print(f"[red]Issue in transactions.txt, line {i}: Invalid date format '{date_str}'. Expected YYYY-MM-DD.[/red]")
-                    issues_found = True
-
-                # Validate Type
-                if type_str not in ["expense", "income"]:
-                    console.print(f"[red]Issue in transactions.txt, line {i}: Invalid transaction type '{type_str}'. Expected 'expense' or 'income'.[/red]")
-                    issues_found = True
-                
-                # Validate Amount
-                try:
-                    amount_paisa = int(amount_paisa_str)
-                    if amount_paisa <= 0:
-                        console.print(f"[red]Issue in transactions.txt, line {i}: Amount must be positive, got '{amount_paisa_str}'.[/red]")
-                        issues_found = True
-                except ValueError:
-                    console.print(f"[red]Issue in transactions.txt, line {i}: Invalid amount '{amount_paisa_str}'. Expected integer (paisa).[/red]")
-                    issues_found = True
+    if report["ok"]:
+        console.print(f"\n[bold green]Data integrity check completed in {report['elapsed_ms']:.0f} ms: No issues found![/bold green]")
+    else:
+        console.print("\n[bold red]Data integrity check completed: Issues found. Please review the errors above.[/bold red]")
+    return report
 
-    except FileNotFoundError:
-        console.print(f"[yellow]transactions.txt not found. Skipping transaction validation.[/yellow]")
-    except Exception as e:
-        console.print(f"[red]Error reading transactions.txt: {e}[/red]")
-        issues_found = True
 
-    # Validate budgets.txt
-    console.print("\n[bold underline]Validating Budgets Data:[/bold underline]")
-    try:
-        with open(BUDGET_FILE, "r") as f:
-            for i, line in enumerate(f, 1):
-                parts = line.strip().split(',')
-                if len(parts) != 2:
-                    console.print(f"[red]Issue in budgets.txt, line {i}: Malformed line (expected 2 parts, got {len(parts)}): {line.strip()}[/red]")
-                    issues_found = True
-                    continue
-                
-                category, amount_paisa_str = parts
+def _ledger_files():
+    """The CLI ledger plus every per-user dashboard ledger."""
+    database_dir = os.path.dirname(TRANSACTIONS_FILE)
+    return sorted(glob.glob(os.path.join(database_dir, "transactions*.txt")))
 
-                # Validate Amount
-                try:
-                    amount_paisa = int(amount_paisa_str)
-                    if amount_paisa <= 0:
-                        console.print(f"[red]Issue in budgets.txt, line {i}: Budget amount must be positive, got '{amount_paisa_str}'.[/red]")
-                        issues_found = True
-                except ValueError:
-                    console.print(f"[red]Issue in budgets.txt, line {i}: Invalid budget amount '{amount_paisa_str}'. Expected integer (paisa).[/red]")
-                    issues_found = True
+def verify_ledger_checksums():
+    """
+    Streams through every ledger file checking each record's checksum.
+    """
+    console.print("\n[bold blue]Verifying Ledger Checksums...[/bold blue]")
+    table = Table(title="Ledger Checksums")
+    table.add_column("File", style="cyan")
+    table.add_column("OK", justify="right", style="green")
+    table.add_column("No checksum", justify="right", style="yellow")
+    table.add_column("Corrupt", justify="right", style="red")
+    table.add_column("First corrupt lines", style="white")
+
+    corrupt_total = 0
+    for path in _ledger_files():
+        result = ledger.verify_file(path)
+        corrupt_total += result[ledger.RECORD_CORRUPT]
+        first_lines = ", ".join(str(s["line"]) for s in result["corrupt_samples"][:5])
+        table.add_row(path, str(result[ledger.RECORD_OK]), str(result[ledger.RECORD_LEGACY]),
+                      str(result[ledger.RECORD_CORRUPT]), first_lines or "-")
+    console.print(table)
+
+    if corrupt_total:
+        console.print(f"[bold red]{corrupt_total} corrupt records found. Use 'Repair Ledger' to salvage the rest.[/bold red]")
+    else:
+        console.print("[bold green]All ledger checksums are valid.[/bold green]")
 
-    except FileNotFoundError:
-        console.print(f"[yellow]budgets.txt not found. Skipping budget validation.[/yellow]")
-    except Exception as e:
-        console.print(f"[red]Error reading budgets.txt: {e}[/red]")
-        issues_found = True
+def repair_ledger():
+    """
+    Salvages every valid record from damaged ledger files and moves the
+    damaged lines to a quarantine file.
+    """
+    damaged = [path for path in _ledger_files() if ledger.verify_file(path, max_samples=0)[ledger.RECORD_CORRUPT]]
+    if not damaged:
+        console.print("[green]No damaged ledger files found.[/green]")
+        return
 
-    if not issues_found:
-        console.print("\n[bold green]Data integrity check completed: No issues found![/bold green]")
-    else:
-        console.print("\n[bold red]Data integrity check completed: Issues found. Please review the errors above.[/bold red]")
\ No newline at end of file
+    confirm = questionary.confirm(
+        f"Repair {len(damaged)} damaged ledger file(s)? Damaged lines will be moved to {ledger.QUARANTINE_DIR}."
+    ).ask()
+    if not confirm:
+        console.print("[red]Repair cancelled by user.[/red]")
+        return
+
+    for path in damaged:
+        result = ledger.repair_file(path)
+        console.print(
+            f"[green]{path}: kept {result['kept']} records, salvaged {result['salvaged']}, "
+            f"quarantined {result['quarantined']} lines to {result['quarantine_path']}[/green]"
+        )
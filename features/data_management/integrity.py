@@ -0,0 +1,386 @@
+import json
+import os
+import time
+from collections import Counter
+from datetime import date, datetime
+
+from features.ledger import ledger
+
+DATABASE_DIR = "database"
+REPORT_FILE = "database/cache/integrity_report.json"
+# Files larger than this are split into byte ranges and checked in parallel
+PARALLEL_THRESHOLD_BYTES = 8 * 1024 * 1024
+RANGE_BYTES = 4 * 1024 * 1024
+MAX_SAMPLES = 20
+SAMPLE_TEXT_CHARS = 200
+
+# Formats the validator knows how to check
+TRANSACTIONS_JSONL = "transactions_jsonl"   # transactions._save_transaction / dashboard
+TRANSACTIONS_CSV = "transactions_csv"       # legacy date,type,category,description,paisa
+BUDGETS_CSV_PAISA = "budgets_csv_paisa"     # budget.add_budget: category,paisa
+BUDGETS_CSV_RUPEES = "budgets_csv_rupees"   # dashboard: category,rupees (float)
+BUDGETS_JSONL = "budgets_jsonl"             # {"category": ..., "amount_paisa": ...}
+BUDGET_HISTORY_JSONL = "budget_history_jsonl"  # budget_history: amount plus effective_from
+JSON_DOCUMENT = "json_document"             # settings_<user>.json, users.txt
+UNKNOWN = "unknown"
+
+LINE_FORMATS = {
+    TRANSACTIONS_JSONL, TRANSACTIONS_CSV, BUDGETS_CSV_PAISA, BUDGETS_CSV_RUPEES, BUDGETS_JSONL,
+    BUDGET_HISTORY_JSONL
+}
+
+
+def detect_format(path):
+    """
+    Works out the format of a database file from its name and first line.
+    """
+    name = os.path.basename(path)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            first_line = ""
+            for line in f:
+                if line.strip():
+                    first_line = line.strip()
+                    break
+    except (OSError, UnicodeDecodeError):
+        return UNKNOWN
+
+    if name.endswith(".json") or name == "users.txt":
+        return JSON_DOCUMENT
+    if not first_line:
+        # Empty file: pick by name, there is nothing to check either way
+        return BUDGETS_CSV_PAISA if name.startswith("budget") else TRANSACTIONS_JSONL
+
+    if name.startswith("budget_history"):
+        return BUDGET_HISTORY_JSONL
+    if name.startswith("transactions"):
+        return TRANSACTIONS_JSONL if first_line.startswith("{") else TRANSACTIONS_CSV
+    if name.startswith("budget"):
+        if first_line.startswith("{"):
+            return BUDGETS_JSONL
+        # Per-user dashboard budgets store rupees as floats
+        return BUDGETS_CSV_RUPEES if name.startswith("budgets_") else BUDGETS_CSV_PAISA
+    if first_line.startswith("{"):
+        return JSON_DOCUMENT
+    return UNKNOWN
+
+
+def _valid_date(text):
+    try:
+        date.fromisoformat(text)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def _check_transaction_json(line):
+    if ledger.verify_line(line.encode("utf-8")) == ledger.RECORD_CORRUPT:
+        return "checksum_mismatch"
+    try:
+        t = json.loads(line)
+    except json.JSONDecodeError:
+        return "malformed_json"
+    if not isinstance(t, dict):
+        return "malformed_json"
+    if "category_or_source" not in t and "category" not in t:
+        return "missing_field"
+    for field in ("date", "type", "amount_paisa"):
+        if field not in t:
+            return "missing_field"
+    if not isinstance(t["date"], str) or not _valid_date(t["date"]):
+        return "invalid_date"
+    if t["type"] not in ("expense", "income"):
+        return "invalid_type"
+    if not isinstance(t["amount_paisa"], int) or isinstance(t["amount_paisa"], bool):
+        return "invalid_amount"
+    if t["amount_paisa"] <= 0:
+        return "non_positive_amount"
+    return None
+
+
+def _check_transaction_csv(line):
+    parts = line.split(",")
+    if len(parts) != 5:
+        return "malformed_line"
+    if not _valid_date(parts[0]):
+        return "invalid_date"
+    if parts[1] not in ("expense", "income"):
+        return "invalid_type"
+    try:
+        amount = int(parts[4])
+    except ValueError:
+        return "invalid_amount"
+    return "non_positive_amount" if amount <= 0 else None
+
+
+def _check_budget_csv(line, parse_amount):
+    parts = line.split(",")
+    if len(parts) != 2:
+        return "malformed_line"
+    try:
+        amount = parse_amount(parts[1])
+    except ValueError:
+        return "invalid_amount"
+    return "non_positive_amount" if amount <= 0 else None
+
+
+def _check_budget_json(line):
+    try:
+        entry = json.loads(line)
+    except json.JSONDecodeError:
+        return "malformed_json"
+    if not isinstance(entry, dict) or "category" not in entry or "amount_paisa" not in entry:
+        return "missing_field"
+    if not isinstance(entry["amount_paisa"], int):
+        return "invalid_amount"
+    return "non_positive_amount" if entry["amount_paisa"] <= 0 else None
+
+
+def _check_budget_history(line):
+    try:
+        entry = json.loads(line)
+    except json.JSONDecodeError:
+        return "malformed_json"
+    if not isinstance(entry, dict) or not {"category", "amount_paisa", "effective_from"} <= entry.keys():
+        return "missing_field"
+    if not _valid_date(entry["effective_from"]):
+        return "invalid_date"
+    if not isinstance(entry["amount_paisa"], int):
+        return "invalid_amount"
+    # 0 records that the budget was removed
+    return "negative_amount" if entry["amount_paisa"] < 0 else None
+
+
+LINE_CHECKS = {
+    TRANSACTIONS_JSONL: _check_transaction_json,
+    TRANSACTIONS_CSV: _check_transaction_csv,
+    BUDGETS_CSV_PAISA: lambda line: _check_budget_csv(line, int),
+    BUDGETS_CSV_RUPEES: lambda line: _check_budget_csv(line, float),
+    BUDGETS_JSONL: _check_budget_json,
+    BUDGET_HISTORY_JSONL: _check_budget_history,
+}
+
+
+def _validate_range(path, file_format, start, end, max_samples):
+    """
+    Checks every line that starts inside the byte range [start, end).
+
+    Runs in a worker process for large files, so it only takes and returns
+    plain picklable values.
+
+    Returns:
+        tuple: (lines seen, records checked, Counter of issues,
+        list of (line number within the range, issue, text) samples)
+    """
+    check = LINE_CHECKS[file_format]
+    issues = Counter()
+    samples = []
+    lines = 0
+    records = 0
+    with open(path, "rb") as f:
+        if start > 0:
+            f.seek(start - 1)
+            if f.read(1) != b"\n":
+                f.readline()  # This line started in the previous range
+        position = f.tell()
+        while position < end:
+            raw = f.readline()
+            if not raw:
+                break
+            position += len(raw)
+            lines += 1
+            line = raw.decode("utf-8", errors="replace").strip()
+            if not line:
+                continue
+            records += 1
+            issue = check(line)
+            if issue:
+                issues[issue] += 1
+                if len(samples) < max_samples:
+                    samples.append((lines, issue, line[:SAMPLE_TEXT_CHARS]))
+    return lines, records, issues, samples
+
+
+def _validate_json_document(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            document = json.load(f)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return 0, Counter({"malformed_json": 1}), [(1, "malformed_json", "")]
+    if not isinstance(document, (dict, list)):
+        return 1, Counter({"unexpected_structure": 1}), [(1, "unexpected_structure", str(document)[:SAMPLE_TEXT_CHARS])]
+    return 1, Counter(), []
+
+
+def _byte_ranges(size):
+    return [(start, min(start + RANGE_BYTES, size)) for start in range(0, size, RANGE_BYTES)]
+
+
+def _stamp(path, result, st):
+    """Records what the file was (st, from before it was checked), see _continue_file()."""
+    result.update(size=st.st_size, mtime_ns=st.st_mtime_ns, inode=st.st_ino)
+    if "lines" in result:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_ino == st.st_ino:
+                result["tail"] = ledger.tail_hash(f, st.st_size)
+                f.seek(max(0, st.st_size - 1))
+                result["ends_with_newline"] = st.st_size == 0 or f.read(1) == b"\n"
+    return result
+
+
+def validate_file(path, executor=None, max_samples=MAX_SAMPLES):
+    """
+    Validates one file and returns its section of the report.
+
+    Line-based files above PARALLEL_THRESHOLD_BYTES are split into byte
+    ranges that are checked concurrently on the given process pool.
+    """
+    file_format = detect_format(path)
+    result = {"format": file_format, "records": 0, "issues": {}, "samples": []}
+    st = os.stat(path)
+
+    if file_format == JSON_DOCUMENT:
+        records, issues, samples = _validate_json_document(path)
+        result["records"] = records
+        result["issues"] = dict(issues)
+        result["samples"] = [{"line": n, "issue": i, "text": t} for n, i, t in samples]
+        return _stamp(path, result, st)
+    if file_format not in LINE_FORMATS:
+        result["issues"] = {"unknown_format": 1}
+        return _stamp(path, result, st)
+
+    size = st.st_size
+    if executor is not None and size > PARALLEL_THRESHOLD_BYTES:
+        futures = [
+            executor.submit(_validate_range, path, file_format, start, end, max_samples)
+            for start, end in _byte_ranges(size)
+        ]
+        parts = [future.result() for future in futures]
+    else:
+        parts = [_validate_range(path, file_format, 0, size, max_samples)]
+
+    issues = Counter()
+    samples = []
+    lines_before = 0
+    for lines, records, part_issues, part_samples in parts:
+        result["records"] += records
+        issues.update(part_issues)
+        for local_line, issue, text in part_samples:
+            if len(samples) < max_samples:
+                samples.append({"line": lines_before + local_line, "issue": issue, "text": text})
+        lines_before += lines
+
+    result["issues"] = dict(issues)
+    result["samples"] = samples
+    result["lines"] = lines_before
+    return _stamp(path, result, st)
+
+
+def _continue_file(path, previous, max_samples):
+    """
+    Reuses a file's section of an earlier report when the file has not
+    changed since, or only checks what was appended to a line-based file.
+
+    Returns:
+        dict: The file's section of the report, or None if the file has to
+        be checked in full.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if not previous or previous.get("inode") != st.st_ino:
+        return None
+    if previous.get("size") == st.st_size and previous.get("mtime_ns") == st.st_mtime_ns:
+        return previous
+    old_size = previous.get("size", 0)
+    if previous.get("format") not in LINE_FORMATS or "tail" not in previous \
+            or not previous.get("ends_with_newline") or st.st_size <= old_size:
+        return None
+    with open(path, "rb") as f:
+        if ledger.tail_hash(f, old_size) != previous["tail"]:
+            return None  # Rewritten in place, not appended to
+
+    lines, records, issues, samples = _validate_range(path, previous["format"], old_size, st.st_size, max_samples)
+    result = dict(previous, records=previous["records"] + records, lines=previous["lines"] + lines)
+    result["issues"] = dict(Counter(previous["issues"]) + issues)
+    result["samples"] = (previous["samples"] + [
+        {"line": previous["lines"] + n, "issue": i, "text": t} for n, i, t in samples
+    ])[:max_samples]
+    return _stamp(path, result, st)
+
+
+def validate_database(database_dir=DATABASE_DIR, max_samples=MAX_SAMPLES, previous=None):
+    """
+    Validates every data file in the database directory.
+
+    Args:
+        database_dir (str): Directory to check.
+        max_samples (int): Problem lines to sample per file.
+        previous (dict): An earlier report (see load_report()). Files it
+            covers that have not changed are not read again, and of
+            line-based files that were only appended to just the new lines
+            are checked; this keeps the startup check fast on big ledgers.
+
+    Returns:
+        dict: A machine-readable report with per-file formats, record counts,
+        issue counts by type and the first max_samples samples, plus totals.
+    """
+    started = time.perf_counter()
+    paths = []
+    if os.path.isdir(database_dir):
+        for name in sorted(os.listdir(database_dir)):
+            path = os.path.join(database_dir, name)
+            if os.path.isfile(path) and not name.startswith(".") and not name.endswith(".tmp"):
+                paths.append(path)
+
+    previous_files = (previous or {}).get("files", {})
+    files = {}
+    unchecked = []
+    for p in paths:
+        key = p.replace(os.sep, "/")
+        files[key] = _continue_file(p, previous_files.get(key), max_samples)
+        if files[key] is None:
+            unchecked.append(p)
+
+    executor = None
+    if any(os.path.getsize(p) > PARALLEL_THRESHOLD_BYTES for p in unchecked):
+        # Imported here: the startup check almost never needs a process pool
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor()
+    try:
+        for p in unchecked:
+            files[p.replace(os.sep, "/")] = validate_file(p, executor, max_samples)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    totals = Counter()
+    for result in files.values():
+        totals.update(result["issues"])
+
+    return {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "ok": not totals,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        "totals": dict(totals),
+        "files": files
+    }
+
+
+def load_report(path=REPORT_FILE):
+    """The last report written by write_report(), or None."""
+    try:
+        with open(path, "r") as f:
+            report = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    return report if isinstance(report, dict) else None
+
+
+def write_report(report, path=REPORT_FILE):
+    """Writes the report as JSON for monitoring to pick up."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump(report, f, indent=2)
+    os.replace(path + ".tmp", path)
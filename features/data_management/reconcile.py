@@ -0,0 +1,170 @@
+import re
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import date
+from difflib import SequenceMatcher
+
+# How far apart (in days) a statement row and a ledger row may be and still match
+DATE_WINDOW_DAYS = 3
+# Minimum combined score for a ledger row to count as the same transaction
+MATCH_THRESHOLD = 0.6
+# If the two best candidates score within this margin, the row is ambiguous
+AMBIGUITY_MARGIN = 0.1
+# Used when one side has no description (hand-entered rows are often blank)
+EMPTY_DESCRIPTION_SIMILARITY = 0.6
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _normalize_description(description):
+    """Lowercases a description and reduces it to its alphanumeric tokens."""
+    return " ".join(_TOKEN_RE.findall((description or "").lower()))
+
+
+def description_similarity(a: str, b: str) -> float:
+    """
+    Scores how alike two (already normalized) descriptions are, from 0.0 to 1.0.
+
+    Token overlap catches reordered words ("POS DARAZ PK" vs "daraz pos"),
+    while the sequence ratio catches truncation and small typos.
+    """
+    if not a or not b:
+        return EMPTY_DESCRIPTION_SIMILARITY
+    if a == b:
+        return 1.0
+
+    tokens_a, tokens_b = set(a.split()), set(b.split())
+    jaccard = len(tokens_a & tokens_b) / len(tokens_a | tokens_b)
+
+    matcher = SequenceMatcher(None, a, b, autojunk=False)
+    # quick_ratio is an upper bound, so skip the expensive ratio when it cannot win
+    if matcher.quick_ratio() <= jaccard:
+        return jaccard
+    return max(jaccard, matcher.ratio())
+
+
+def _build_index(ledger):
+    """
+    Groups ledger rows into blocks keyed by (type, amount_paisa).
+
+    Each block keeps its date ordinals sorted so that the rows within
+    ±DATE_WINDOW_DAYS of a given date can be found with two bisections.
+    """
+    blocks = defaultdict(list)
+    for position, t in enumerate(ledger):
+        try:
+            ordinal = date.fromisoformat(t["date"]).toordinal()
+        except ValueError:
+            continue
+        blocks[(t["type"], t["amount_paisa"])].append((ordinal, position))
+
+    index = {}
+    for key, entries in blocks.items():
+        entries.sort()
+        index[key] = ([ordinal for ordinal, _ in entries], [position for _, position in entries])
+    return index
+
+
+def _score_candidates(row, index, ledger_descriptions, date_window_days):
+    """
+    Returns (score, days apart, ledger_position) for the ledger rows above
+    MATCH_THRESHOLD, best first; equal scores go to the closer date, then
+    to the earlier row, so ties always resolve the same way.
+    """
+    block = index.get((row["type"], row["amount_paisa"]))
+    if block is None:
+        return []
+
+    ordinals, positions = block
+    row_ordinal = date.fromisoformat(row["date"]).toordinal()
+    lo = bisect_left(ordinals, row_ordinal - date_window_days)
+    hi = bisect_right(ordinals, row_ordinal + date_window_days)
+
+    row_description = _normalize_description(row["description"])
+    scored = []
+    for i in range(lo, hi):
+        position = positions[i]
+        days_apart = abs(ordinals[i] - row_ordinal)
+        date_closeness = 1 - days_apart / (date_window_days + 1)
+        similarity = description_similarity(row_description, ledger_descriptions[position])
+        score = 0.7 * similarity + 0.3 * date_closeness
+        if score >= MATCH_THRESHOLD:
+            scored.append((score, days_apart, position))
+
+    scored.sort(key=lambda candidate: (-candidate[0], candidate[1], candidate[2]))
+    return scored
+
+
+def _is_duplicate(candidate, best, ledger, ledger_descriptions):
+    """True if a candidate is the same transaction as best, entered again (same score, date and description)."""
+    return candidate[0] == best[0] and ledger[candidate[2]]["date"] == ledger[best[2]]["date"] \
+        and ledger_descriptions[candidate[2]] == ledger_descriptions[best[2]]
+
+
+def reconcile(statement, ledger, date_window_days: int = DATE_WINDOW_DAYS):
+    """
+    Reconciles bank statement rows against the existing ledger.
+
+    Candidates are blocked by exact (type, amount) and a ±date_window_days
+    range looked up in a sorted date index, so each statement row is only
+    compared with the handful of ledger rows that could plausibly be the
+    same transaction. Every ledger row is matched at most once, best scores
+    first.
+
+    Args:
+        statement (list): Transaction dicts parsed from the bank file.
+        ledger (list): Transaction dicts already stored in the ledger.
+        date_window_days (int): Maximum date drift between matching rows.
+
+    Returns:
+        dict: "matched" (list of {"row", "ledger", "score"}), "new" (list of
+        rows not in the ledger) and "ambiguous" (list of {"row", "candidates"}).
+    """
+    index = _build_index(ledger)
+    ledger_descriptions = [_normalize_description(t["description"]) for t in ledger]
+
+    result = {"matched": [], "new": [], "ambiguous": []}
+    pairs = []
+    has_candidates = set()
+
+    for row_position, row in enumerate(statement):
+        candidates = _score_candidates(row, index, ledger_descriptions, date_window_days)
+        if not candidates:
+            result["new"].append(row)
+            continue
+
+        # Exact duplicates of the best candidate (the same purchase entered
+        # twice) are interchangeable, so only other rows can make it ambiguous
+        best = candidates[0]
+        rivals = [c for c in candidates[1:] if not _is_duplicate(c, best, ledger, ledger_descriptions)]
+        if rivals and best[0] - rivals[0][0] < AMBIGUITY_MARGIN:
+            result["ambiguous"].append({
+                "row": row,
+                "candidates": [ledger[position] for _, _, position in candidates[:3]]
+            })
+            continue
+
+        has_candidates.add(row_position)
+        pairs.extend((score, days_apart, row_position, position) for score, days_apart, position in candidates)
+
+    # Greedy one-to-one assignment, strongest pairs first, ties as in _score_candidates()
+    pairs.sort(key=lambda pair: (-pair[0], pair[1], pair[2], pair[3]))
+    claimed_ledger = set()
+    matched_rows = {}
+    for score, _, row_position, position in pairs:
+        if row_position in matched_rows or position in claimed_ledger:
+            continue
+        matched_rows[row_position] = (position, score)
+        claimed_ledger.add(position)
+
+    for row_position in sorted(has_candidates):
+        row = statement[row_position]
+        if row_position in matched_rows:
+            position, score = matched_rows[row_position]
+            result["matched"].append({"row": row, "ledger": ledger[position], "score": round(score, 3)})
+        else:
+            # Every candidate was claimed by a closer row, e.g. two identical
+            # purchases on the same day: this one is a separate transaction.
+            result["new"].append(row)
+
+    return result
@@ -0,0 +1,109 @@
+import questionary
+from rich.console import Console
+from rich.table import Table
+
+from features.diagnostics import instrumentation, profiler
+from features.service import client
+
+DEFAULT_EXPORT_FILE = "hisaab_metrics.prom"
+# Rows shown per table, slowest total first
+TOP_ENTRIES = 25
+
+console = Console()
+
+
+def _service_status():
+    """The ledger service's recorded timings, or None if it is not running."""
+    if not client.service_running():
+        return None
+    try:
+        return client.call("service.metrics")
+    except client.ServiceError:
+        return None
+
+
+def _timings_table(title, entries):
+    table = Table(title=title)
+    table.add_column("Function", style="cyan", overflow="fold")
+    table.add_column("Calls", justify="right")
+    table.add_column("Total ms", justify="right")
+    table.add_column("Mean ms", justify="right")
+    table.add_column("CPU ms", justify="right")
+    table.add_column("Slowest ms", justify="right")
+    table.add_column("Rows", justify="right")
+    for entry in entries[:TOP_ENTRIES]:
+        table.add_row(
+            entry["name"],
+            f"{entry['calls']:,}",
+            f"{entry['wall_s'] * 1000:,.1f}",
+            f"{entry['wall_s'] * 1000 / entry['calls']:,.2f}",
+            f"{entry['cpu_s'] * 1000:,.1f}",
+            f"{entry['max_wall_s'] * 1000:,.1f}",
+            f"{entry['rows']:,}" if entry["rows"] else ""
+        )
+    return table
+
+
+def _captures_table(captures):
+    table = Table(title="Slow dashboard reruns")
+    table.add_column("When", style="cyan", no_wrap=True)
+    table.add_column("Page", style="magenta")
+    table.add_column("Seconds", justify="right")
+    table.add_column("Samples", justify="right")
+    table.add_column("Collapsed stacks", style="white", overflow="fold")
+    for capture in captures[:TOP_ENTRIES]:
+        table.add_row(capture["created"], capture["name"], f"{capture['duration_s']:.2f}",
+                      str(capture["samples"]), capture["folded_path"])
+    return table
+
+
+def show_diagnostics():
+    """Hidden CLI screen: where this session's (and the ledger service's) time went."""
+    console.print("\n[bold blue]Diagnostics[/bold blue]")
+    sources = {}
+    local = instrumentation.snapshot()
+    if local:
+        sources[instrumentation.process()] = local
+        console.print(_timings_table("This session", local))
+    elif instrumentation.enabled():
+        console.print("[yellow]Nothing recorded in this session yet.[/yellow]")
+    else:
+        console.print(f"[yellow]Timing is off. Turn it on below, or start with "
+                      f"{instrumentation.ENABLE_ENV_VAR}=1 to record from the start.[/yellow]")
+
+    service = _service_status()
+    if service is not None:
+        if service["entries"]:
+            sources["service"] = service["entries"]
+            console.print(_timings_table(f"Ledger service (pid {service['pid']})", service["entries"]))
+        elif not service["enabled"]:
+            console.print(f"[yellow]The ledger service is not recording timings; start it with "
+                          f"{instrumentation.ENABLE_ENV_VAR}=1.[/yellow]")
+
+    captures = profiler.list_captures()
+    if captures:
+        console.print(_captures_table(captures))
+
+    toggle = "Turn Timing Off" if instrumentation.enabled() else "Turn Timing On"
+    action = questionary.select("Diagnostics:", choices=[toggle, "Export to Prometheus File", "Reset", "Back"]).ask()
+    if action == toggle:
+        if instrumentation.enabled():
+            instrumentation.disable()
+        else:
+            instrumentation.enable()
+        console.print(f"[green]Timing is now {'on' if instrumentation.enabled() else 'off'} for this session.[/green]")
+    elif action == "Export to Prometheus File":
+        if not sources:
+            console.print("[yellow]Nothing to export.[/yellow]")
+            return
+        path = questionary.text("Prometheus text file path:", default=DEFAULT_EXPORT_FILE).ask()
+        if path:
+            try:
+                instrumentation.write_prometheus(path, sources)
+            except OSError as e:
+                console.print(f"[red]Could not write {path}: {e}[/red]")
+                return
+            console.print(f"[green]Metrics written to {path}.[/green]")
+    elif action == "Reset":
+        instrumentation.reset()
+        console.print("[green]This session's timings were cleared.[/green]")
@@ -0,0 +1,255 @@
+"""
+Lightweight timing of the storage, aggregation and rendering hot paths.
+
+Functions are wrapped with @timed() or blocks with measure(); each records
+its call count, wall and CPU time and the rows it processed into an
+in-memory registry, per process (the CLI, a dashboard server, the ledger
+service). Times are inclusive: a timed function that calls another timed
+function counts the inner call's time too.
+
+Off by default, when the wrappers only check a flag. Turn it on with the
+HISAAB_INSTRUMENT=1 environment variable or enable(). With
+HISAAB_METRICS_FILE=path the registry is also written in the Prometheus
+text format when the process exits.
+"""
+import atexit
+import functools
+import os
+import threading
+import time
+
+ENABLE_ENV_VAR = "HISAAB_INSTRUMENT"
+METRICS_FILE_ENV_VAR = "HISAAB_METRICS_FILE"
+METRIC_PREFIX = "hisaab"
+
+_enabled = os.environ.get(ENABLE_ENV_VAR, "").strip() not in ("", "0")
+# The "process" label of this process's metrics, see set_process()
+_process = "cli"
+# name -> [calls, wall seconds, CPU seconds, rows, slowest call's wall seconds]
+_registry = {}
+_lock = threading.Lock()
+
+
+def enabled():
+    return _enabled
+
+
+def enable():
+    """Starts recording (already on if HISAAB_INSTRUMENT is set)."""
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    """Stops recording; what was recorded is kept until reset()."""
+    global _enabled
+    _enabled = False
+
+
+def set_process(label):
+    """Names this process ("cli", "dashboard", "service") in exported metrics."""
+    global _process
+    _process = label
+
+
+def process():
+    return _process
+
+
+def reset():
+    """Forgets everything recorded so far."""
+    with _lock:
+        _registry.clear()
+
+
+def record(name, wall_seconds, cpu_seconds, rows=0):
+    """Adds one call to the registry."""
+    with _lock:
+        entry = _registry.get(name)
+        if entry is None:
+            entry = _registry[name] = [0, 0.0, 0.0, 0, 0.0]
+        entry[0] += 1
+        entry[1] += wall_seconds
+        entry[2] += cpu_seconds
+        entry[3] += rows
+        if wall_seconds > entry[4]:
+            entry[4] = wall_seconds
+
+
+class _Span:
+    """A measured block; set .rows to the number of rows it processed."""
+
+    __slots__ = ("name", "rows", "_wall", "_cpu")
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+
+    def __enter__(self):
+        self._wall = time.perf_counter()
+        # CPU time of this thread only: the dashboard and the service run
+        # many requests at once
+        self._cpu = time.thread_time()
+        return self
+
+    def __exit__(self, *exc_info):
+        record(self.name, time.perf_counter() - self._wall, time.thread_time() - self._cpu, self.rows)
+        return False
+
+
+class _NullSpan:
+    """What measure() gives while recording is off: does nothing, ignores .rows."""
+
+    __slots__ = ()
+    rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def measure(name):
+    """
+    Context manager timing a block:
+
+        with instrumentation.measure("ledger.catch_up") as span:
+            ...
+            span.rows = parsed
+    """
+    return _Span(name) if _enabled else _NULL_SPAN
+
+
+def timed(name=None, rows=None, rows_arg=None):
+    """
+    Decorator recording every call of a function.
+
+    Args:
+        name (str): Registry name, default "<module>.<function>" with the
+            module's last dotted part (e.g. "budget_engine.month_totals").
+        rows (function): rows(result) -> number of rows the call processed.
+        rows_arg (str): Or the name of an argument whose len() is the rows
+            processed, for writes (e.g. "records").
+    """
+
+    def decorate(function):
+        label = name or f"{function.__module__.rsplit('.', 1)[-1]}.{function.__qualname__}"
+        code = function.__code__
+        arg_index = code.co_varnames[:code.co_argcount].index(rows_arg) if rows_arg else None
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            wall, cpu = time.perf_counter(), time.thread_time()
+            result = None
+            try:
+                result = function(*args, **kwargs)
+                return result
+            finally:
+                count = 0
+                try:
+                    if rows is not None and result is not None:
+                        count = rows(result)
+                    elif arg_index is not None:
+                        value = args[arg_index] if arg_index < len(args) else kwargs.get(rows_arg)
+                        count = len(value) if value is not None else 0
+                except TypeError:
+                    count = 0
+                record(label, time.perf_counter() - wall, time.thread_time() - cpu, count)
+
+        return wrapper
+
+    return decorate
+
+
+def snapshot():
+    """
+    Returns what was recorded, slowest total first.
+
+    Returns:
+        list: Dicts with name, calls, wall_s, cpu_s, rows and max_wall_s.
+    """
+    with _lock:
+        entries = [
+            {"name": name, "calls": calls, "wall_s": wall, "cpu_s": cpu, "rows": rows, "max_wall_s": slowest}
+            for name, (calls, wall, cpu, rows, slowest) in _registry.items()
+        ]
+    return sorted(entries, key=lambda entry: entry["wall_s"], reverse=True)
+
+
+def status():
+    """Whether recording is on, and what was recorded (for the ledger service)."""
+    return {"enabled": _enabled, "process": _process, "pid": os.getpid(), "entries": snapshot()}
+
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# (metric suffix, type, help, entry key)
+_METRICS = [
+    ("calls_total", "counter", "Calls of an instrumented function.", "calls"),
+    ("wall_seconds_total", "counter", "Wall-clock time spent in an instrumented function.", "wall_s"),
+    ("cpu_seconds_total", "counter", "CPU time spent in an instrumented function.", "cpu_s"),
+    ("rows_total", "counter", "Rows processed by an instrumented function.", "rows"),
+    ("wall_seconds_max", "gauge", "Slowest single call of an instrumented function.", "max_wall_s"),
+]
+
+
+def prometheus_text(sources=None):
+    """
+    Renders registries in the Prometheus text exposition format.
+
+    Args:
+        sources (dict): process label -> snapshot() entries; defaults to
+            this process's registry.
+
+    Returns:
+        str: The exposition text.
+    """
+    if sources is None:
+        sources = {_process: snapshot()}
+    lines = []
+    for suffix, metric_type, help_text, key in _METRICS:
+        metric = f"{METRIC_PREFIX}_{suffix}"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {metric_type}")
+        for process, entries in sources.items():
+            for entry in entries:
+                labels = f'function="{_label_value(entry["name"])}",process="{_label_value(process)}"'
+                lines.append(f"{metric}{{{labels}}} {entry[key]}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path, sources=None):
+    """
+    Writes prometheus_text(sources) to path atomically, e.g. for
+    node_exporter's textfile collector.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(prometheus_text(sources))
+    os.replace(temp_path, path)
+
+
+def _export_at_exit():
+    path = os.environ.get(METRICS_FILE_ENV_VAR)
+    if path and _registry:
+        try:
+            write_prometheus(path)
+        except OSError:
+            pass
+
+
+atexit.register(_export_at_exit)
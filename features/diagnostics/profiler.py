@@ -0,0 +1,249 @@
+"""
+Captures statistical profiles of slow dashboard reruns.
+
+    with profiler.watch("Analytics", context=lambda: {...filters...}):
+        main()
+
+A watched block that runs longer than SAMPLE_AFTER_SECONDS gets its
+thread's stack sampled by one shared background thread every
+SAMPLE_INTERVAL_SECONDS. If it ends up slower than the threshold
+(HISAAB_SLOW_RERUN_MS, default 1000 ms; 0 turns capturing off), the
+samples are saved under database/profiles as a collapsed-stack file
+("frame;frame;frame count" lines, the input of flamegraph.pl, speedscope
+and similar) next to a JSON file with the duration and the context (page,
+filters). Only the newest MAX_CAPTURES are kept.
+
+Reruns faster than SAMPLE_AFTER_SECONDS are never sampled; all they cost
+is registering with the sampler.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+THRESHOLD_ENV_VAR = "HISAAB_SLOW_RERUN_MS"
+DEFAULT_THRESHOLD_MS = 1000
+PROFILES_DIR = os.path.join("database", "profiles")
+MAX_CAPTURES = 20
+# Blocks are left alone for this long; only the slow ones get sampled
+SAMPLE_AFTER_SECONDS = 0.2
+SAMPLE_INTERVAL_SECONDS = 0.005
+
+
+def _threshold_from_env():
+    try:
+        return max(0, int(os.environ.get(THRESHOLD_ENV_VAR, DEFAULT_THRESHOLD_MS))) / 1000
+    except ValueError:
+        return DEFAULT_THRESHOLD_MS / 1000
+
+
+_threshold = _threshold_from_env()
+# thread id -> _Watch being sampled or waiting to be
+_watches = {}
+_lock = threading.Lock()
+_wake = threading.Event()
+_sampler = None
+
+
+def threshold():
+    """Seconds after which a watched block is saved as slow; 0 means capturing is off."""
+    return _threshold
+
+
+def set_threshold(seconds):
+    global _threshold
+    _threshold = max(0.0, float(seconds))
+
+
+def _depth(frame):
+    depth = 0
+    while frame is not None:
+        depth += 1
+        frame = frame.f_back
+    return depth
+
+
+def _label(code):
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _stack(frame, skip):
+    """The frame's call stack, outermost first, without the skip outermost frames."""
+    labels = []
+    while frame is not None:
+        labels.append(_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels[skip:])
+
+
+def _sample_loop():
+    while True:
+        with _lock:
+            now = time.perf_counter()
+            due = [(thread_id, watch) for thread_id, watch in _watches.items() if now >= watch.sample_from]
+            waiting = [watch.sample_from for watch in _watches.values() if now < watch.sample_from]
+            if due:
+                frames = sys._current_frames()
+                for thread_id, watch in due:
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        watch.samples[_stack(frame, watch.skip)] += 1
+        if due:
+            time.sleep(SAMPLE_INTERVAL_SECONDS)
+        else:
+            # Nothing to sample yet: sleep until the next block is due, or a new one starts
+            _wake.wait(min(waiting) - now if waiting else None)
+            _wake.clear()
+
+
+def _ensure_sampler():
+    global _sampler
+    if _sampler is None or not _sampler.is_alive():
+        _sampler = threading.Thread(target=_sample_loop, name="slow-rerun-sampler", daemon=True)
+        _sampler.start()
+
+
+class _Watch:
+    """Context manager returned by watch()."""
+
+    def __init__(self, name, context):
+        self.name = name
+        self.context = context
+        self.samples = Counter()
+
+    def __enter__(self):
+        self.threshold = _threshold
+        if not self.threshold:
+            return self
+        self.started = time.perf_counter()
+        self.sample_from = self.started + min(SAMPLE_AFTER_SECONDS, self.threshold)
+        # Frames outside the watched block (Streamlit's script runner) are left out of the stacks
+        self.skip = _depth(sys._getframe(1)) - 1
+        with _lock:
+            _ensure_sampler()
+            _watches[threading.get_ident()] = self
+        _wake.set()
+        return self
+
+    def __exit__(self, *exc_info):
+        if not self.threshold:
+            return False
+        duration = time.perf_counter() - self.started
+        with _lock:
+            _watches.pop(threading.get_ident(), None)
+        if duration >= self.threshold and self.samples:
+            try:
+                context = self.context() if callable(self.context) else self.context
+                save_capture(self.name, duration, self.threshold, self.samples, context)
+            except Exception as e:  # a failed capture must not break the rerun
+                print(f"Could not save the slow rerun profile: {e}", file=sys.stderr)
+        return False
+
+
+def watch(name, context=None):
+    """
+    Context manager that saves a profile of the block if it runs longer
+    than threshold().
+
+    Args:
+        name (str): What ran, e.g. the dashboard page.
+        context (dict or function): Saved with the profile; a function is
+            only called when the block was slow.
+    """
+    return _Watch(name, context)
+
+
+def _capture_paths(capture_id):
+    base = os.path.join(PROFILES_DIR, capture_id)
+    return f"{base}.json", f"{base}.folded"
+
+
+def save_capture(name, duration, threshold_seconds, samples, context=None):
+    """
+    Writes a capture (collapsed stacks + metadata) and drops the oldest
+    ones beyond MAX_CAPTURES.
+
+    Returns:
+        dict: The capture's metadata.
+    """
+    os.makedirs(PROFILES_DIR, exist_ok=True)
+    now = datetime.now()
+    capture_id = now.strftime("%Y%m%d_%H%M%S_%f")
+    meta_path, folded_path = _capture_paths(capture_id)
+    with open(folded_path, "w", encoding="utf-8") as f:
+        for stack, count in samples.most_common():
+            f.write(f"{stack} {count}\n")
+    meta = {
+        "id": capture_id,
+        "created": now.isoformat(timespec="seconds"),
+        "name": name,
+        "duration_s": round(duration, 4),
+        "threshold_s": threshold_seconds,
+        "samples": sum(samples.values()),
+        "interval_s": SAMPLE_INTERVAL_SECONDS,
+        # The first moments of the block are not sampled
+        "sampled_after_s": min(SAMPLE_AFTER_SECONDS, threshold_seconds),
+        "context": context or {},
+        "folded_path": folded_path,
+    }
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2, default=str)
+    for old in list_captures()[MAX_CAPTURES:]:
+        for path in _capture_paths(old["id"]):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    return meta
+
+
+def list_captures():
+    """Metadata of the saved captures, newest first."""
+    if not os.path.isdir(PROFILES_DIR):
+        return []
+    captures = []
+    for name in os.listdir(PROFILES_DIR):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(PROFILES_DIR, name), "r", encoding="utf-8") as f:
+                captures.append(json.load(f))
+        except (OSError, json.JSONDecodeError):
+            continue
+    return sorted(captures, key=lambda capture: capture["id"], reverse=True)
+
+
+def read_folded(capture_id):
+    """
+    The collapsed-stack text of a capture.
+
+    Raises:
+        FileNotFoundError: If the capture was rotated away.
+    """
+    with open(_capture_paths(capture_id)[1], "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def hot_functions(capture_id, limit=15):
+    """
+    Summarizes a capture by function.
+
+    Returns:
+        list: (function, self samples, total samples) tuples, most self
+        samples first. Self samples were taken in the function itself,
+        total ones anywhere below it.
+    """
+    self_counts, total_counts = Counter(), Counter()
+    for line in read_folded(capture_id).splitlines():
+        stack, _, count = line.rpartition(" ")
+        if not stack:
+            continue
+        frames = stack.split(";")
+        self_counts[frames[-1]] += int(count)
+        for frame in set(frames):
+            total_counts[frame] += int(count)
+    return [(frame, count, total_counts[frame]) for frame, count in self_counts.most_common(limit)]
@@ -0,0 +1,522 @@
+import hashlib
+import json
+import os
+import re
+import sys
+import traceback
+import uuid
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+
+from features.diagnostics import instrumentation
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Every ledger line is a JSON object whose last key is a CRC32 of the rest:
+#   {"date": "2025-11-24", ..., "amount_paisa": 1250, "crc": "1a2b3c4d"}
+# The CRC covers the exact bytes of the record serialized without the "crc"
+# key, i.e. everything before CRC_MARKER followed by the closing brace. That
+# lets the verifier check a line with one crc32 call and no JSON parsing.
+CRC_MARKER = b', "crc": "'
+CRC_SUFFIX = b'"}'
+CRC_HEX_CHARS = 8
+_CRC_END_RE = re.compile(rb', "crc": "[0-9a-f]{8}"\}')
+
+QUARANTINE_DIR = "database/quarantine"
+VERIFY_BLOCK_BYTES = 4 * 1024 * 1024
+# Bytes just before a derived state's offset whose hash it keeps, to tell
+# an appended ledger from a rewritten one that reused the inode
+FINGERPRINT_BYTES = 4096
+
+# Functions called after every write as listener(path, records, start, end):
+# records are the appended dicts and [start, end) their byte range, or
+# records is None when the whole file was rewritten.
+_write_listeners = []
+
+# verify_line() results
+RECORD_OK = "ok"
+RECORD_LEGACY = "legacy"      # written before checksums existed
+RECORD_CORRUPT = "corrupt"
+
+
+def add_write_listener(listener):
+    """Registers a function to be told about every ledger write in this process."""
+    if listener not in _write_listeners:
+        _write_listeners.append(listener)
+
+
+def _notify(path, records, start, end):
+    # The write is already on disk: a failing listener (an alert, a cache)
+    # must not make the caller report a failed save and retry it, so each
+    # failure is printed and the other listeners still run
+    for listener in _write_listeners:
+        try:
+            listener(path, records, start, end)
+        except Exception:
+            print(f"{listener.__module__}.{listener.__name__} failed after writing {path}:", file=sys.stderr)
+            traceback.print_exc()
+
+
+def category_of(record):
+    """The CLI stores 'category_or_source', the dashboard stores 'category'."""
+    return record.get("category_or_source", record.get("category", ""))
+
+
+def encode_record(record) -> str:
+    """Serializes a transaction dict as one checksummed ledger line (no newline)."""
+    body = json.dumps({k: v for k, v in record.items() if k != "crc"})
+    crc = zlib.crc32(body.encode("utf-8"))
+    return f'{body[:-1]}, "crc": "{crc:08x}"}}'
+
+
+def verify_line(raw: bytes) -> str:
+    """
+    Checks one ledger line (bytes, without the trailing newline).
+
+    Returns RECORD_OK, RECORD_LEGACY for lines without a checksum, or
+    RECORD_CORRUPT when the checksum is missing its pieces or does not match.
+    """
+    marker_at = raw.rfind(CRC_MARKER)
+    if marker_at == -1:
+        return RECORD_LEGACY
+    crc_start = marker_at + len(CRC_MARKER)
+    if not raw.endswith(CRC_SUFFIX) or len(raw) - len(CRC_SUFFIX) - crc_start != CRC_HEX_CHARS:
+        return RECORD_CORRUPT
+    try:
+        expected = int(raw[crc_start:crc_start + CRC_HEX_CHARS], 16)
+    except ValueError:
+        return RECORD_CORRUPT
+    return RECORD_OK if zlib.crc32(raw[:marker_at] + b"}") == expected else RECORD_CORRUPT
+
+
+def decode_line(line: str):
+    """
+    Parses one ledger line into a transaction dict.
+
+    Returns None for blank, unparsable or checksum-failing lines. Legacy lines
+    without a checksum are accepted if they parse as a JSON object.
+    """
+    line = line.strip()
+    if not line:
+        return None
+    if verify_line(line.encode("utf-8")) == RECORD_CORRUPT:
+        return None
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(record, dict):
+        return None
+    record.pop("crc", None)
+    return record
+
+
+def read_records(path, with_positions=False, stats=None):
+    """
+    Yields the valid transaction dicts of a ledger file.
+
+    Args:
+        path (str): Ledger file to read.
+        with_positions (bool): Yield (position, record) pairs, where position
+            counts non-blank lines; this is the index the dashboard uses to
+            edit and delete rows, and it stays aligned when bad lines are skipped.
+        stats (dict): Optional dict that receives a "skipped" count.
+    """
+    skipped = 0
+    position = -1
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                position += 1
+                record = decode_line(line)
+                if record is None:
+                    skipped += 1
+                    continue
+                yield (position, record) if with_positions else record
+    finally:
+        if stats is not None:
+            stats["skipped"] = skipped
+
+
+def _lock_path(path):
+    # A dot file next to the ledger: backups and the validator skip dot files,
+    # and unlike the ledger itself it is never replaced, so it can be locked
+    # across rewrites (and on Windows, where open files cannot be replaced)
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f".{name}.lock")
+
+
+def _generation_path(path):
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f".{name}.gen")
+
+
+def rewrite_generation(path):
+    """The id of the ledger's last rewrite ("" if it was never rewritten)."""
+    try:
+        with open(_generation_path(path), "r") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def _new_generation(path):
+    """Marks a rewrite, so derived states built before it are dropped. Call with the lock held."""
+    gen_path = _generation_path(path)
+    with open(gen_path + ".tmp", "w") as f:
+        f.write(uuid.uuid4().hex)
+    os.replace(gen_path + ".tmp", gen_path)
+
+
+@contextmanager
+def locked(path):
+    """
+    Holds an exclusive lock on a ledger across processes (CLI, cron jobs,
+    the dashboard) for the duration of a write.
+    """
+    with open(_lock_path(path), "a+b") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue  # LK_LOCK gives up after 10 seconds; keep waiting
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@instrumentation.timed(rows_arg="records")
+def append_records(path, records):
+    """Appends checksummed records to a ledger file in a single locked write."""
+    lines = "".join(encode_record(record) + "\n" for record in records)
+    with locked(path), open(path, "ab") as f:
+        start = f.seek(0, os.SEEK_END)
+        f.write(lines.encode("utf-8"))
+        end = f.tell()
+    _notify(path, records, start, end)
+
+
+@instrumentation.timed(rows_arg="lines")
+def rewrite_records(path, lines):
+    """
+    Atomically replaces a ledger file.
+
+    Args:
+        lines (list): Each item is either a record dict (encoded with a fresh
+            checksum) or an already-encoded line, which is kept byte for byte.
+    """
+    with locked(path):
+        size = _replace_lines(path, lines)
+    _notify(path, None, 0, size)
+
+
+def update_records(path, update):
+    """
+    Rewrites a ledger from its current lines under one lock, so an append
+    cannot land between reading the file and replacing it.
+
+    Args:
+        update (function): Called with the open ledger (an iterable of text
+            lines); returns the new lines as rewrite_records() takes them,
+            or None to leave the file as it is.
+    """
+    with locked(path):
+        with open(path, "r", encoding="utf-8") as f:
+            lines = update(f)
+        if lines is None:
+            return
+        size = _replace_lines(path, lines)
+    _notify(path, None, 0, size)
+
+
+def _replace_lines(path, lines):
+    """
+    Atomically replaces a ledger and marks the rewrite. Call with the lock
+    held (locked() is not reentrant) and notify listeners once it is released.
+
+    Args:
+        lines (list): Record dicts, encoded lines (str) or raw lines (bytes).
+
+    Returns:
+        int: The new size of the file.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        for item in lines:
+            if isinstance(item, dict):
+                item = encode_record(item)
+            if isinstance(item, str):
+                item = item.rstrip("\n").encode("utf-8")
+            f.write(item + b"\n")
+    os.replace(tmp_path, path)
+    _new_generation(path)
+    return os.path.getsize(path)
+
+
+def tail_hash(f, offset):
+    """SHA-1 of the FINGERPRINT_BYTES of an open binary file that end at offset."""
+    start = max(0, offset - FINGERPRINT_BYTES)
+    f.seek(start)
+    return hashlib.sha1(f.read(offset - start)).hexdigest()
+
+
+def _stamp(f, state, offset, stat, generation):
+    """Records what the ledger looked like when state was brought up to offset."""
+    state["inode"] = stat.st_ino
+    state["generation"] = generation
+    state["offset"] = offset
+    state["tail"] = tail_hash(f, offset)
+    state["mtime_ns"] = stat.st_mtime_ns if stat.st_size == offset else None
+
+
+def _is_current(state, stat, generation, limit):
+    """True if state already covers the ledger up to limit and nothing was rewritten."""
+    return (state.get("offset") == limit and state.get("inode") == stat.st_ino
+            and state.get("generation") == generation and state.get("mtime_ns") == stat.st_mtime_ns)
+
+
+def _is_continuation(f, state, stat, generation):
+    """True if the ledger has only been appended to since state was brought up to date."""
+    offset = state.get("offset", 0)
+    if state.get("inode") != stat.st_ino or state.get("generation") != generation or stat.st_size < offset:
+        return False
+    # A rewrite can get the old inode back (ext4 reuses freed ones at once)
+    # and even the old size, so the bytes before the offset must still be
+    # the ones the state was built from
+    return offset == 0 or state.get("tail") == tail_hash(f, offset)
+
+
+def catch_up(path, state, new_state, apply, stop=None, skip=None, with_offsets=False):
+    """
+    Brings derived data (counters, indexes, statistics) up to date with a ledger.
+
+    The state dict carries the byte "offset" up to which records have been
+    applied and a fingerprint of the ledger at that point: its "inode", the
+    "generation" that rewrite_records() and repair_file() renew, a hash of
+    the bytes just before the offset ("tail") and the "mtime_ns" when the
+    offset was the end of the file. Only the appended tail is read; if the
+    ledger was rewritten the state is replaced by new_state() and the whole
+    file is applied. A partial last line, i.e. a write still in progress,
+    is left for the next call.
+
+    Args:
+        path (str): Ledger file.
+        state (dict): Current derived state, or None.
+        new_state (function): Returns an empty state.
+        apply (function): apply(state, record) for every new valid record.
+        stop (int): Only apply records before this byte offset (e.g. the
+            start of a write that a listener wants to handle itself).
+        skip (function): Optional skip(state) for every non-blank line that
+            does not decode, for states that count line positions.
+        with_offsets (bool): Call apply(state, record, offset) with the byte
+            offset of the record's line, for states that read records back.
+
+    Returns:
+        tuple: (state, changed)
+    """
+    generation = rewrite_generation(path)
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return new_state(), False
+    with f:
+        stat = os.fstat(f.fileno())
+        limit = stat.st_size if stop is None else min(stop, stat.st_size)
+        if state is not None and _is_current(state, stat, generation, limit):
+            return state, False
+        if state is None or not _is_continuation(f, state, stat, generation):
+            state = new_state()
+            state["offset"] = 0
+
+        offset = state["offset"]
+        pending = b""
+        with instrumentation.measure("ledger.catch_up") as span:
+            f.seek(offset)
+            position = offset
+            while position < limit:
+                block = f.read(min(VERIFY_BLOCK_BYTES, limit - position))
+                position += len(block)
+                if not block:
+                    break
+                lines = (pending + block).split(b"\n")
+                pending = lines.pop()
+                span.rows += len(lines)
+                for raw in lines:
+                    line_offset = offset
+                    offset += len(raw) + 1
+                    record = decode_line(raw.decode("utf-8", errors="replace"))
+                    if record is not None:
+                        if with_offsets:
+                            apply(state, record, line_offset)
+                        else:
+                            apply(state, record)
+                    elif skip is not None and raw.strip():
+                        skip(state)
+        _stamp(f, state, offset, stat, generation)
+    if rewrite_generation(path) != generation:
+        # Rewritten while being read: whatever was read, rebuild next time
+        state["generation"] = None
+    return state, True
+
+
+def apply_append(path, state, records, start, end, apply):
+    """
+    Applies a write listener's appended records to a derived state.
+
+    Returns False if the state cannot be updated in place (the file was
+    rewritten, or the state was not up to date with the ledger), in which
+    case the caller should drop it and let catch_up() rebuild it.
+    """
+    if records is None or state.get("offset") != start:
+        return False
+    generation = rewrite_generation(path)
+    try:
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            if state.get("inode") != stat.st_ino or state.get("generation") != generation:
+                return False
+            for record in records:
+                apply(state, record)
+            _stamp(f, state, end, stat, generation)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def _iter_raw_lines(path, block_bytes=VERIFY_BLOCK_BYTES):
+    """Streams (line_number, byte_offset, raw_line) from a file read in large blocks."""
+    line_number = 0
+    offset = 0
+    pending = b""
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(block_bytes)
+            if not block:
+                break
+            lines = (pending + block).split(b"\n")
+            pending = lines.pop()
+            for raw in lines:
+                line_number += 1
+                yield line_number, offset, raw
+                offset += len(raw) + 1
+    if pending:
+        yield line_number + 1, offset, pending
+
+
+def verify_file(path, max_samples=20):
+    """
+    Streams through a ledger checking every line's checksum.
+
+    Only checksums are checked (no JSON parsing), so this runs close to the
+    speed the file can be read. Legacy lines without a checksum are counted
+    separately rather than treated as damage.
+
+    Returns:
+        dict: counts of ok / legacy / corrupt lines and the first
+        max_samples corrupt (line number, byte offset) locations.
+    """
+    result = {RECORD_OK: 0, RECORD_LEGACY: 0, RECORD_CORRUPT: 0, "corrupt_samples": []}
+    for line_number, offset, raw in _iter_raw_lines(path):
+        raw = raw.rstrip(b"\r")
+        if not raw.strip():
+            continue
+        status = verify_line(raw)
+        result[status] += 1
+        if status == RECORD_CORRUPT and len(result["corrupt_samples"]) < max_samples:
+            result["corrupt_samples"].append({"line": line_number, "offset": offset})
+    return result
+
+
+def _salvage(raw: bytes):
+    """
+    Recovers valid records from a damaged line.
+
+    A crash mid-write followed by a later append glues a partial record to a
+    good one ('{"date": "2025-0{"date": ...}'), so for every checksum found
+    in the line the earliest '{' that makes a verifying record is kept.
+    """
+    salvaged = []
+    search_from = 0
+    for match in _CRC_END_RE.finditer(raw):
+        end = match.end()
+        start = raw.find(b"{", search_from, match.start())
+        while start != -1:
+            if verify_line(raw[start:end]) == RECORD_OK:
+                salvaged.append(raw[start:end])
+                search_from = end
+                break
+            start = raw.find(b"{", start + 1, match.start())
+    return salvaged
+
+
+def repair_file(path):
+    """
+    Rewrites a ledger keeping every valid record and moving damaged lines
+    to a quarantine file, so one bad spot never forces a full restore.
+
+    Legacy lines are kept if they still parse as JSON objects.
+
+    Returns:
+        dict: kept / salvaged / quarantined counts and the quarantine path
+        (None if nothing was quarantined).
+    """
+    kept = []
+    quarantined = []
+    salvaged_count = 0
+    quarantine_path = None
+    # One lock across the scan and the rewrite, so an append that lands in
+    # between is not dropped by rewriting the file from the older scan
+    with locked(path):
+        for line_number, _, raw in _iter_raw_lines(path):
+            raw = raw.rstrip(b"\r")
+            if not raw.strip():
+                continue
+            status = verify_line(raw)
+            if status == RECORD_OK:
+                kept.append(raw)
+                continue
+            if status == RECORD_LEGACY:
+                try:
+                    if isinstance(json.loads(raw), dict):
+                        kept.append(raw)
+                        continue
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    pass
+            pieces = _salvage(raw)
+            kept.extend(pieces)
+            salvaged_count += len(pieces)
+            quarantined.append(b"%d\t" % line_number + raw)
+
+        if quarantined:
+            os.makedirs(QUARANTINE_DIR, exist_ok=True)
+            stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            quarantine_path = os.path.join(QUARANTINE_DIR, f"{os.path.basename(path)}.{stamp}.txt")
+            with open(quarantine_path, "ab") as f:
+                f.write(b"\n".join(quarantined) + b"\n")
+            size = _replace_lines(path, kept)
+    if quarantined:
+        _notify(path, None, 0, size)
+
+    return {
+        "kept": len(kept) - salvaged_count,
+        "salvaged": salvaged_count,
+        "quarantined": len(quarantined),
+        "quarantine_path": quarantine_path
+    }
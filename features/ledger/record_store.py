@@ -0,0 +1,86 @@
+import os
+import threading
+
+from features.ledger import ledger
+from features.diagnostics import instrumentation
+
+# Decoded ledgers kept in memory: path -> state, see _empty_state(). A
+# long-running process (the ledger service, the dashboard) then only parses
+# what was appended since its last read instead of the whole file.
+_states = {}
+_lock = threading.Lock()
+
+
+def _empty_state():
+    # positions: the line index of each record, as read_records(with_positions=True) gives
+    # lines: non-blank lines seen so far, including ones that did not decode
+    return {"inode": None, "offset": 0, "lines": 0, "positions": [], "records": []}
+
+
+def _apply(state, record):
+    state["positions"].append(state["lines"])
+    state["records"].append(record)
+    state["lines"] += 1
+
+
+def _skip(state):
+    state["lines"] += 1
+
+
+def _current(path):
+    """Returns the up to date state of a ledger. Call with _lock held."""
+    key = os.path.normpath(path)
+    state, _ = ledger.catch_up(path, _states.get(key), _empty_state, _apply, skip=_skip)
+    _states[key] = state
+    return state
+
+
+def _on_ledger_write(path, records, start, end):
+    """Adds appended records as they are written; rewrites drop the ledger."""
+    key = os.path.normpath(path)
+    with _lock:
+        state = _states.get(key)
+        if state is None:
+            return
+        copies = None if records is None else [dict(record) for record in records]
+        if not ledger.apply_append(path, state, copies, start, end, _apply):
+            _states.pop(key, None)
+
+
+ledger.add_write_listener(_on_ledger_write)
+
+
+def warm(path):
+    """Loads a ledger into memory ahead of the first read."""
+    with _lock:
+        _current(path)
+
+
+@instrumentation.timed(rows=lambda result: len(result["records"]))
+def snapshot(path, with_positions=False):
+    """
+    Returns the valid transactions of a ledger, read from memory.
+
+    Args:
+        path (str): Ledger file.
+        with_positions (bool): Also return each record's line index, the
+            index the dashboard uses to edit and delete rows.
+
+    Returns:
+        dict: "records" (copies the caller may modify), "skipped" (lines
+        that did not decode) and, if asked for, "positions".
+
+    Raises:
+        FileNotFoundError: If the ledger does not exist.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    with _lock:
+        state = _current(path)
+        result = {
+            "records": [dict(record) for record in state["records"]],
+            "skipped": state["lines"] - len(state["records"])
+        }
+        if with_positions:
+            result["positions"] = list(state["positions"])
+    return result
@@ -0,0 +1,205 @@
+"""
+Filters a ledger's transactions through its index (see search_index).
+
+A query is a dict of filters, all of which must match:
+
+    {"date_from": "2025-03-01", "date_to": "2025-03-31",   # inclusive, YYYY-MM-DD
+     "types": ["expense"], "categories": ["Shopping"],
+     "min_paisa": 10000, "max_paisa": None,
+     "text": "daraz ord*"}                                  # see search_index
+
+compile_plan() turns it into a plan: the narrower of the date range (a
+slice of the presorted date order) and the text matches is where records
+come from, and every other filter runs on the index's columns, so only the
+lines that match are ever read from the ledger. Names that do not occur in
+the ledger (an unknown category) end the plan before anything is scanned.
+Results come in date order, newest first unless asked otherwise.
+"""
+from bisect import bisect_left, bisect_right
+
+from features.diagnostics import instrumentation
+from features.search import search_index
+
+FILTERS = ("date_from", "date_to", "types", "categories", "min_paisa", "max_paisa", "text")
+
+
+def normalize_filters(filters):
+    """
+    Drops empty filters and checks the rest.
+
+    Raises:
+        ValueError: For unknown filters, or dates that are not YYYY-MM-DD.
+    """
+    filters = {key: value for key, value in (filters or {}).items() if value not in (None, "", [], ())}
+    unknown = set(filters) - set(FILTERS)
+    if unknown:
+        raise ValueError(f"unknown filters: {', '.join(sorted(unknown))}")
+    for key in ("date_from", "date_to"):
+        if key in filters:
+            filters[key] = str(filters[key])[:10]
+            if not search_index.day_number(filters[key]):
+                raise ValueError(f"invalid {key} '{filters[key]}', use YYYY-MM-DD")
+    for key in ("types", "categories"):
+        if key in filters:
+            filters[key] = [filters[key]] if isinstance(filters[key], str) else list(filters[key])
+    for key in ("min_paisa", "max_paisa"):
+        if key in filters:
+            filters[key] = int(filters[key])
+    return filters
+
+
+def compile_plan(index, filters):
+    """
+    Plans a query against a ledger's index.
+
+    Returns:
+        dict: "source" ("dates", "text" or None when nothing can match),
+        "range" (slice of the date order) or "matches" (text matches),
+        "checks" run on the columns, in order, and "steps", a readable
+        description of the plan.
+    """
+    filters = normalize_filters(filters)
+    total = len(index["offsets"])
+    plan = {"source": None, "range": (0, 0), "matches": None, "checks": [], "steps": []}
+
+    # Filters on names: codes the ledger has, nothing to scan if it has none
+    for kind, label in (("types", "type"), ("categories", "category")):
+        if kind not in filters:
+            continue
+        codes = search_index.codes_of(index, kind, filters[kind])
+        if not codes:
+            plan["steps"].append(f"no {label} {', '.join(filters[kind])} in the ledger: nothing to read")
+            return plan
+        if len(codes) < len(index["names"][kind]):
+            plan["checks"].append(("in", kind, codes))
+            plan["steps"].append(f"filter {label} in {', '.join(sorted(filters[kind]))}")
+
+    if "min_paisa" in filters or "max_paisa" in filters:
+        low, high = filters.get("min_paisa"), filters.get("max_paisa")
+        plan["checks"].append(("between", "amounts", low, high))
+        plan["steps"].append("filter amount " + (f"{low / 100:.2f}" if low is not None else "")
+                             + ".." + (f"{high / 100:.2f}" if high is not None else ""))
+
+    dates, by_date = index["dates"], index["by_date"]
+    low = search_index.day_number(filters["date_from"]) if "date_from" in filters else None
+    high = search_index.day_number(filters["date_to"]) if "date_to" in filters else None
+    start = bisect_left(by_date, low, key=dates.__getitem__) if low is not None else 0
+    end = bisect_right(by_date, high, key=dates.__getitem__) if high is not None else total
+    in_range = max(0, end - start)
+    date_label = f"{filters.get('date_from', '')}..{filters.get('date_to', '')}"
+
+    matches = search_index.text_matches(index, filters["text"]) if "text" in filters else None
+    if matches is not None and len(matches) < in_range:
+        plan.update(source="text", matches=matches)
+        plan["steps"].insert(0, f"text index '{filters['text']}': {len(matches):,} of {total:,} records")
+        if low is not None or high is not None:
+            plan["checks"].append(("between", "dates", low, high))
+            plan["steps"].append(f"filter date {date_label}")
+        plan["steps"].append("sort by date")
+    else:
+        plan.update(source="dates", range=(start, end))
+        if low is not None or high is not None:
+            plan["steps"].insert(0, f"date index {date_label}: {in_range:,} of {total:,} records")
+        else:
+            plan["steps"].insert(0, f"date index: all {total:,} records")
+        if matches is not None:
+            # Set lookups are the cheapest check, so they go first
+            plan["checks"].insert(0, ("member", set(matches)))
+            plan["steps"].insert(1, f"filter text '{filters['text']}' ({len(matches):,} records match)")
+    return plan
+
+
+def _run(index, plan):
+    """The record numbers a plan selects, oldest first."""
+    if plan["source"] is None:
+        return []
+    if plan["source"] == "text":
+        numbers = plan["matches"]
+    else:
+        start, end = plan["range"]
+        numbers = index["by_date"][start:end]
+    for check in plan["checks"]:
+        if check[0] == "member":
+            wanted = check[1]
+            numbers = [number for number in numbers if number in wanted]
+        elif check[0] == "in":
+            column, codes = index[check[1]], check[2]
+            numbers = [number for number in numbers if column[number] in codes]
+        else:
+            column, low, high = index[check[1]], check[2], check[3]
+            if low is not None:
+                numbers = [number for number in numbers if column[number] >= low]
+            if high is not None:
+                numbers = [number for number in numbers if column[number] <= high]
+    if plan["source"] == "text":
+        # Stable: records of the same day stay in the order they were added
+        numbers = sorted(numbers, key=index["dates"].__getitem__)
+    return list(numbers)
+
+
+def _select(index, filters, newest_first):
+    plan = compile_plan(index, filters)
+    numbers = _run(index, plan)
+    if newest_first:
+        numbers.reverse()
+    plan["steps"].append(f"{len(numbers):,} records, {'newest' if newest_first else 'oldest'} first")
+    return plan, numbers
+
+
+@instrumentation.timed(rows=lambda result: len(result["transactions"]))
+def execute(ledger_path, filters=None, limit=None, newest_first=True):
+    """
+    Returns the transactions of a ledger that match filters.
+
+    Args:
+        ledger_path (str): Ledger file.
+        filters (dict): See the module docstring; None for all transactions.
+        limit (int): Transactions to read, None for all.
+        newest_first (bool): Newest date first (default) or oldest; a day's
+            transactions come in the order they were added, reversed when
+            newest first.
+
+    Returns:
+        dict: "transactions" (each with its line "position"), "total"
+        matching, "records" (valid transactions in the ledger), "skipped"
+        (lines that did not decode) and "plan" (the steps taken).
+
+    Raises:
+        ValueError: For invalid filters.
+        RuntimeError: If the ledger is rewritten again while its index is
+            being rebuilt.
+    """
+    text = normalize_filters(filters).get("text")
+    # A second try if the ledger changed under the index between planning
+    # and reading; the index is then built again from the ledger
+    for _ in range(2):
+        with search_index.using(ledger_path) as index:
+            plan, numbers = _select(index, filters, newest_first)
+        picked = numbers if limit is None else numbers[:limit]
+        transactions = search_index.read_at(ledger_path, index, picked, text)
+        if transactions is not None:
+            break
+        search_index.forget(ledger_path)
+    else:
+        raise RuntimeError(f"{ledger_path} kept changing while it was being queried")
+    plan["steps"].append(f"read {len(picked):,} lines by offset")
+    return {
+        "transactions": transactions,
+        "total": len(numbers),
+        "records": len(index["offsets"]),
+        "skipped": index["lines"] - len(index["offsets"]),
+        "plan": plan["steps"],
+    }
+
+
+@instrumentation.timed(rows=len)
+def match_positions(ledger_path, filters=None, newest_first=True):
+    """
+    Returns the line positions (see ledger.read_records) of the ledger's
+    transactions matching filters, in date order: the dashboard's row
+    index, without reading the records.
+    """
+    with search_index.using(ledger_path) as index:
+        _, numbers = _select(index, filters, newest_first)
+        positions = index["positions"]
+        return [positions[number] for number in numbers]
@@ -0,0 +1,46 @@
+import time
+
+from rich.console import Console
+from rich.table import Table
+
+from features.ledger import ledger
+from features.service import client
+
+TRANSACTIONS_FILE = "database/transactions.txt"
+# Matches listed, newest first
+RESULT_LIMIT = 100
+console = Console()
+
+
+def search_transactions(query):
+    """Lists the transactions whose description or category contains every word of query."""
+    console.print("\n[bold blue]Search Transactions[/bold blue]")
+    started = time.perf_counter()
+    result = client.call("ledger.query", ledger_path=TRANSACTIONS_FILE, filters={"text": query}, limit=RESULT_LIMIT)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    transactions = result["transactions"]
+    if not transactions:
+        console.print(f"[yellow]No transactions match '{query}'.[/yellow]")
+        return
+
+    table = Table(title=f"Transactions matching '{query}'")
+    table.add_column("Date", style="cyan", no_wrap=True)
+    table.add_column("Type", style="magenta")
+    table.add_column("Category/Source", style="blue")
+    table.add_column("Description", style="white")
+    table.add_column("Amount", justify="right")
+
+    for t in transactions:
+        amount_style = "red" if t.get("type") == "expense" else "green"
+        table.add_row(
+            t.get("date", ""),
+            t.get("type", "").capitalize(),
+            ledger.category_of(t),
+            t.get("description", ""),
+            f"[{amount_style}]Rs {int(t.get('amount_paisa', 0)) / 100:.2f}[/{amount_style}]"
+        )
+
+    console.print(table)
+    shown = f", showing the newest {len(transactions)}" if result["total"] > len(transactions) else ""
+    console.print(f"[blue]{result['total']} matches{shown} ({elapsed_ms:.1f} ms).[/blue]")
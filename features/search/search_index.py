@@ -0,0 +1,359 @@
+"""
+Per-ledger index for searching and filtering transactions.
+
+For every valid record of a ledger the index keeps compact columns (byte
+offset and line position, date, amount, type and category codes), the
+record numbers in date order, and an inverted index from every lowercased
+word of the description and category to the ascending record numbers
+containing it. Queries (see query.py) are answered from these columns and
+only the matching lines are read back from the ledger, by offset.
+
+Text queries are words that must all match; a word ending in "*" matches
+every indexed word it starts ("daraz ord*").
+
+The index follows the ledger like the other derived data (see
+ledger.catch_up): appended records are indexed when the next query comes,
+and a rewritten ledger is indexed again. It is saved under database/cache
+as a JSON header (with the ledger fingerprint catch_up checks) followed by
+the raw arrays, which load with a plain copy. Records read back by offset
+are checked against the index, so a stale index is never trusted silently.
+"""
+import json
+import os
+import re
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from contextlib import contextmanager
+from heapq import merge
+
+from features.ledger import ledger
+
+CACHE_DIR = "database/cache"
+INDEX_VERSION = 3
+# Records indexed since the last save before the index is saved again; a
+# smaller unsaved tail is cheaper to index again than to write out
+SAVE_EVERY_RECORDS = 5000
+
+# Arrays saved in the cache file, in this order; each has one item per record
+COLUMNS = ("offsets", "positions", "dates", "amounts", "types", "categories", "by_date")
+# What catch_up knows the ledger by, saved in the cache file's header
+FINGERPRINT = ("inode", "generation", "offset", "tail", "mtime_ns")
+
+_WORD_RE = re.compile(r"\w+")
+_QUERY_TERM_RE = re.compile(r"(\w+)(\*?)")
+
+# ledger path -> index dict, see _empty_index()
+_indexes = {}
+_lock = threading.Lock()
+
+
+def _empty_index():
+    # offsets:    byte offset of each indexed record's ledger line
+    # positions:  its line index, as read_records(with_positions=True) gives
+    # dates:      its date as YYYYMMDD (0 if it has none)
+    # amounts:    its amount_paisa (0 if it has none)
+    # types, categories: codes into names["types"] / names["categories"]; codes maps them back
+    # by_date:    record numbers ordered by date, then by number
+    # unsorted:   records appended out of date order, merged into by_date after catching up
+    # postings:   {word: ascending record numbers}
+    # lines:      non-blank lines seen so far, including ones that did not decode
+    # words:      sorted postings keys for prefix queries, None when stale
+    # saved:      records in the saved copy, None if it is out of date
+    return {"version": INDEX_VERSION, "inode": None, "offset": 0, "lines": 0,
+            "offsets": array("Q"), "positions": array("I"), "dates": array("I"), "amounts": array("q"),
+            "types": array("H"), "categories": array("H"), "by_date": array("I"), "unsorted": [],
+            "names": {"types": [], "categories": []}, "codes": {"types": {}, "categories": {}},
+            "postings": {}, "words": None, "saved": None}
+
+
+def tokenize(text):
+    """The lowercased words of a text, as they are indexed."""
+    return _WORD_RE.findall(text.lower())
+
+
+def day_number(text):
+    """"2025-11-24" -> 20251124, the form dates are indexed in; 0 if it is not a date."""
+    text = str(text)
+    if len(text) < 10 or text[4] != "-" or text[7] != "-":
+        return 0
+    try:
+        return int(text[:4]) * 10000 + int(text[5:7]) * 100 + int(text[8:10])
+    except ValueError:
+        return 0
+
+
+def _code(index, kind, name):
+    codes = index["codes"][kind]
+    code = codes.get(name)
+    if code is None:
+        names = index["names"][kind]
+        code = codes[name] = len(names)
+        names.append(name)
+    return code
+
+
+def codes_of(index, kind, names):
+    """The codes of the given type or category names that occur in the ledger."""
+    codes = index["codes"][kind]
+    return {codes[name] for name in names if name in codes}
+
+
+def _amount(record):
+    try:
+        return int(record.get("amount_paisa", 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _apply(index, record, offset):
+    number = len(index["offsets"])
+    day = day_number(record.get("date", ""))
+    category = ledger.category_of(record)
+    index["offsets"].append(offset)
+    index["positions"].append(index["lines"])
+    index["dates"].append(day)
+    index["amounts"].append(_amount(record))
+    index["types"].append(_code(index, "types", str(record.get("type", ""))))
+    index["categories"].append(_code(index, "categories", str(category)))
+    index["lines"] += 1
+    by_date = index["by_date"]
+    if not index["unsorted"] and (not by_date or index["dates"][by_date[-1]] <= day):
+        by_date.append(number)
+    else:
+        index["unsorted"].append(number)
+
+    postings = index["postings"]
+    for word in set(tokenize(f"{record.get('description', '')} {category}")):
+        docs = postings.get(word)
+        if docs is None:
+            docs = postings[word] = array("I")
+            index["words"] = None
+        docs.append(number)
+
+
+def _skip(index):
+    index["lines"] += 1
+
+
+def _merge_unsorted(index):
+    """Merges records that arrived out of date order into by_date."""
+    if not index["unsorted"]:
+        return
+    dates = index["dates"]
+    late = sorted(index["unsorted"], key=lambda number: (dates[number], number))
+    index["by_date"] = array("I", merge(index["by_date"], late, key=lambda number: (dates[number], number)))
+    index["unsorted"] = []
+
+
+def _cache_path(ledger_path):
+    name = os.path.splitext(os.path.basename(ledger_path))[0]
+    return os.path.join(CACHE_DIR, f"search_{name}.idx")
+
+
+def _load_cached(ledger_path):
+    try:
+        with open(_cache_path(ledger_path), "rb") as f:
+            data = f.read()
+        header_end = data.index(b"\n")
+        header = json.loads(data[:header_end])
+    except (OSError, ValueError):
+        return None
+    if not isinstance(header, dict) or header.get("version") != INDEX_VERSION \
+            or header.get("byteorder") != sys.byteorder:
+        return None
+
+    index = _empty_index()
+    index.update({key: header[key] for key in FINGERPRINT})
+    index.update(lines=header["lines"], names=header["names"])
+    index["codes"] = {kind: {name: code for code, name in enumerate(names)} for kind, names in header["names"].items()}
+    body = memoryview(data)[header_end + 1:]
+    count = header["records"]
+    expected = sum(count * index[column].itemsize for column in COLUMNS) \
+        + sum(n for _, n in header["words"]) * array("I").itemsize
+    if len(body) != expected:
+        return None
+    start = 0
+    for column in COLUMNS:
+        end = start + count * index[column].itemsize
+        index[column].frombytes(body[start:end])
+        start = end
+    for word, n in header["words"]:
+        docs = array("I")
+        end = start + n * docs.itemsize
+        docs.frombytes(body[start:end])
+        index["postings"][word] = docs
+        start = end
+    index["saved"] = count
+    return index
+
+
+def _save_cached(ledger_path, index):
+    path = _cache_path(ledger_path)
+    words = list(index["postings"].items())
+    header = {
+        "version": INDEX_VERSION,
+        "byteorder": sys.byteorder,
+        **{key: index.get(key) for key in FINGERPRINT},
+        "lines": index["lines"],
+        "records": len(index["offsets"]),
+        "names": index["names"],
+        "words": [[word, len(docs)] for word, docs in words]
+    }
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            f.write(json.dumps(header).encode("utf-8") + b"\n")
+            for column in COLUMNS:
+                f.write(index[column].tobytes())
+            for _, docs in words:
+                f.write(docs.tobytes())
+        os.replace(path + ".tmp", path)
+    except OSError:
+        return
+    index["saved"] = len(index["offsets"])
+
+
+def _current(ledger_path):
+    """Returns the up to date index of a ledger. Call with _lock held."""
+    key = os.path.normpath(ledger_path)
+    index = _indexes.get(key)
+    if index is None:
+        index = _load_cached(ledger_path)
+    index, changed = ledger.catch_up(ledger_path, index, _empty_index, _apply, skip=_skip, with_offsets=True)
+    _merge_unsorted(index)
+    if changed and (index["saved"] is None or len(index["offsets"]) - index["saved"] >= SAVE_EVERY_RECORDS):
+        _save_cached(ledger_path, index)
+    _indexes[key] = index
+    return index
+
+
+@contextmanager
+def using(ledger_path):
+    """Holds the up to date index of a ledger; nothing else can change it meanwhile."""
+    with _lock:
+        yield _current(ledger_path)
+
+
+def forget(ledger_path):
+    """Drops a ledger's index, in memory and on disk, so the next query builds it again."""
+    with _lock:
+        _indexes.pop(os.path.normpath(ledger_path), None)
+        try:
+            os.remove(_cache_path(ledger_path))
+        except FileNotFoundError:
+            pass
+
+
+def warm(ledger_path):
+    """Loads (or builds) a ledger's index ahead of the first query."""
+    with _lock:
+        _current(ledger_path)
+
+
+def _prefix_matches(index, prefix):
+    """Records containing any word that starts with prefix, ascending."""
+    if index["words"] is None:
+        index["words"] = sorted(index["postings"])
+    words = index["words"]
+    lists = []
+    at = bisect_left(words, prefix)
+    while at < len(words) and words[at].startswith(prefix):
+        lists.append(index["postings"][words[at]])
+        at += 1
+    if len(lists) <= 1:
+        return lists[0] if lists else array("I")
+    return sorted(set().union(*lists))
+
+
+def _intersect(fewer, more):
+    """Records in both ascending lists, ascending."""
+    if len(fewer) * 16 < len(more):
+        # Much shorter list: look each record up in the longer one
+        matches = []
+        for number in fewer:
+            at = bisect_left(more, number)
+            if at < len(more) and more[at] == number:
+                matches.append(number)
+        return matches
+    wanted = set(fewer)
+    return [number for number in more if number in wanted]
+
+
+def text_matches(index, text):
+    """Record numbers whose description and category match every term of text, ascending."""
+    terms = _QUERY_TERM_RE.findall(text.lower())
+    if not terms:
+        return []
+    lists = []
+    for word, star in terms:
+        docs = _prefix_matches(index, word) if star else index["postings"].get(word, ())
+        if not docs:
+            return []
+        lists.append(docs)
+    lists.sort(key=len)
+    matches = lists[0]
+    for docs in lists[1:]:
+        matches = _intersect(matches, docs)
+        if not matches:
+            break
+    return matches
+
+
+def _still_indexed(index, number, record, terms):
+    """True if a record read back is still the one indexed under number, and matches terms."""
+    if index["dates"][number] != day_number(record.get("date", "")) \
+            or index["amounts"][number] != _amount(record):
+        return False
+    category = str(ledger.category_of(record))
+    if index["names"]["types"][index["types"][number]] != str(record.get("type", "")) \
+            or index["names"]["categories"][index["categories"][number]] != category:
+        return False
+    words = set(tokenize(f"{record.get('description', '')} {category}"))
+    for word, star in terms:
+        if word not in words and not (star and any(w.startswith(word) for w in words)):
+            return False
+    return True
+
+
+def read_at(ledger_path, index, numbers, text=None):
+    """
+    Reads records back from the ledger, each with its line "position".
+
+    Lines are read in file order whatever the order of numbers, so reading
+    most of a ledger streams through it. Every record is checked against
+    what the index holds for it (and against text, the query the numbers
+    came from), so nothing read from a ledger that changed under the index
+    is returned.
+
+    Returns:
+        list: The records in the order of numbers, or None if the ledger is
+        no longer the file the index was built from.
+    """
+    if not numbers:
+        return []
+    offsets, positions = index["offsets"], index["positions"]
+    terms = _QUERY_TERM_RE.findall(text.lower()) if text else []
+    records = {}
+    try:
+        with open(ledger_path, "rb") as f:
+            if os.fstat(f.fileno()).st_ino != index["inode"] \
+                    or ledger.rewrite_generation(ledger_path) != index["generation"]:
+                return None
+            at = None
+            # Record numbers grow with their offsets: sorted numbers are in file order
+            for number in sorted(numbers):
+                offset = offsets[number]
+                if offset != at:
+                    f.seek(offset)
+                line = f.readline()
+                at = offset + len(line)
+                record = ledger.decode_line(line.decode("utf-8", errors="replace"))
+                if record is None or not _still_indexed(index, number, record, terms):
+                    return None
+                record["position"] = positions[number]
+                records[number] = record
+    except FileNotFoundError:
+        return None
+    return [records[number] for number in numbers]
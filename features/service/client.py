@@ -0,0 +1,192 @@
+import json
+import os
+import socket
+import threading
+
+from features.service import daemon
+
+# Seconds to wait for an answer; whole-ledger reads of large files take a while
+TIMEOUT_SECONDS = 60
+
+# Exceptions the service reports that are raised again as themselves, so
+# callers handle them the same way whether or not the service is running
+_ERROR_TYPES = {"ValueError": ValueError, "KeyError": KeyError, "FileNotFoundError": FileNotFoundError}
+
+# One connection per thread (the dashboard runs a thread per session)
+_local = threading.local()
+
+
+class ServiceError(RuntimeError):
+    """The ledger service failed to answer a request."""
+
+
+class _NotSent(OSError):
+    """The service could not be reached, so the request never left this process."""
+
+
+def _still_open(sock):
+    """False if the service has closed a kept-open connection (say it was restarted)."""
+    try:
+        return sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT) != b""
+    except BlockingIOError:
+        return True
+    except OSError:
+        return False
+
+
+def _connect(socket_path):
+    connection = getattr(_local, "connection", None)
+    if connection is not None and connection[0] == socket_path:
+        if _still_open(connection[1]):
+            return connection
+        _disconnect()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(TIMEOUT_SECONDS)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        raise
+    _local.connection = (socket_path, sock, sock.makefile("rb"), 0)
+    return _local.connection
+
+
+def _disconnect():
+    connection = getattr(_local, "connection", None)
+    _local.connection = None
+    if connection is not None:
+        connection[2].close()
+        connection[1].close()
+
+
+def _call_remote(socket_path, request):
+    """
+    Sends one request, or a batch (list) of them with their own ids.
+
+    Returns:
+        The response dict (or list for a batch).
+
+    Raises:
+        _NotSent: If the service cannot be reached.
+        OSError: If the connection fails once the request is on its way.
+    """
+    try:
+        path, sock, reader, request_id = _connect(socket_path)
+    except OSError as error:
+        raise _NotSent(str(error)) from error
+    request_id += 1
+    _local.connection = (path, sock, reader, request_id)
+    if isinstance(request, dict):
+        request = dict(request, id=request_id)
+    try:
+        sock.sendall(daemon.encode(request))
+        line = reader.readline()
+    except OSError:
+        _disconnect()
+        raise
+    if not line:
+        _disconnect()
+        raise ConnectionResetError("the ledger service closed the connection")
+    response = json.loads(line)
+    if isinstance(response, dict) and response.get("id") != request_id:
+        _disconnect()
+        raise ConnectionResetError("the ledger service answered out of turn")
+    return response
+
+
+def service_running(socket_path=daemon.SOCKET_PATH):
+    """True if a ledger service is listening."""
+    try:
+        _connect(socket_path)
+    except OSError:
+        return False
+    return True
+
+
+def _raise_error(error):
+    error_type = _ERROR_TYPES.get((error.get("data") or {}).get("type"), ServiceError)
+    raise error_type(error.get("message", "unknown error"))
+
+
+def _lost(methods, error):
+    """
+    Decides what to do when the connection fails after a request was sent.
+
+    Reads simply run again in this process; a write may already have been
+    applied by the service, so running it again here could record it twice.
+
+    Raises:
+        ServiceError: If any of the methods is a write.
+    """
+    writes = sorted(set(methods) & daemon.WRITE_METHODS)
+    if writes:
+        raise ServiceError(f"lost the ledger service during {', '.join(writes)}; "
+                           "check whether it was applied before trying again") from error
+
+
+def call(method, socket_path=daemon.SOCKET_PATH, **params):
+    """
+    Calls a ledger service method (see daemon.METHODS).
+
+    Goes to the running service when there is one, with a connection kept
+    open per thread so repeated queries cost one round trip; otherwise the
+    same function runs in this process, so callers never need to know
+    whether the service is up. A read also runs here if the service goes
+    away mid-call; a write does not, since the service may have applied it.
+    Results have the same shape either way (tuples arrive as lists from
+    the service).
+
+    Raises:
+        ValueError, KeyError, FileNotFoundError: As raised by the method.
+        ServiceError: For other failures inside the service, or if the
+            service goes away after a write was sent to it.
+    """
+    if hasattr(socket, "AF_UNIX") and os.path.exists(socket_path):
+        try:
+            response = _call_remote(socket_path, {"jsonrpc": "2.0", "method": method, "params": params})
+        except _NotSent:
+            response = None
+        except OSError as error:
+            _lost([method], error)
+            response = None
+        if response is not None:
+            if "error" in response:
+                _raise_error(response["error"])
+            return response["result"]
+    return daemon.call_local(method, params)
+
+
+def call_batch(calls, socket_path=daemon.SOCKET_PATH):
+    """
+    Runs several service methods in one round trip (a JSON-RPC batch), or
+    in this process when the service is not running.
+
+    Args:
+        calls (list): (method, params dict) pairs.
+
+    Returns:
+        list: The results, in order.
+
+    Raises:
+        The first error among the calls, as call() would; ServiceError if
+        the service goes away after a batch holding a write was sent.
+    """
+    if hasattr(socket, "AF_UNIX") and os.path.exists(socket_path):
+        try:
+            responses = _call_remote(socket_path, [{"jsonrpc": "2.0", "id": n, "method": method, "params": params}
+                                                   for n, (method, params) in enumerate(calls)])
+        except _NotSent:
+            responses = None
+        except OSError as error:
+            _lost([method for method, _ in calls], error)
+            responses = None
+        if responses is not None:
+            by_id = {response.get("id"): response for response in responses}
+            results = []
+            for n in range(len(calls)):
+                response = by_id.get(n, {"error": {"message": "no answer in batch"}})
+                if "error" in response:
+                    _raise_error(response["error"])
+                results.append(response["result"])
+            return results
+    return [daemon.call_local(method, params) for method, params in calls]
@@ -0,0 +1,240 @@
+"""
+Optional long-running ledger service.
+
+Holds every ledger's transactions and the derived data built from them
+(spend counters, recurring payments, anomaly statistics, the category
+model, the search index) warm in memory and answers queries and writes over a Unix domain
+socket, so CLI runs and dashboard sessions skip reparsing the files.
+
+    python main.py serve
+
+The protocol is JSON-RPC 2.0, one request (or batch) and response per line:
+
+    -> {"jsonrpc": "2.0", "id": 1, "method": "budget.month_totals", "params": {"ledger_path": "database/transactions.txt"}}
+    <- {"jsonrpc": "2.0", "id": 1, "result": {"income": 150000, "expense": 42000}}
+
+Each connection is served by its own thread; identical reads from different
+sessions that arrive while one is running share its answer (see store).
+
+Clients go through features.service.client, which runs the same functions
+in-process when the service is not running.
+"""
+import glob
+import importlib
+import json
+import os
+import signal
+import socket
+import socketserver
+import threading
+from datetime import date
+
+from features.diagnostics import instrumentation
+
+DATABASE_DIR = "database"
+# A dot file, so backups and the integrity check leave it alone
+SOCKET_PATH = os.path.join(DATABASE_DIR, ".hisaabd.sock")
+
+# method -> (module, function); params are passed as keyword arguments and
+# every function returns JSON-serializable data (dates become ISO strings)
+METHODS = {
+    "ledger.records": ("features.ledger.record_store", "snapshot"),
+    "ledger.append": ("features.ledger.ledger", "append_records"),
+    "ledger.rewrite": ("features.ledger.ledger", "rewrite_records"),
+    "ledger.query": ("features.search.query", "execute"),
+    "ledger.query_positions": ("features.search.query", "match_positions"),
+    "budget.load": ("features.budgets.budget_repository", "load_budgets"),
+    "budget.set": ("features.budgets.budget_repository", "set_budget"),
+    "budget.delete": ("features.budgets.budget_repository", "delete_budget"),
+    "budget.vs_actual": ("features.budgets.budget_repository", "budget_vs_actual"),
+    "budget.evaluate": ("features.budgets.budget_engine", "evaluate_budgets"),
+    "budget.month_spend": ("features.budgets.budget_engine", "month_spend"),
+    "budget.month_totals": ("features.budgets.budget_engine", "month_totals"),
+    "budget.monthly_totals": ("features.budgets.budget_engine", "monthly_totals"),
+    "budget.daily_spend": ("features.budgets.budget_engine", "daily_spend"),
+    "assistant.recurring": ("features.smart_assistant.recurring", "recurring_transactions"),
+    "assistant.upcoming": ("features.smart_assistant.recurring", "upcoming_payments"),
+    "assistant.flagged": ("features.smart_assistant.anomaly", "flagged_expenses"),
+    "assistant.forecast": ("features.smart_assistant.forecast", "forecast_month"),
+    "assistant.suggest_category": ("features.categorization.classifier", "suggest_category"),
+    "service.stats": ("features.service.store", "stats"),
+    "service.metrics": ("features.diagnostics.instrumentation", "status"),
+}
+# Methods that change data: never coalesced with other requests
+WRITE_METHODS = {"ledger.append", "ledger.rewrite", "budget.set", "budget.delete"}
+
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+
+def call_local(method, params):
+    """
+    Runs a service method in this process.
+
+    Raises:
+        KeyError: For an unknown method.
+    """
+    module_name, function_name = METHODS[method]
+    return getattr(importlib.import_module(module_name), function_name)(**params)
+
+
+def _jsonable(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    if hasattr(value, "item"):  # numpy scalars
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def encode(message) -> bytes:
+    """One protocol line."""
+    return json.dumps(message, separators=(",", ":"), default=_jsonable).encode("utf-8") + b"\n"
+
+
+def _error(request_id, code, message, error_type=None):
+    error = {"code": code, "message": message}
+    if error_type:
+        error["data"] = {"type": error_type}
+    return {"jsonrpc": "2.0", "id": request_id, "error": error}
+
+
+def _execute(method, params):
+    """
+    Runs a method and encodes its result. The encoded result is what
+    coalesced requests share, so a popular read is also serialized once.
+
+    Returns:
+        tuple: (result JSON bytes, None) or (None, (code, message, error type))
+    """
+    try:
+        with instrumentation.measure(f"service.{method}"):
+            result = call_local(method, params)
+    except TypeError as e:
+        return None, (INVALID_PARAMS, str(e), type(e).__name__)
+    except Exception as e:
+        return None, (SERVER_ERROR, str(e), type(e).__name__)
+    try:
+        return json.dumps(result, separators=(",", ":"), default=_jsonable).encode("utf-8"), None
+    except (TypeError, ValueError) as e:
+        return None, (SERVER_ERROR, f"unserializable result: {e}", None)
+
+
+def _respond(request):
+    """Answers one request object. Returns the response without a newline."""
+    from features.service import store  # imports this module
+    if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+        return encode(_error(None, INVALID_REQUEST, "expected an object with a method"))[:-1]
+    request_id = request.get("id")
+    params = request.get("params") or {}
+    if request["method"] not in METHODS:
+        return encode(_error(request_id, METHOD_NOT_FOUND, f"unknown method '{request['method']}'"))[:-1]
+    if not isinstance(params, dict):
+        return encode(_error(request_id, INVALID_PARAMS, "params must be an object"))[:-1]
+    payload, error = store.dispatch_sync(request["method"], params, _execute)
+    if error is not None:
+        return encode(_error(request_id, *error))[:-1]
+    return b'{"jsonrpc":"2.0","id":' + json.dumps(request_id).encode("utf-8") + b',"result":' + payload + b"}"
+
+
+def handle_line(line):
+    """
+    Answers one request line: a request object, or a batch (a list of
+    them) answered in one response line. Returns the response line.
+    """
+    try:
+        request = json.loads(line)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        return encode(_error(None, PARSE_ERROR, f"invalid JSON: {e}"))
+    if isinstance(request, list):
+        if not request:
+            return encode(_error(None, INVALID_REQUEST, "empty batch"))
+        return b"[" + b",".join(_respond(item) for item in request) + b"]\n"
+    return _respond(request) + b"\n"
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Serves one client connection: requests are answered in order until it closes."""
+
+    def handle(self):
+        for line in self.rfile:
+            if line.strip():
+                self.wfile.write(handle_line(line))
+
+
+class LedgerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def ledger_paths():
+    """The CLI ledger and every dashboard user's ledger."""
+    return sorted(glob.glob(os.path.join(DATABASE_DIR, "transactions*.txt")))
+
+
+def warm_up(paths):
+    """Loads each ledger and its derived data so the first queries are already fast."""
+    from features.budgets import budget_engine
+    from features.ledger import record_store
+    from features.search import search_index
+    from features.smart_assistant import anomaly, recurring
+
+    for path in paths:
+        record_store.warm(path)
+        budget_engine.monthly_totals(path)
+        recurring.recurring_transactions(path)
+        anomaly.flagged_expenses(path)
+        search_index.warm(path)
+
+
+def _remove_stale_socket(socket_path):
+    """Deletes a socket left behind by a service that died. Raises RuntimeError if one is running."""
+    if not os.path.exists(socket_path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except OSError:
+        os.unlink(socket_path)
+    else:
+        raise RuntimeError(f"the ledger service is already running on {socket_path}")
+    finally:
+        probe.close()
+
+
+def serve(socket_path=SOCKET_PATH, warm=True):
+    """
+    Runs the service until interrupted.
+
+    Args:
+        socket_path (str): Where to listen.
+        warm (bool): Load every ledger before accepting connections.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        raise RuntimeError("the ledger service needs Unix domain sockets")
+    # Writes the service applies must still raise budget alerts and score
+    # new expenses, warm or not; importing registers their write listeners
+    from features.budgets import budget_alerts  # noqa: F401
+    from features.smart_assistant import anomaly  # noqa: F401
+
+    instrumentation.set_process("service")
+    _remove_stale_socket(socket_path)
+    if warm:
+        warm_up(ledger_paths())
+    os.makedirs(os.path.dirname(socket_path) or ".", exist_ok=True)
+    if threading.current_thread() is threading.main_thread():
+        # `kill` stops the service as cleanly as Ctrl+C, removing the socket
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+    server = LedgerServer(socket_path, _Handler)
+    try:
+        # Only the user running the service may talk to it
+        os.chmod(socket_path, 0o600)
+        server.serve_forever()
+    finally:
+        server.server_close()
+        try:
+            os.unlink(socket_path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,175 @@
+"""
+Process-wide cache of the DataFrames dashboard sessions build from ledgers.
+
+Every session of a dashboard server viewing the same user's data gets the
+same DataFrame object instead of building (and keeping) its own, so the
+frames are shared and must be treated as read-only: derive new frames by
+filtering or assign(), never modify one in place.
+
+Entries are versioned (e.g. by the ledger's file signature); asking for a
+newer version rebuilds the frame and drops the old one. The cache holds at
+most HISAAB_FRAME_CACHE_MB (default 256) MB of frames, measured with
+DataFrame.memory_usage(deep=True); past that the least recently used frames
+are evicted, whichever sessions used them. Which frames each session used
+is recorded for the Diagnostics page.
+"""
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from features.service import store
+
+BUDGET_ENV_VAR = "HISAAB_FRAME_CACHE_MB"
+DEFAULT_BUDGET_MB = 256
+# Sessions that have not used the cache for this long are left out of usage()
+SESSION_IDLE_SECONDS = 30 * 60
+
+
+def _budget_from_env():
+    try:
+        return max(0, int(os.environ.get(BUDGET_ENV_VAR, DEFAULT_BUDGET_MB))) * 1024 * 1024
+    except ValueError:
+        return DEFAULT_BUDGET_MB * 1024 * 1024
+
+
+_budget_bytes = _budget_from_env()
+# key -> {"version", "value", "bytes", "used"}, least recently used first
+_entries = OrderedDict()
+_total_bytes = 0
+# session id -> {"keys": set of cache keys, "seen": time.monotonic()}
+_sessions = {}
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+_lock = threading.Lock()
+
+
+def budget_bytes():
+    return _budget_bytes
+
+
+def set_budget_bytes(limit):
+    """Changes the cache's size limit, evicting frames at once if it is now over."""
+    global _budget_bytes
+    with _lock:
+        _budget_bytes = max(0, int(limit))
+        _evict()
+
+
+def file_version(path):
+    """A version for data built from a file: changes whenever the file does. None if it is missing."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def size_of(value):
+    """Bytes a cached value takes: memory_usage(deep=True) for DataFrames."""
+    if hasattr(value, "memory_usage"):
+        return int(value.memory_usage(deep=True).sum())
+    return sys.getsizeof(value)
+
+
+def _evict():
+    """Drops least recently used entries until the cache fits its budget. Call with _lock held."""
+    global _total_bytes
+    while _total_bytes > _budget_bytes and _entries:
+        key, entry = _entries.popitem(last=False)
+        _total_bytes -= entry["bytes"]
+        _stats["evictions"] += 1
+        for session in _sessions.values():
+            session["keys"].discard(key)
+
+
+def _touch(key, session_id):
+    if session_id is None:
+        return
+    session = _sessions.setdefault(session_id, {"keys": set(), "seen": 0})
+    session["keys"].add(key)
+    session["seen"] = time.monotonic()
+
+
+def get_or_build(key, version, build, session_id=None):
+    """
+    Returns the cached value of key at this version, or build()'s result,
+    which is cached. Sessions asking for the same missing value at the same
+    time share one build.
+
+    Args:
+        key: Hashable name, e.g. ("transactions", ledger path).
+        version: Anything comparable; a different version is a miss.
+        build (function): Builds the value.
+        session_id (str): The session asking, for usage().
+    """
+    global _total_bytes
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry["version"] == version:
+            _entries.move_to_end(key)
+            entry["used"] = time.monotonic()
+            _stats["hits"] += 1
+            _touch(key, session_id)
+            return entry["value"]
+        _stats["misses"] += 1
+
+    value = store.coalesced_sync(("frame", key, version), build)
+    size = size_of(value)
+
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry["version"] == version:
+            # Built by a session that missed just before this one
+            value = entry["value"]
+        else:
+            if entry is not None:
+                _total_bytes -= entry["bytes"]
+            _entries[key] = {"version": version, "value": value, "bytes": size, "used": time.monotonic()}
+            _total_bytes += size
+        _entries.move_to_end(key)
+        _touch(key, session_id)
+        _evict()
+    return value
+
+
+def forget_session(session_id):
+    """Stops counting a session (e.g. on logout)."""
+    with _lock:
+        _sessions.pop(session_id, None)
+
+
+def usage():
+    """
+    Returns the cache's memory accounting.
+
+    Returns:
+        dict: budget_bytes, total_bytes, hits, misses, evictions; "entries"
+        (key, bytes, sessions using it) and "sessions" (session, frames,
+        bytes of the frames it uses, and bytes only it uses).
+    """
+    now = time.monotonic()
+    with _lock:
+        for session_id in [s for s, session in _sessions.items() if now - session["seen"] > SESSION_IDLE_SECONDS]:
+            del _sessions[session_id]
+        users = {key: 0 for key in _entries}
+        for session in _sessions.values():
+            for key in session["keys"]:
+                if key in users:
+                    users[key] += 1
+        entries = [
+            {"key": key, "bytes": entry["bytes"], "sessions": users[key], "idle_s": now - entry["used"]}
+            for key, entry in reversed(_entries.items())
+        ]
+        sessions = []
+        for session_id, session in _sessions.items():
+            keys = [key for key in session["keys"] if key in _entries]
+            sessions.append({
+                "session": session_id,
+                "frames": len(keys),
+                "bytes": sum(_entries[key]["bytes"] for key in keys),
+                "exclusive_bytes": sum(_entries[key]["bytes"] for key in keys if users[key] == 1),
+                "idle_s": now - session["seen"],
+            })
+        return dict(_stats, budget_bytes=_budget_bytes, total_bytes=_total_bytes, entries=entries,
+                    sessions=sorted(sessions, key=lambda session: session["bytes"], reverse=True))
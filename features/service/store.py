@@ -0,0 +1,215 @@
+"""
+Asyncio access to ledgers, budgets and settings.
+
+Blocking work (file I/O, the feature functions, round trips to the ledger
+service) runs on a thread pool, so independent loads overlap instead of
+running one after another:
+
+    settings, snapshot, budgets = store.gather(
+        store.read_json(settings_path, {}),
+        store.read_records(ledger_path, with_positions=True),
+        store.call("budget.load", username=username))
+
+Concurrent identical reads are coalesced: while one is in flight, every
+other caller in the process (any thread or event loop) asking for the same
+read shares its result instead of starting another read. Results may
+therefore be shared between callers and must be treated as read-only.
+Writes are never coalesced, and a read that starts after a write has
+finished never joins a read started before it.
+"""
+import asyncio
+import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from features.service import client, daemon
+
+# Threads doing blocking reads and writes; each keeps its own service connection
+MAX_WORKERS = 16
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="store")
+# (key, generation) -> concurrent.futures.Future of the read in flight, shared
+# by every thread and event loop of the process
+_inflight = {}
+# Bumped after every write, and part of every read's key
+_generation = 0
+_stats = {"reads": 0, "coalesced": 0, "writes": 0}
+_lock = threading.Lock()
+
+# The loop run() hands coroutines to, shared by every thread of the process
+# (e.g. all dashboard sessions)
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def stats():
+    """Counts of reads, reads answered by a read already in flight, and writes."""
+    with _lock:
+        return dict(_stats)
+
+
+def _claim(key):
+    """Returns (future, slot) where slot is None if another caller is already computing it."""
+    with _lock:
+        slot = (key, _generation)
+        _stats["reads"] += 1
+        future = _inflight.get(slot)
+        if future is not None:
+            _stats["coalesced"] += 1
+            return future, None
+        future = Future()
+        _inflight[slot] = future
+        return future, slot
+
+
+def _fulfil(future, slot, function, args):
+    try:
+        future.set_result(function(*args))
+    except BaseException as e:
+        future.set_exception(e)
+    finally:
+        with _lock:
+            _inflight.pop(slot, None)
+
+
+def coalesced_sync(key, function, *args):
+    """
+    Returns function(*args), computed in the calling thread unless a call
+    with the same key is already running, in which case its result is shared.
+    """
+    future, slot = _claim(key)
+    if slot is not None:
+        _fulfil(future, slot, function, args)
+    return future.result()
+
+
+async def coalesced(key, function, *args):
+    """Async coalesced_sync(): the work runs on the thread pool."""
+    future, slot = _claim(key)
+    if slot is not None:
+        _executor.submit(_fulfil, future, slot, function, args)
+    return await asyncio.shield(asyncio.wrap_future(future))
+
+
+def _write_done():
+    global _generation
+    with _lock:
+        _generation += 1
+
+
+def dispatch_sync(method, params, function):
+    """
+    Runs a service method through function(method, params) in the calling
+    thread: writes as asked, reads coalesced with identical reads in flight.
+    """
+    if method in daemon.WRITE_METHODS:
+        with _lock:
+            _stats["writes"] += 1
+        try:
+            return function(method, params)
+        finally:
+            _write_done()
+    return coalesced_sync((method, json.dumps(params, sort_keys=True, default=str)), function, method, params)
+
+
+async def dispatch(method, params, function):
+    """Async dispatch_sync(): the work runs on the thread pool."""
+    if method in daemon.WRITE_METHODS:
+        with _lock:
+            _stats["writes"] += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(_executor, function, method, params)
+        finally:
+            _write_done()
+    return await coalesced((method, json.dumps(params, sort_keys=True, default=str)), function, method, params)
+
+
+async def offload(function, *args):
+    """Runs a blocking function on the thread pool."""
+    return await asyncio.get_running_loop().run_in_executor(_executor, function, *args)
+
+
+def _client_call(method, params):
+    return client.call(method, **params)
+
+
+async def call(method, **params):
+    """Async client.call(): a ledger service method, coalesced if it only reads."""
+    return await dispatch(method, params, _client_call)
+
+
+async def batch(calls):
+    """
+    Runs several (method, params) service calls in one round trip.
+
+    Returns:
+        list: The results, in order.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, client.call_batch, calls)
+
+
+async def read_records(path, with_positions=False):
+    """The transactions of a ledger, see record_store.snapshot()."""
+    return await call("ledger.records", path=path, with_positions=with_positions)
+
+
+async def append(path, records):
+    """Appends records to a ledger in one locked write."""
+    return await call("ledger.append", path=path, records=records)
+
+
+async def rewrite(path, lines):
+    """Atomically replaces a ledger, see ledger.rewrite_records()."""
+    return await call("ledger.rewrite", path=path, lines=lines)
+
+
+# What a shared JSON read returns for a missing or unreadable file; each
+# caller then gets its own default
+_NO_JSON = object()
+
+
+def _read_json_file(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return _NO_JSON
+
+
+async def read_json(path, default=None):
+    """A JSON file's contents (settings, users), or default if it is missing or unreadable."""
+    document = await coalesced(("file", path), _read_json_file, path)
+    return default if document is _NO_JSON else document
+
+
+def _shared_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="store-loop", daemon=True).start()
+        return _loop
+
+
+def run(coroutine):
+    """
+    Sync facade: runs a coroutine on the shared loop and waits for its result.
+
+    For blocking code (the CLI, Streamlit's script threads); must not be
+    called from a coroutine running on the shared loop.
+    """
+    loop = _shared_loop()
+    if threading.current_thread().name == "store-loop":
+        coroutine.close()
+        raise RuntimeError("store.run() called from the store's own event loop")
+    return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+
+
+def gather(*coroutines):
+    """Sync facade: runs coroutines concurrently on the shared loop. Returns their results in order."""
+
+    async def together():
+        return await asyncio.gather(*coroutines)
+
+    return run(together())
@@ -0,0 +1,254 @@
+import json
+import math
+import os
+import threading
+from bisect import insort
+from datetime import datetime
+
+from features.budgets import budget_alerts
+from features.ledger import ledger
+from features.diagnostics import instrumentation
+
+CACHE_DIR = "database/cache"
+STATS_VERSION = 1
+
+# A category needs this many past expenses before anything is flagged in it
+MIN_HISTORY = 8
+# Standard deviations above the mean of log(amount) that count as unusual
+Z_THRESHOLD = 3.0
+# Multiple of the category's 95th percentile that counts as large
+QUANTILE = 0.95
+LARGE_FACTOR = 2.0
+# Flagged expenses kept per ledger for the assistant to show
+MAX_FLAGGED = 50
+
+# P² marker increments for QUANTILE (Jain & Chlamtac, 1985)
+_P2_INCREMENTS = (0.0, QUANTILE / 2, QUANTILE, (1 + QUANTILE) / 2, 1.0)
+
+# ledger path -> stats dict, see _empty_stats()
+_stats = {}
+_lock = threading.Lock()
+
+
+def _empty_stats():
+    # categories: {category: {"n", "mean", "m2" (Welford over log amounts),
+    #              "q", "pos", "want" (P² sketch of the amount quantile)}}
+    # flagged:    the most recent flagged expenses, oldest first
+    return {"version": STATS_VERSION, "inode": None, "offset": 0, "categories": {}, "flagged": []}
+
+
+def _cache_path(ledger_path):
+    name = os.path.splitext(os.path.basename(ledger_path))[0]
+    return os.path.join(CACHE_DIR, f"anomaly_{name}.json")
+
+
+def _load_cached(ledger_path):
+    try:
+        with open(_cache_path(ledger_path), "r") as f:
+            stats = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if not isinstance(stats, dict) or stats.get("version") != STATS_VERSION:
+        return None
+    return stats
+
+
+def _save_cached(ledger_path, stats):
+    path = _cache_path(ledger_path)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump(stats, f)
+        os.replace(path + ".tmp", path)
+    except OSError:
+        pass
+
+
+def _p2_add(sketch, x):
+    """Adds one observation to a P² quantile sketch in constant time."""
+    q = sketch["q"]
+    if len(q) < 5:
+        insort(q, x)
+        if len(q) == 5:
+            sketch["pos"] = [1, 2, 3, 4, 5]
+            sketch["want"] = [1 + 4 * inc for inc in _P2_INCREMENTS]
+        return
+    pos, want = sketch["pos"], sketch["want"]
+
+    if x < q[0]:
+        q[0] = x
+        cell = 0
+    elif x >= q[4]:
+        q[4] = x
+        cell = 3
+    else:
+        cell = 0
+        while x >= q[cell + 1]:
+            cell += 1
+    for i in range(cell + 1, 5):
+        pos[i] += 1
+    for i in range(5):
+        want[i] += _P2_INCREMENTS[i]
+
+    # Move the middle markers towards their desired positions
+    for i in (1, 2, 3):
+        drift = want[i] - pos[i]
+        if (drift >= 1 and pos[i + 1] - pos[i] > 1) or (drift <= -1 and pos[i - 1] - pos[i] < -1):
+            step = 1 if drift > 0 else -1
+            parabolic = q[i] + step / (pos[i + 1] - pos[i - 1]) * (
+                (pos[i] - pos[i - 1] + step) * (q[i + 1] - q[i]) / (pos[i + 1] - pos[i])
+                + (pos[i + 1] - pos[i] - step) * (q[i] - q[i - 1]) / (pos[i] - pos[i - 1])
+            )
+            if q[i - 1] < parabolic < q[i + 1]:
+                q[i] = parabolic
+            else:
+                q[i] += step * (q[i + step] - q[i]) / (pos[i + step] - pos[i])
+            pos[i] += step
+
+
+def _p2_value(sketch):
+    q = sketch["q"]
+    if not q:
+        return 0.0
+    if len(q) < 5:
+        return q[min(len(q) - 1, int(QUANTILE * len(q)))]
+    return q[2]
+
+
+def score(stats, category, amount_paisa):
+    """
+    Scores an expense against its category's history in O(1).
+
+    Returns:
+        dict: z_score (of log amount), quantile (paisa), history (count),
+        reasons (list of "unusual" / "large") and anomalous (bool).
+    """
+    category_stats = stats["categories"].get(category)
+    result = {"z_score": 0.0, "quantile": 0, "history": 0, "reasons": [], "anomalous": False}
+    if category_stats is None or amount_paisa <= 0:
+        return result
+    n = category_stats["n"]
+    result["history"] = n
+    result["quantile"] = int(round(_p2_value(category_stats)))
+    if n < 2:
+        return result
+    std = math.sqrt(category_stats["m2"] / (n - 1))
+    if std > 0:
+        result["z_score"] = (math.log(amount_paisa) - category_stats["mean"]) / std
+    if n >= MIN_HISTORY:
+        if result["z_score"] >= Z_THRESHOLD:
+            result["reasons"].append("unusual")
+        if amount_paisa > LARGE_FACTOR * result["quantile"]:
+            result["reasons"].append("large")
+        result["anomalous"] = bool(result["reasons"])
+    return result
+
+
+def _update(stats, category, amount_paisa):
+    category_stats = stats["categories"].setdefault(
+        category, {"n": 0, "mean": 0.0, "m2": 0.0, "q": [], "pos": [], "want": []}
+    )
+    # Welford's online mean / variance over log amounts; spending amounts
+    # are heavy tailed, so the log scale keeps one big purchase from
+    # dominating the variance
+    value = math.log(amount_paisa)
+    category_stats["n"] += 1
+    delta = value - category_stats["mean"]
+    category_stats["mean"] += delta / category_stats["n"]
+    category_stats["m2"] += delta * (value - category_stats["mean"])
+    _p2_add(category_stats, amount_paisa)
+
+
+def _apply(stats, record):
+    """Scores an expense against the history so far, then adds it to the history."""
+    if record.get("type") != "expense":
+        return None
+    try:
+        amount_paisa = int(record["amount_paisa"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if amount_paisa <= 0:
+        return None
+    category = ledger.category_of(record)
+    result = score(stats, category, amount_paisa)
+    _update(stats, category, amount_paisa)
+    if not result["anomalous"]:
+        return None
+    flagged = {
+        "date": record.get("date", ""),
+        "category": category,
+        "description": record.get("description", ""),
+        "amount_paisa": amount_paisa,
+        "z_score": round(result["z_score"], 2),
+        "quantile": result["quantile"],
+        "reasons": result["reasons"]
+    }
+    stats["flagged"].append(flagged)
+    del stats["flagged"][:-MAX_FLAGGED]
+    return flagged
+
+
+def _current(ledger_path):
+    """Returns the up to date statistics for a ledger. Call with _lock held."""
+    key = os.path.normpath(ledger_path)
+    stats = _stats.get(key)
+    if stats is None:
+        stats = _load_cached(ledger_path)
+    stats, changed = ledger.catch_up(ledger_path, stats, _empty_stats, _apply)
+    if changed:
+        _save_cached(ledger_path, stats)
+    _stats[key] = stats
+    return stats
+
+
+def _on_ledger_write(path, records, start, end):
+    """
+    Scores appended expenses as they are written and alerts on anomalies.
+
+    The statistics are first brought up to the start of the write, so each
+    new expense is scored against everything written before it.
+    """
+    key = os.path.normpath(path)
+    with _lock:
+        if records is None:
+            _stats.pop(key, None)
+            return
+        stats = _stats.get(key) or _load_cached(path)
+        stats, _ = ledger.catch_up(path, stats, _empty_stats, _apply, stop=start)
+        scored = []
+        ledger.apply_append(path, stats, records, start, end, lambda stats, record: scored.append(_apply(stats, record)))
+        flagged = [f for f in scored if f]
+        # Importing old statements should not alert about last year's purchases
+        month = datetime.now().strftime("%Y-%m")
+        flagged = [f for f in flagged if f["date"].startswith(month)]
+        _stats[key] = stats
+        _save_cached(path, stats)
+    if flagged:
+        budget_alerts.publish(path, [
+            {"kind": "anomaly", "created_at": datetime.now().isoformat(timespec="seconds"), **f}
+            for f in flagged
+        ])
+
+
+ledger.add_write_listener(_on_ledger_write)
+
+
+@instrumentation.timed(rows=len)
+def flagged_expenses(ledger_path, month=None):
+    """
+    Returns the flagged expenses of a ledger, newest first.
+
+    Args:
+        month (str): "YYYY-MM" to only return that month's.
+    """
+    with _lock:
+        flagged = list(_current(ledger_path)["flagged"])
+    if month:
+        flagged = [f for f in flagged if f["date"].startswith(month)]
+    return flagged[::-1]
+
+
+def score_expense(ledger_path, category, amount_paisa):
+    """Scores a prospective expense against the ledger's history without recording it."""
+    with _lock:
+        return score(_current(ledger_path), category, amount_paisa)
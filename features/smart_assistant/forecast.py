@@ -0,0 +1,186 @@
+import calendar
+import os
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+
+from features.budgets import budget_engine
+from features.diagnostics import instrumentation
+
+# Days of history before this month used to learn daily rates and weekday patterns
+LOOKBACK_DAYS = 56
+# Weight of each day in the exponentially weighted model, per day of age
+EWMA_ALPHA = 0.1
+# The weekday model needs every weekday seen a few times to be trusted
+MIN_WEEKDAY_HISTORY_DAYS = 28
+
+RUN_RATE = "run_rate"
+EWMA = "ewma"
+WEEKDAY = "weekday"
+MODELS = (RUN_RATE, EWMA, WEEKDAY)
+
+# (ledger path, day) -> ((size, inode, mtime), forecast); only today's entries are kept
+_cache = {}
+_lock = threading.Lock()
+
+
+def _daily_matrix(ledger_path, first_day, last_day):
+    """
+    Builds a (days x categories) matrix of expense paisa for a date range.
+
+    Returns:
+        tuple: (matrix, list of categories, list of dates)
+    """
+    spend = budget_engine.daily_spend(ledger_path, first_day.isoformat(), last_day.isoformat())
+    categories = sorted({category for by_category in spend.values() for category in by_category})
+    days = [first_day + timedelta(days=i) for i in range((last_day - first_day).days + 1)]
+    matrix = np.zeros((len(days), len(categories)))
+    column = {category: i for i, category in enumerate(categories)}
+    for day_text, by_category in spend.items():
+        row = (date.fromisoformat(day_text) - first_day).days
+        for category, paisa in by_category.items():
+            matrix[row, column[category]] = paisa
+    return matrix, categories, days
+
+
+def _remaining_weekdays(today, days_in_month):
+    """How many of each weekday (Mon=0) are left in the month after today."""
+    counts = np.zeros(7)
+    for day in range(today.day + 1, days_in_month + 1):
+        counts[date(today.year, today.month, day).weekday()] += 1
+    return counts
+
+
+def _project(matrix, days, today, days_in_month):
+    """
+    Runs every model over all categories at once.
+
+    Args:
+        matrix: (days x categories) daily spend, ending with today.
+        days: the dates of the matrix rows.
+
+    Returns:
+        dict: model -> array of projected month-end spend per category,
+        plus "spent" (month to date).
+    """
+    month_start_row = len(days) - today.day
+    this_month = matrix[month_start_row:]
+    spent = this_month.sum(axis=0)
+    remaining_days = days_in_month - today.day
+
+    # Run-rate: this month's average day, repeated for the rest of the month
+    run_rate = spent + spent / today.day * remaining_days
+
+    # EWMA: recent days weigh more; today is weight 1, yesterday (1 - alpha), ...
+    weights = (1 - EWMA_ALPHA) ** np.arange(len(days) - 1, -1, -1)
+    daily_rate = weights @ matrix / weights.sum()
+    ewma = spent + daily_rate * remaining_days
+
+    # Weekday seasonality: mean spend per weekday over the whole window
+    weekday_of_row = np.array([day.weekday() for day in days])
+    weekday_totals = np.zeros((7, matrix.shape[1]))
+    np.add.at(weekday_totals, weekday_of_row, matrix)
+    weekday_counts = np.bincount(weekday_of_row, minlength=7)[:, None]
+    weekday_mean = weekday_totals / np.maximum(weekday_counts, 1)
+    weekday = spent + _remaining_weekdays(today, days_in_month) @ weekday_mean
+
+    return {"spent": spent, RUN_RATE: run_rate, EWMA: ewma, WEEKDAY: weekday}
+
+
+def _build(ledger_path, today):
+    days_in_month = calendar.monthrange(today.year, today.month)[1]
+    month_start = today.replace(day=1)
+    first_day = month_start - timedelta(days=LOOKBACK_DAYS)
+    matrix, categories, days = _daily_matrix(ledger_path, first_day, today)
+    projections = _project(matrix, days, today, days_in_month)
+
+    monthly = budget_engine.monthly_totals(ledger_path)
+    history_days = (month_start - min(
+        (date.fromisoformat(month + "-01") for month in monthly), default=month_start
+    )).days
+    model = WEEKDAY if history_days >= MIN_WEEKDAY_HISTORY_DAYS else RUN_RATE
+
+    by_category = {
+        category: {name: int(round(values[i])) for name, values in projections.items()}
+        for i, category in enumerate(categories)
+    }
+    total = {name: int(round(values.sum())) for name, values in projections.items()}
+
+    # Balance: what is left today, minus the spending still expected this
+    # month, plus the income still expected (the average of the last three
+    # months' income, less what has already come in)
+    current_month = today.strftime("%Y-%m")
+    balance_now = sum(t["income"] - t["expense"] for t in monthly.values())
+    past_months = sorted(month for month in monthly if month < current_month)[-3:]
+    usual_income = sum(monthly[m]["income"] for m in past_months) / len(past_months) if past_months else 0
+    income_so_far = monthly.get(current_month, {}).get("income", 0)
+    expected_income = max(0, usual_income - income_so_far)
+    balance_projected = balance_now - (total[model] - total["spent"]) + expected_income
+
+    return {
+        "date": today.isoformat(),
+        "days_elapsed": today.day,
+        "days_in_month": days_in_month,
+        "model": model,
+        "categories": by_category,
+        "total": total,
+        "balance": {"current": balance_now, "projected": int(round(balance_projected))}
+    }
+
+
+@instrumentation.timed()
+def forecast_month(ledger_path, today=None):
+    """
+    Projects month-end spend per category and the month-end balance.
+
+    Every model is computed for every category in one pass of array
+    operations over the daily spend counters, and the result is cached per
+    (ledger, day) until the ledger changes, so it is cheap to call on every
+    dashboard load.
+
+    Args:
+        ledger_path (str): CLI or per-user dashboard ledger.
+        today (date): Defaults to today.
+
+    Returns:
+        dict: with "model" (the model to trust), "categories" and "total"
+        mapping to {"spent", "run_rate", "ewma", "weekday"} in paisa, and
+        "balance" {"current", "projected"} in paisa.
+    """
+    today = today or date.today()
+    try:
+        stat = os.stat(ledger_path)
+        signature = (stat.st_size, stat.st_ino, stat.st_mtime_ns)
+    except FileNotFoundError:
+        signature = None
+    key = (os.path.normpath(ledger_path), today.isoformat())
+    with _lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+    result = _build(ledger_path, today)
+    with _lock:
+        for stale in [k for k in _cache if k[1] != key[1]]:
+            del _cache[stale]
+        _cache[key] = (signature, result)
+    return result
+
+
+def likely_overspend(forecast, budgets):
+    """
+    Budgets that are not exceeded yet but will be at the current pace.
+
+    Returns:
+        list: (category, projected paisa, budget paisa), worst first.
+    """
+    flagged = []
+    for category, budget_paisa in budgets.items():
+        projection = forecast["categories"].get(category)
+        if projection is None or projection["spent"] >= budget_paisa:
+            continue
+        projected = projection[forecast["model"]]
+        if projected > budget_paisa:
+            flagged.append((category, projected, budget_paisa))
+    flagged.sort(key=lambda item: item[1] / item[2], reverse=True)
+    return flagged
@@ -0,0 +1,286 @@
+import calendar
+import json
+import os
+import re
+import threading
+from bisect import insort
+from datetime import date, timedelta
+
+from features.ledger import ledger
+from features.diagnostics import instrumentation
+
+CACHE_DIR = "database/cache"
+STATE_VERSION = 2
+
+# A charge joins the payee's series whose average amount it is within
+# +/-10% of, so a bill that varies a little still forms one series
+AMOUNT_TOLERANCE = 0.10
+# Only the most recent dates of each series are kept; that is plenty to
+# judge its rhythm and keeps the cache small for long ledgers
+MAX_DATES = 24
+# Share of the gaps between charges that must match the period
+REGULARITY = 0.75
+# Words kept from a normalized description
+DESCRIPTION_WORDS = 4
+
+WEEKLY = "weekly"
+MONTHLY = "monthly"
+ANNUAL = "annual"
+# period -> (typical gap in days, allowed deviation in days, charges needed)
+PERIODS = {
+    WEEKLY: (7, 1, 4),
+    MONTHLY: (30, 4, 3),
+    ANNUAL: (365, 10, 2),
+}
+# How many times per month a payment of each period falls due, on average
+PER_MONTH = {WEEKLY: 52 / 12, MONTHLY: 1, ANNUAL: 1 / 12}
+
+# ledger path -> state dict, see _empty_state()
+_states = {}
+_lock = threading.Lock()
+
+
+def _empty_state():
+    # groups:    {key: {"description", "category", "type", "dates" (sorted,
+    #             the latest MAX_DATES), "count", "total_paisa", "last_paisa"}}
+    # payees:    {"type|payee": [keys of that payee's groups, one per amount]}
+    # recurring: {key: detected series} for the groups that repeat
+    # dirty:     keys of groups changed since recurring was last refreshed
+    return {"version": STATE_VERSION, "inode": None, "offset": 0,
+            "groups": {}, "payees": {}, "recurring": {}, "dirty": {}}
+
+
+def _cache_path(ledger_path):
+    name = os.path.splitext(os.path.basename(ledger_path))[0]
+    return os.path.join(CACHE_DIR, f"recurring_{name}.json")
+
+
+def _load_cached(ledger_path):
+    try:
+        with open(_cache_path(ledger_path), "r") as f:
+            state = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if not isinstance(state, dict) or state.get("version") != STATE_VERSION:
+        return None
+    return state
+
+
+def _save_cached(ledger_path, state):
+    path = _cache_path(ledger_path)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump(state, f)
+        os.replace(path + ".tmp", path)
+    except OSError:
+        pass
+
+
+def normalize_description(description):
+    """
+    Reduces a description to the words that identify the payee.
+
+    Digits and punctuation (reference numbers, dates, card endings) are
+    dropped, so "NETFLIX.COM 4411 #2291" and "Netflix.com 8812" match.
+    """
+    words = re.sub(r"[^a-z]+", " ", str(description).lower()).split()
+    return " ".join([word for word in words if len(word) > 1][:DESCRIPTION_WORDS])
+
+
+def _group_key(state, payee, amount_paisa):
+    """
+    The group of a payee's charges an amount belongs to: the one whose
+    average is closest, if within AMOUNT_TOLERANCE, else a new one.
+
+    Clustering on the amount itself rather than on fixed bands keeps
+    charges a rupee apart together wherever they fall.
+    """
+    keys = state["payees"].setdefault(payee, [])
+    best, best_distance = None, AMOUNT_TOLERANCE
+    for key in keys:
+        group = state["groups"][key]
+        average = group["total_paisa"] / group["count"]
+        distance = abs(amount_paisa - average) / average
+        if distance <= best_distance:
+            best, best_distance = key, distance
+    if best is None:
+        best = f"{payee}|{len(keys)}"
+        keys.append(best)
+    return best
+
+
+def _apply(state, record):
+    """Adds one transaction to its group in O(log MAX_DATES)."""
+    kind = record.get("type")
+    if kind not in ("expense", "income"):
+        return
+    try:
+        amount_paisa = int(record["amount_paisa"])
+        day = date.fromisoformat(str(record["date"])[:10]).isoformat()
+    except (KeyError, TypeError, ValueError):
+        return
+    if amount_paisa <= 0:
+        return
+    category = ledger.category_of(record)
+    payee = normalize_description(record.get("description", "")) or category.lower()
+    key = _group_key(state, f"{kind}|{payee}", amount_paisa)
+
+    group = state["groups"].setdefault(key, {
+        "description": "", "category": category, "type": kind,
+        "dates": [], "count": 0, "total_paisa": 0, "last_paisa": 0
+    })
+    group["count"] += 1
+    group["total_paisa"] += amount_paisa
+    dates = group["dates"]
+    if len(dates) >= MAX_DATES and day < dates[0]:
+        return  # Older than every date kept; only the totals change
+    insort(dates, day)
+    del dates[:-MAX_DATES]
+    if day == dates[-1]:
+        group["description"] = record.get("description", "") or category
+        group["category"] = category
+        group["last_paisa"] = amount_paisa
+    state["dirty"][key] = True
+
+
+def _detect(group):
+    """
+    Finds the period of a group with one sort-and-diff pass over its dates.
+
+    Returns:
+        dict: The series (period, interval_days, ...), or None if the
+        dates do not repeat regularly.
+    """
+    days = sorted({date.fromisoformat(day) for day in group["dates"]})
+    gaps = sorted((later - earlier).days for earlier, later in zip(days, days[1:]))
+    if not gaps:
+        return None
+    median = gaps[len(gaps) // 2]
+    for period, (typical, deviation, needed) in PERIODS.items():
+        if len(days) < needed or abs(median - typical) > deviation:
+            continue
+        regular = sum(1 for gap in gaps if abs(gap - typical) <= deviation)
+        if regular < REGULARITY * len(gaps):
+            return None
+        return {
+            "description": group["description"],
+            "category": group["category"],
+            "type": group["type"],
+            "period": period,
+            "interval_days": median,
+            "occurrences": group["count"],
+            "amount_paisa": group["last_paisa"],
+            "average_paisa": group["total_paisa"] // group["count"],
+            "last_date": days[-1].isoformat()
+        }
+    return None
+
+
+def _refresh(state):
+    """Re-runs detection for the groups that changed. Returns True if any did."""
+    if not state["dirty"]:
+        return False
+    for key in state["dirty"]:
+        series = _detect(state["groups"][key])
+        if series is None:
+            state["recurring"].pop(key, None)
+        else:
+            state["recurring"][key] = series
+    state["dirty"] = {}
+    return True
+
+
+def _current(ledger_path):
+    """Returns the up to date state for a ledger. Call with _lock held."""
+    key = os.path.normpath(ledger_path)
+    state = _states.get(key)
+    if state is None:
+        state = _load_cached(ledger_path)
+    state, changed = ledger.catch_up(ledger_path, state, _empty_state, _apply)
+    if _refresh(state) or changed:
+        _save_cached(ledger_path, state)
+    _states[key] = state
+    return state
+
+
+def _on_ledger_write(path, records, start, end):
+    """Adds appended transactions to their groups and re-checks only those groups."""
+    key = os.path.normpath(path)
+    with _lock:
+        state = _states.get(key)
+        if state is None:
+            return
+        if not ledger.apply_append(path, state, records, start, end, _apply):
+            _states.pop(key, None)
+            return
+        _refresh(state)
+        _save_cached(path, state)
+
+
+ledger.add_write_listener(_on_ledger_write)
+
+
+def next_due(series):
+    """The date (ISO) a series is next expected, one period after its last charge."""
+    last = date.fromisoformat(series["last_date"])
+    if series["period"] == WEEKLY:
+        return (last + timedelta(days=7)).isoformat()
+    if series["period"] == ANNUAL:
+        day = min(last.day, calendar.monthrange(last.year + 1, last.month)[1])
+        return last.replace(year=last.year + 1, day=day).isoformat()
+    year, month = (last.year + 1, 1) if last.month == 12 else (last.year, last.month + 1)
+    return date(year, month, min(last.day, calendar.monthrange(year, month)[1])).isoformat()
+
+
+def monthly_cost(series):
+    """What a series costs (or brings in) per month on average, in paisa."""
+    return int(round(series["amount_paisa"] * PER_MONTH[series["period"]]))
+
+
+@instrumentation.timed(rows=len)
+def recurring_transactions(ledger_path, kind="expense", today=None, include_lapsed=False):
+    """
+    Returns the recurring payments (subscriptions, bills, salary...) of a ledger.
+
+    Detection is cached per group and only re-run for groups that received
+    new transactions, so this is cheap to call on every screen load.
+
+    Args:
+        ledger_path (str): CLI or per-user dashboard ledger.
+        kind (str): "expense", "income", or None for both.
+        today (date): Defaults to today.
+        include_lapsed (bool): Also return series whose next charge is
+            overdue by more than the period's allowed deviation.
+
+    Returns:
+        list: One dict per series, soonest next_date first, with
+        description, category, type, period, interval_days, occurrences,
+        amount_paisa (latest charge), average_paisa, last_date, next_date
+        and active.
+    """
+    today = today or date.today()
+    with _lock:
+        found = list(_current(ledger_path)["recurring"].values())
+    results = []
+    for series in found:
+        if kind and series["type"] != kind:
+            continue
+        due = next_due(series)
+        grace = timedelta(days=PERIODS[series["period"]][1])
+        active = date.fromisoformat(due) + grace >= today
+        if active or include_lapsed:
+            results.append({**series, "next_date": due, "active": active})
+    results.sort(key=lambda series: (series["next_date"], series["description"]))
+    return results
+
+
+@instrumentation.timed(rows=len)
+def upcoming_payments(ledger_path, days=7, today=None):
+    """Active recurring expenses expected within the next `days` days (or overdue)."""
+    today = today or date.today()
+    horizon = (today + timedelta(days=days)).isoformat()
+    return [
+        series for series in recurring_transactions(ledger_path, "expense", today)
+        if series["next_date"] <= horizon
+    ]
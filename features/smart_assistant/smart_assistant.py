@@ -1,58 +1,44 @@
 import datetime
-from collections import defaultdict
 from rich.console import Console
 from rich.panel import Panel
 from rich.text import Text
 import calendar
 import random
 
+from features.budgets import budget_engine
+from features.diagnostics import instrumentation
+from features.smart_assistant import forecast, recurring
+from features.ledger import ledger
+from features.service import client
+
 # Assuming these paths based on the project structure
 TRANSACTIONS_FILE = "database/transactions.txt"
-BUDGET_FILE = "database/budget.txt"
 
 console = Console()
 
+@instrumentation.timed(rows=len)
 def load_transactions():
     transactions = []
     try:
-        with open(TRANSACTIONS_FILE, "r") as f:
-            for line in f:
-                parts = line.strip().split(",")
-                if len(parts) == 6:
-                    try:
-                        # Date, Type, Category, Amount (paisa), Description, ID
-                        transactions.append({
-                            "date": datetime.datetime.strptime(parts[0], "%Y-%m-%d").date(),
-                            "type": parts[1],
-                            "category": parts[2],
-                            "amount": int(parts[3]),  # Storing as paisa/cents
-                            "description": parts[4],
-                            "id": parts[5]
-                        })
-                    except ValueError:
-                        console.print(f"[red]Skipping malformed transaction line: {line.strip()}[/red]")
-                else:
-                    console.print(f"[red]Skipping malformed transaction line: {line.strip()}[/red]")
+        snapshot = client.call("ledger.records", path=TRANSACTIONS_FILE)
     except FileNotFoundError:
         console.print(f"[yellow]No transactions found at {TRANSACTIONS_FILE}. Starting fresh.[/yellow]")
+        return transactions
+    for record in snapshot["records"]:
+        try:
+            transactions.append({
+                "date": datetime.datetime.strptime(record["date"], "%Y-%m-%d").date(),
+                "type": record["type"],
+                "category": ledger.category_of(record),
+                "amount": int(record["amount_paisa"]),  # Storing as paisa/cents
+                "description": record.get("description", ""),
+            })
+        except (KeyError, TypeError, ValueError):
+            console.print(f"[red]Skipping malformed transaction: {record}[/red]")
     return transactions
 
 def load_budgets():
-    budgets = {}
-    try:
-        with open(BUDGET_FILE, "r") as f:
-            for line in f:
-                parts = line.strip().split(",")
-                if len(parts) == 2:
-                    try:
-                        budgets[parts[0]] = int(parts[1]) # Category: Amount (paisa)
-                    except ValueError:
-                        console.print(f"[red]Skipping malformed budget line: {line.strip()}[/red]")
-                else:
-                    console.print(f"[red]Skipping malformed budget line: {line.strip()}[/red]")
-    except FileNotFoundError:
-        console.print(f"[yellow]No budget found at {BUDGET_FILE}.[/yellow]")
-    return budgets
+    return client.call("budget.load")
 
 def get_transactions_for_month(transactions, year, month):
     return [t for t in transactions if t["date"].year == year and t["date"].month == month]
@@ -85,19 +71,14 @@ def is_income_consistent(transactions, num_months=3):
 def generate_smart_recommendations(transactions, budgets):
     console.print(Panel("[bold yellow]💡 Smart Recommendations[/bold yellow]", expand=False))
 
-    current_year, current_month = get_current_month_and_year()
-    current_month_transactions = get_transactions_for_month(transactions, current_year, current_month)
-
-    total_income = sum(t["amount"] for t in current_month_transactions if t["type"] == "income")
-    total_expenses = sum(t["amount"] for t in current_month_transactions if t["type"] == "expense")
+    totals = client.call("budget.month_totals", ledger_path=TRANSACTIONS_FILE)
+    total_income = totals["income"]
+    total_expenses = totals["expense"]
     
     recommendations = []
 
     # Recommendation 1: Overspending categories
-    expense_by_category = defaultdict(int)
-    for t in current_month_transactions:
-        if t["type"] == "expense":
-            expense_by_category[t["category"]] += t["amount"]
+    expense_by_category = client.call("budget.month_spend", ledger_path=TRANSACTIONS_FILE)
 
     for category, spent_amount in expense_by_category.items():
         if category in budgets:
@@ -121,6 +102,13 @@ def generate_smart_recommendations(transactions, budgets):
                     f"You have significant spending in [blue]{category}[/blue] (Rs {spent_amount / 100:.2f}) but no budget set. Consider setting a budget for this category."
                 )
 
+    # Recommendation 1b: Categories that are on pace to go over budget
+    for category, projected, budget_amount in forecast.likely_overspend(client.call("assistant.forecast", ledger_path=TRANSACTIONS_FILE), budgets):
+        recommendations.append(
+            f"At your current pace [yellow]{category}[/yellow] will reach Rs {projected / 100:.2f} by month end, "
+            f"Rs {(projected - budget_amount) / 100:.2f} over its budget. Slowing down now avoids overspending later."
+        )
+
     # Recommendation 2: Low savings
     savings = total_income - total_expenses
     if total_income > 0:
@@ -151,6 +139,7 @@ def generate_smart_recommendations(transactions, budgets):
     else:
         console.print("No specific recommendations at this time. Your finances look healthy! Keep up the good work.")
 
+@instrumentation.timed()
 def display_smart_assistant_dashboard():
     transactions = load_transactions()
     budgets = load_budgets()
@@ -165,14 +154,24 @@ def display_smart_assistant_dashboard():
     console.print(f"\n[bold]📊 Daily Financial Check ({datetime.date.today().strftime('%b %d, %Y')}):[/bold]")
     today = datetime.date.today()
     current_year, current_month = get_current_month_and_year()
-    current_month_transactions = get_transactions_for_month(transactions, current_year, current_month)
 
-    today_spending = sum(t["amount"] for t in transactions if t["date"] == today and t["type"] == "expense")
+    # Every aggregate this screen shows, fetched in one round trip
+    daily, month_totals, month_forecast, budget_statuses, flagged_expenses, upcoming, subscriptions = client.call_batch([
+        ("budget.daily_spend", {"ledger_path": TRANSACTIONS_FILE, "first_day": today.isoformat(), "last_day": today.isoformat()}),
+        ("budget.month_totals", {"ledger_path": TRANSACTIONS_FILE}),
+        ("assistant.forecast", {"ledger_path": TRANSACTIONS_FILE}),
+        ("budget.evaluate", {"budgets": budgets, "ledger_path": TRANSACTIONS_FILE, "warning_percent": 80}),
+        ("assistant.flagged", {"ledger_path": TRANSACTIONS_FILE, "month": today.strftime("%Y-%m")}),
+        ("assistant.upcoming", {"ledger_path": TRANSACTIONS_FILE, "days": 3}),
+        ("assistant.recurring", {"ledger_path": TRANSACTIONS_FILE}),
+    ])
+
+    today_spending = sum(daily.get(today.isoformat(), {}).values())
     console.print(f"Today's Spending: Rs {today_spending / 100:.2f}")
 
     # Calculate remaining daily budget
     total_monthly_budget = sum(budgets.values())
-    current_month_expenses = sum(t["amount"] for t in current_month_transactions if t["type"] == "expense")
+    current_month_expenses = month_totals["expense"]
     
     # Get days in current month
     _, last_day_of_month = calendar.monthrange(current_year, current_month)
@@ -190,28 +189,40 @@ def display_smart_assistant_dashboard():
     
     console.print(f"Remaining Daily Budget: {daily_budget_status}")
 
+    # Month-end forecast
+    projected_spend = month_forecast["total"][month_forecast["model"]]
+    projected_balance = month_forecast["balance"]["projected"]
+    balance_style = "green" if projected_balance >= 0 else "red"
+    console.print(f"Projected Month-end Spending: Rs {projected_spend / 100:.2f}")
+    console.print(f"Projected Month-end Balance: [{balance_style}]Rs {projected_balance / 100:.2f}[/{balance_style}]")
+
     # Alerts
     alerts = []
-    total_income_this_month = sum(t["amount"] for t in current_month_transactions if t["type"] == "income")
 
     # Budget warnings (>80% used)
-    expense_by_category = defaultdict(int)
-    for t in current_month_transactions:
-        if t["type"] == "expense":
-            expense_by_category[t["category"]] += t["amount"]
+    for status in budget_statuses:
+        category = status["category"]
+        spent_amount = status["spent_paisa"]
+        budget_amount = status["budget_paisa"]
+        if status["status"] == budget_engine.STATUS_OK:
+            continue
+        if spent_amount <= budget_amount:
+            alerts.append(f"• [yellow]Budget Warning:[/yellow] {category} is at {spent_amount / budget_amount:.0%} of its budget (Rs {spent_amount / 100:.2f} / Rs {budget_amount / 100:.2f})")
+        else:
+            alerts.append(f"• [red]Budget Overspent:[/red] {category} budget overspent by Rs {(spent_amount - budget_amount) / 100:.2f}")
 
-    for category, spent_amount in expense_by_category.items():
-        if category in budgets:
-            budget_amount = budgets[category]
-            if budget_amount > 0 and spent_amount > budget_amount * 0.8 and spent_amount <= budget_amount:
-                alerts.append(f"• [yellow]Budget Warning:[/yellow] {category} is at {spent_amount / budget_amount:.0%} of its budget (Rs {spent_amount / 100:.2f} / Rs {budget_amount / 100:.2f})")
-            elif spent_amount > budget_amount:
-                alerts.append(f"• [red]Budget Overspent:[/red] {category} budget overspent by Rs {(spent_amount - budget_amount) / 100:.2f}")
+    # Forecast warnings: under budget today but on pace to go over
+    for category, projected, budget_amount in forecast.likely_overspend(month_forecast, budgets):
+        alerts.append(f"• [yellow]Forecast:[/yellow] {category} is on pace for Rs {projected / 100:.2f} this month (budget Rs {budget_amount / 100:.2f})")
+
+    # Unusual or large expenses, judged against each category's own history
+    for flagged in flagged_expenses:
+        reasons = " and ".join(flagged["reasons"])
+        alerts.append(f"• [yellow]Unusual Transaction:[/yellow] Rs {flagged['amount_paisa'] / 100:.2f} in {flagged['category']} on {flagged['date']} is {reasons} for this category (usually under Rs {flagged['quantile'] / 100:.2f})")
 
-    # Large transaction alerts (>20% of monthly income)
-    for t in current_month_transactions:
-        if t["type"] == "expense" and total_income_this_month > 0 and t["amount"] > total_income_this_month * 0.2:
-            alerts.append(f"• [yellow]Large Transaction:[/yellow] Rs {t['amount'] / 100:.2f} in {t['category']} on {t['date'].strftime('%b %d')} (>{total_income_this_month * 0.2 / 100:.2f} of monthly income)")
+    # Subscriptions and bills due in the next few days
+    for series in upcoming:
+        alerts.append(f"• [cyan]Bill Reminder:[/cyan] {series['description']} (Rs {series['amount_paisa'] / 100:.2f}, {series['period']}) is expected on {series['next_date']}")
 
     if alerts:
         console.print("\n[bold]⚠️ Alerts:[/bold]")
@@ -220,6 +231,14 @@ def display_smart_assistant_dashboard():
     else:
         console.print("\n[bold]✅ No alerts at this time.[/bold]")
 
+    # Recurring payments found in the whole history
+    if subscriptions:
+        console.print("\n[bold]🔁 Recurring Payments:[/bold]")
+        for series in subscriptions:
+            console.print(f"• {series['description']} ({series['category']}): Rs {series['amount_paisa'] / 100:.2f} {series['period']}, next on {series['next_date']}")
+        monthly_total = sum(recurring.monthly_cost(series) for series in subscriptions)
+        console.print(f"Recurring payments cost about Rs {monthly_total / 100:.2f} per month.")
+
     # Quick tip for the day
     tips = [
         "Review your subscriptions and cancel any you don't use.",
@@ -1,5 +1,6 @@
+import os
 import questionary
-from datetime import datetime
+from datetime import datetime, timedelta
 from rich.console import Console
 from rich.table import Table
 
@@ -28,55 +29,74 @@ def _get_date_input(prompt: str) -> str:
         except ValueError:
             console.print("[red]Invalid date format. Please use YYYY-MM-DD.[/red]")
 
-import json
+from features.categorization import classifier
+from features.diagnostics import instrumentation
+from features.service import client
 
-def _read_transactions():
+@instrumentation.timed(rows=len)
+def _query_transactions(filters=None):
+    """The transactions matching filters (see features.search.query), newest first."""
     transactions = []
-    try:
-        with open(TRANSACTIONS_FILE, "r") as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    data = json.loads(line)
-                    transactions.append({
-                        "date": data["date"],
-                        "type": data["type"],
-                        "category_or_source": data["category_or_source"],
-                        "description": data["description"],
-                        "amount_paisa": int(data["amount_paisa"])
-                    })
-                except json.JSONDecodeError:
-                    console.print(f"[yellow]Skipping malformed transaction line: {line}[/yellow]")
-    except FileNotFoundError:
+    if not os.path.exists(TRANSACTIONS_FILE):
         console.print(f"[yellow]No transactions found in {TRANSACTIONS_FILE}.[/yellow]")
+        return transactions
+    result = client.call("ledger.query", ledger_path=TRANSACTIONS_FILE, filters=filters)
+    skipped = result["skipped"]
+    for data in result["transactions"]:
+        try:
+            transactions.append({
+                "date": data["date"],
+                "type": data["type"],
+                "category_or_source": data["category_or_source"],
+                "description": data["description"],
+                "amount_paisa": int(data["amount_paisa"])
+            })
+        except (KeyError, ValueError):
+            skipped += 1
+
+    if skipped:
+        console.print(f"[yellow]Skipped {skipped} damaged transaction lines. Use 'Repair Ledger' to recover them.[/yellow]")
 
     return transactions
 
 
 def _save_transaction(date, type, category_or_source, description, amount_paisa):
-    with open(TRANSACTIONS_FILE, "a") as f:
-        json.dump({
-            "date": date,
-            "type": type,
-            "category_or_source": category_or_source,
-            "description": description,
-            "amount_paisa": amount_paisa
-        }, f)
-        f.write("\n")
+    client.call("ledger.append", path=TRANSACTIONS_FILE, records=[{
+        "date": date,
+        "type": type,
+        "category_or_source": category_or_source,
+        "description": description,
+        "amount_paisa": amount_paisa
+    }])
 
     console.print(f"[green]{type.capitalize()} added successfully![/green]")
 
 
+def _select_category(prompt, choices, description, type, amount_paisa):
+    """Asks for a category, pre-selecting the one the category rules or past entries suggest."""
+    suggestion = client.call("assistant.suggest_category", ledger_path=TRANSACTIONS_FILE,
+                             description=description, kind=type, amount_paisa=amount_paisa)
+    if suggestion is None:
+        return questionary.select(prompt, choices=choices).ask()
+    category, confidence, source = suggestion
+    if category not in choices:
+        choices = [category] + choices
+    if source == classifier.SOURCE_RULE:
+        console.print(f"[blue]Suggested by your category rules: {category}[/blue]")
+    else:
+        console.print(f"[blue]Suggested from your past transactions: {category} ({confidence:.0%} sure)[/blue]")
+    return questionary.select(prompt, choices=choices, default=category).ask()
+
+
 def add_expense():
     console.print("\n[bold blue]Add New Expense[/bold blue]")
     amount_paisa = _get_amount_input("Enter amount (e.g., 12.50):")
-    category = questionary.select(
-        "Select category:",
-        choices=["Food", "Transport", "Shopping", "Bills", "Entertainment", "Health", "Other"]
-    ).ask()
     description = questionary.text("Enter description:").ask()
+    category = _select_category(
+        "Select category:",
+        ["Food", "Transport", "Shopping", "Bills", "Entertainment", "Health", "Other"],
+        description, "expense", amount_paisa
+    )
     date = _get_date_input("Enter date (YYYY-MM-DD, default today):")
 
     _save_transaction(date, "expense", category, description, amount_paisa)
@@ -84,53 +104,76 @@ def add_expense():
 def add_income():
     console.print("\n[bold green]Add New Income[/bold green]")
     amount_paisa = _get_amount_input("Enter amount (e.g., 100.00):")
-    source = questionary.select(
-        "Select source:",
-        choices=["Salary", "Freelance", "Business", "Investment", "Gift", "Other"]
-    ).ask()
     description = questionary.text("Enter description:").ask()
+    source = _select_category(
+        "Select source:",
+        ["Salary", "Freelance", "Business", "Investment", "Gift", "Other"],
+        description, "income", amount_paisa
+    )
     date = _get_date_input("Enter date (YYYY-MM-DD, default today):")
 
     _save_transaction(date, "income", source, description, amount_paisa)
 
+def _ask_optional(prompt, parse):
+    """Asks for an optional value; blank means no filter. Re-asks until parse() accepts it."""
+    while True:
+        text = (questionary.text(prompt).ask() or "").strip()
+        if not text:
+            return None
+        try:
+            return parse(text)
+        except ValueError:
+            console.print(f"[red]Invalid value '{text}'.[/red]")
+
+def _custom_filters():
+    """Asks for each filter of a query (see features.search.query)."""
+    def day(text):
+        return datetime.strptime(text, "%Y-%m-%d").strftime("%Y-%m-%d")
+
+    def paisa(text):
+        return int(round(float(text) * 100))
+
+    filters = {
+        "date_from": _ask_optional("From date (YYYY-MM-DD, blank for any):", day),
+        "date_to": _ask_optional("To date (YYYY-MM-DD, blank for any):", day),
+    }
+    type_choice = questionary.select("Type:", choices=["Both", "expense", "income"]).ask()
+    filters["types"] = None if type_choice in (None, "Both") else [type_choice]
+    filters["categories"] = _ask_optional("Categories/sources, comma separated (blank for all):",
+                                          lambda text: [c.strip() for c in text.split(",") if c.strip()])
+    filters["min_paisa"] = _ask_optional("Minimum amount (blank for any):", paisa)
+    filters["max_paisa"] = _ask_optional("Maximum amount (blank for any):", paisa)
+    filters["text"] = _ask_optional("Description words (word* for prefixes, blank for any):", str)
+    return filters
+
+@instrumentation.timed()
 def list_transactions():
     console.print("\n[bold blue]Listing Transactions[/bold blue]")
-    transactions = _read_transactions()
-
-    if not transactions:
+    if not os.path.exists(TRANSACTIONS_FILE):
+        console.print(f"[yellow]No transactions found in {TRANSACTIONS_FILE}.[/yellow]")
         return
 
     filter_option = questionary.select(
         "Filter transactions:",
-        choices=["All", "Last 7 days", "Expenses only", "Income only"]
+        choices=["All", "Last 7 days", "Expenses only", "Income only", "Custom filter"]
     ).ask()
 
-    filtered_transactions = []
-    today = datetime.now().date()
-
-    for t in transactions:
-        transaction_date = datetime.strptime(t["date"], "%Y-%m-%d").date()
-        
-        # Apply date filter
-        if filter_option == "Last 7 days":
-            if (today - transaction_date).days > 7:
-                continue
-        
-        # Apply type filter
-        if filter_option == "Expenses only" and t["type"] != "expense":
-            continue
-        if filter_option == "Income only" and t["type"] != "income":
-            continue
-        
-        filtered_transactions.append(t)
-
+    filters = {}
+    if filter_option == "Last 7 days":
+        filters["date_from"] = (datetime.now().date() - timedelta(days=7)).isoformat()
+    elif filter_option == "Expenses only":
+        filters["types"] = ["expense"]
+    elif filter_option == "Income only":
+        filters["types"] = ["income"]
+    elif filter_option == "Custom filter":
+        filters = _custom_filters()
+
+    # Filtered by the ledger index and already sorted, newest first
+    filtered_transactions = _query_transactions(filters)
     if not filtered_transactions:
         console.print("[yellow]No transactions found matching the filter criteria.[/yellow]")
         return
 
-    # Sort by date, newest first
-    filtered_transactions.sort(key=lambda x: datetime.strptime(x["date"], "%Y-%m-%d"), reverse=True)
-
     table = Table(title="Transactions")
     table.add_column("Date", style="cyan", no_wrap=True)
     table.add_column("Type", style="magenta")
@@ -155,25 +198,19 @@ def list_transactions():
     
     console.print(table)
 
+@instrumentation.timed()
 def balance():
     console.print("\n[bold blue]Current Balance[/bold blue]")
-    transactions = _read_transactions()
-
-    if not transactions:
+    if not os.path.exists(TRANSACTIONS_FILE):
         console.print("[yellow]No transactions to calculate balance.[/yellow]")
         return
 
+    # The month's totals come from the spend counters, not a ledger scan
     current_month = datetime.now().strftime("%Y-%m")
-    total_income_paisa = 0
-    total_expense_paisa = 0
-
-    for t in transactions:
-        if t["date"].startswith(current_month):
-            if t["type"] == "income":
-                total_income_paisa += t["amount_paisa"]
-            elif t["type"] == "expense":
-                total_expense_paisa += t["amount_paisa"]
-    
+    totals = client.call("budget.month_totals", ledger_path=TRANSACTIONS_FILE, month=current_month)
+    total_income_paisa = totals["income"]
+    total_expense_paisa = totals["expense"]
+
     balance_paisa = total_income_paisa - total_expense_paisa
 
     console.print(f"Total Income ({current_month}): [green]Rs {total_income_paisa / 100:.2f}[/green]")
@@ -1,89 +1,162 @@
+import importlib
 import subprocess
-import questionary
-from features.transactions2 import transactions
-from features.budgets import budget
-from features.analytics.analytics import display_analytics
-from features.smart_assistant.smart_assistant import display_smart_assistant_dashboard
-from features.data_management import data_management
-from rich.console import Console
+import sys
+
+# Feature modules (and rich with them) are only imported when a command
+# that needs them runs, so the menu appears without paying for pandas,
+# numpy or features the session never touches. questionary is the one
+# heavy import left: the menu itself is a questionary prompt.
+#
+# Each command is (menu label, module, function, file path prompt). When a
+# prompt is given, the function is called with the path the user enters.
+COMMANDS = [
+    ("Add Expense", "features.transactions2.transactions", "add_expense", None),
+    ("Add Income", "features.transactions2.transactions", "add_income", None),
+    ("List Transactions", "features.transactions2.transactions", "list_transactions", None),
+    ("Search Transactions", "features.search.search", "search_transactions",
+     "Search for (every word must match; end a word with * to match words starting with it):"),
+    ("View Balance", "features.transactions2.transactions", "balance", None),
+    ("Set Budget", "features.budgets.budget", "add_budget", None),
+    ("View Budgets", "features.budgets.budget", "view_budgets", None),
+    ("Budget vs Actual Report", "features.budgets.budget", "view_budget_report", None),
+    ("View Analytics", "features.analytics.analytics", "display_analytics", None),
+    ("Smart Assistant", "features.smart_assistant.smart_assistant", "display_smart_assistant_dashboard", None),
+    ("Export Transactions to CSV", "features.data_management.data_management", "export_transactions_to_csv",
+     "Enter CSV file path (e.g., transactions.csv):"),
+    ("Export Transactions to JSON", "features.data_management.data_management", "export_transactions_to_json",
+     "Enter JSON file path (e.g., transactions.json):"),
+    ("Export Monthly Report to JSON", "features.data_management.data_management", "export_monthly_report_to_json",
+     "Enter JSON file path for monthly report (e.g., monthly_report.json):"),
+    ("Import Transactions from CSV", "features.data_management.data_management", "import_transactions_from_csv",
+     "Enter CSV file path to import from:"),
+    ("Import Bank Statement", "features.data_management.data_management", "import_bank_statement",
+     "Enter bank statement CSV file path:"),
+    ("Manage Category Rules", "features.categorization.rules", "manage_rules", None),
+    ("Recategorize History", "features.categorization.rules", "recategorize_history", None),
+    ("Create Backup", "features.data_management.data_management", "create_backup", None),
+    ("Restore from Backup", "features.data_management.data_management", "restore_from_backup", None),
+    ("Validate Data Integrity", "features.data_management.data_management", "validate_data_integrity", None),
+    ("Verify Ledger Checksums", "features.data_management.data_management", "verify_ledger_checksums", None),
+    ("Repair Ledger", "features.data_management.data_management", "repair_ledger", None),
+    ("Web Dashboard", "main", "launch_dashboard", None),
+]
+# Not in the menu unless timing is on (HISAAB_INSTRUMENT=1, or turned on
+# from the screen itself); always reachable as `python main.py diagnostics`
+HIDDEN_COMMANDS = [
+    ("Diagnostics", "features.diagnostics.diagnostics", "show_diagnostics", None),
+]
+EXIT = "Exit"
+
+_COMMANDS_BY_LABEL = {command[0]: command for command in COMMANDS + HIDDEN_COMMANDS}
+
+LEDGER_FILE = "database/transactions.txt"
+
+_console = None
+
+
+def console():
+    """The shared Rich console, created on first use."""
+    global _console
+    if _console is None:
+        from rich.console import Console
+        _console = Console()
+    return _console
+
+
+def command_slug(label):
+    """'View Balance' -> 'view-balance', the name used on the command line."""
+    return label.lower().replace(" ", "-")
 
-console = Console()
 
 def run_shell_command(command: str, description: str = ""):
     """Run a terminal command with Rich output."""
-    console.print(f"[bold blue]{description}[/bold blue]")
+    console().print(f"[bold blue]{description}[/bold blue]")
 
     try:
         subprocess.run(command, shell=True, check=True)
     except subprocess.CalledProcessError:
-        console.print("[bold red]Failed to run command![/bold red]")
+        console().print("[bold red]Failed to run command![/bold red]")
+
+
+def launch_dashboard():
+    run_shell_command("streamlit run day-7/dashboard.py", "Launching web dashboard...")
+
+
+def run_command(label, file_path=None):
+    """Imports the module behind a menu entry and runs it."""
+    _, module_name, function_name, path_prompt = _COMMANDS_BY_LABEL[label]
+    # Imported for their write listeners, so the command's writes raise budget
+    # and anomaly alerts; not before the menu, anomaly is not needed to show it
+    from features.budgets import budget_alerts  # noqa: F401
+    from features.smart_assistant import anomaly  # noqa: F401
+    function = getattr(importlib.import_module(module_name), function_name)
+    if path_prompt is None:
+        function()
+        return
+    if file_path is None:
+        import questionary
+        file_path = questionary.text(path_prompt).ask()
+    if file_path:
+        function(file_path)
+
+
+def startup_integrity_check():
+    """Quick integrity check on start; details live under 'Validate Data Integrity'."""
+    from features.data_management import integrity
+    try:
+        # Only files changed since the last report are read, and of ledgers
+        # only what was appended
+        report = integrity.validate_database(max_samples=0, previous=integrity.load_report())
+        integrity.write_report(report)
+    except Exception as e:
+        console().print(f"[yellow]Startup integrity check failed to run: {e}[/yellow]")
+        return
+    if not report["ok"]:
+        issue_count = sum(report["totals"].values())
+        console().print(f"[yellow]Data integrity check found {issue_count} issues. Choose 'Validate Data Integrity' for details.[/yellow]")
+
+
+def show_budget_alerts():
+    """Prints budget alerts raised by writes since the menu was last shown."""
+    from features.budgets import budget_alerts
+    for event in budget_alerts.pop_alerts(LEDGER_FILE):
+        style = "bold red" if event.get("threshold", 0) >= 100 else "yellow"
+        label = "Spending alert" if event.get("kind") == "anomaly" else "Budget alert"
+        console().print(f"[{style}]{label}:[/{style}] {budget_alerts.format_alert(event)}")
+
+
+def menu_prompt():
+    """Shows pending alerts and builds the main menu question (not yet asked)."""
+    import questionary
+    from features.diagnostics import instrumentation
+    show_budget_alerts()
+    hidden = [command[0] for command in HIDDEN_COMMANDS] if instrumentation.enabled() else []
+    return questionary.select(
+        "What would you like to do?",
+        choices=[command[0] for command in COMMANDS] + hidden + [EXIT]
+    )
+
 
 def main():
     """Main function to run the finance tracker CLI."""
+    if len(sys.argv) > 1:
+        # One menu command, e.g. `python main.py view-balance` or
+        # `python main.py export-transactions-to-csv out.csv`
+        by_slug = {command_slug(command[0]): command[0] for command in COMMANDS + HIDDEN_COMMANDS}
+        label = by_slug.get(sys.argv[1])
+        if label is not None:
+            run_command(label, sys.argv[2] if len(sys.argv) > 2 else None)
+            return
+        # Prompt-free subcommands for scripts: `python main.py balance --json`
+        import cli
+        sys.exit(cli.main(sys.argv[1:]))
+
+    startup_integrity_check()
     while True:
-        choice = questionary.select(
-            "What would you like to do?",
-            choices=[
-                'Add Expense',
-                'Add Income',
-                'List Transactions',
-                'View Balance',
-                'Set Budget',
-                'View Budgets',
-                'View Analytics',
-                'Smart Assistant',
-                'Export Transactions to CSV',
-                'Export Transactions to JSON',
-                'Export Monthly Report to JSON',
-                'Import Transactions from CSV',
-                'Create Backup',
-                'Restore from Backup',
-                'Validate Data Integrity',
-                'Web Dashboard',
-                'Exit'
-            ]
-        ).ask()
-
-        if choice == 'Add Expense':
-            transactions.add_expense()
-        elif choice == 'Add Income':
-            transactions.add_income()
-        elif choice == 'List Transactions':
-            transactions.list_transactions()
-        elif choice == 'View Balance':
-            transactions.balance()
-        elif choice == 'Set Budget':
-            budget.add_budget()
-        elif choice == 'View Budgets':
-            budget.view_budgets()
-        elif choice == 'View Analytics':
-            display_analytics()
-        elif choice == 'Smart Assistant':
-            display_smart_assistant_dashboard()
-        elif choice == 'Export Transactions to CSV':
-            file_path = questionary.text("Enter CSV file path (e.g., transactions.csv):").ask()
-            if file_path:
-                data_management.export_transactions_to_csv(file_path)
-        elif choice == 'Export Transactions to JSON':
-            file_path = questionary.text("Enter JSON file path (e.g., transactions.json):").ask()
-            if file_path:
-                data_management.export_transactions_to_json(file_path)
-        elif choice == 'Export Monthly Report to JSON':
-            file_path = questionary.text("Enter JSON file path for monthly report (e.g., monthly_report.json):").ask()
-            if file_path:
-                data_management.export_monthly_report_to_json(file_path)
-        elif choice == 'Import Transactions from CSV':
-            file_path = questionary.text("Enter CSV file path to import from:").ask()
-            if file_path:
-                data_management.import_transactions_from_csv(file_path)
-        elif choice == 'Create Backup':
-            data_management.create_backup()
-        elif choice == 'Restore from Backup':
-            data_management.restore_from_backup()
-        elif choice == 'Web Dashboard':
-            run_shell_command("streamlit run day-7/dashboard.py", "Launching web dashboard...")
-        elif choice == 'Exit' or choice is None:
+        choice = menu_prompt().ask()
+        if choice == EXIT or choice is None:
             break
+        run_command(choice)
 
 if __name__ == "__main__":
     main()
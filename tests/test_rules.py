@@ -0,0 +1,121 @@
+import random
+import re
+import unittest
+
+from features.categorization import rules
+
+
+def reference_classify(rule_list, description, kind, amount_paisa):
+    """The rule semantics spelled out one rule at a time, to check compile_rules() against."""
+    for i in sorted(range(len(rule_list)), key=lambda i: -rule_list[i].get("priority", 0)):
+        rule = rule_list[i]
+        if rule.get("type") not in (None, kind):
+            continue
+        if rule.get("min_paisa") is not None and amount_paisa < rule["min_paisa"]:
+            continue
+        if rule.get("max_paisa") is not None and amount_paisa > rule["max_paisa"]:
+            continue
+        pattern = rule.get("pattern")
+        if not pattern:
+            return rule["category"]
+        if rule.get("match") == rules.MATCH_REGEX:
+            if re.search(pattern, description, re.IGNORECASE | re.DOTALL):
+                return rule["category"]
+        elif pattern.lower() in description.lower():
+            return rule["category"]
+    return None
+
+
+class CompileRulesTest(unittest.TestCase):
+    def test_longest_literal_still_reports_the_literals_inside_it(self):
+        classify = rules.compile_rules([
+            {"pattern": "uber", "category": "Transport"},
+            {"pattern": "uber eats", "category": "Food", "priority": 1},
+        ])
+        self.assertEqual(classify("UBER EATS order", "expense", 100), "Food")
+        self.assertEqual(classify("Uber ride", "expense", 100), "Transport")
+
+        classify = rules.compile_rules([
+            {"pattern": "uber", "category": "Transport", "priority": 1},
+            {"pattern": "uber eats", "category": "Food"},
+        ])
+        self.assertEqual(classify("Uber Eats order", "expense", 100), "Transport")
+
+    def test_ties_go_to_the_earlier_rule(self):
+        classify = rules.compile_rules([
+            {"pattern": "net", "category": "Internet"},
+            {"pattern": "netflix", "category": "Entertainment"},
+        ])
+        self.assertEqual(classify("Netflix", "expense", 100), "Internet")
+
+    def test_type_and_amount_filters(self):
+        classify = rules.compile_rules([
+            {"pattern": "transfer", "category": "Rent", "type": "expense", "min_paisa": 5000000},
+            {"pattern": "transfer", "category": "Salary", "type": "income"},
+            {"min_paisa": 0, "max_paisa": 10000, "category": "Petty Cash"},
+        ])
+        self.assertEqual(classify("Bank transfer", "expense", 6000000), "Rent")
+        self.assertEqual(classify("Bank transfer", "income", 6000000), "Salary")
+        self.assertEqual(classify("Bank transfer", "expense", 5000), "Petty Cash")
+        self.assertIsNone(classify("Bank transfer", "expense", 20000))
+
+    def test_regex_hidden_behind_a_better_regex_at_the_same_position(self):
+        classify = rules.compile_rules([
+            {"pattern": r"k-?electric", "match": "regex", "category": "Utilities", "type": "income", "priority": 2},
+            {"pattern": r"k-?elec", "match": "regex", "category": "Bills", "priority": 1},
+            {"pattern": "electric", "category": "Other"},
+        ])
+        self.assertEqual(classify("K-Electric bill", "expense", 100), "Bills")
+        self.assertEqual(classify("K-Electric refund", "income", 100), "Utilities")
+
+    def test_regexes_that_cannot_be_merged(self):
+        rule_list = [
+            {"pattern": "(?i)netflix", "match": "regex", "category": "Entertainment"},
+            {"pattern": r"(a)\1", "match": "regex", "category": "Doubled"},
+            {"pattern": "(?P<x>ab)(?P=x)", "match": "regex", "category": "Repeated"},
+            {"pattern": "(?P<brand>spotify|deezer)", "match": "regex", "category": "Music"},
+        ]
+        for rule in rule_list:
+            rules.validate_rule(rule)
+        classify = rules.compile_rules(rule_list)
+        self.assertEqual(classify("NETFLIX.COM", "expense", 100), "Entertainment")
+        self.assertEqual(classify("baab", "expense", 100), "Doubled")
+        self.assertEqual(classify("xabab", "expense", 100), "Repeated")
+        self.assertEqual(classify("Spotify Premium", "expense", 100), "Music")
+        self.assertIsNone(classify("ab", "expense", 100))
+
+    def test_validate_rule_rejects_broken_patterns(self):
+        with self.assertRaises(ValueError):
+            rules.validate_rule({"pattern": "(unclosed", "match": "regex", "category": "X"})
+        with self.assertRaises(ValueError):
+            rules.validate_rule({"pattern": "", "category": "X"})
+
+    def test_matches_the_rule_by_rule_reference(self):
+        generator = random.Random(7)
+        words = ["uber", "uber eats", "eat", "ube", "net", "netflix", "flix", "k-electric", "ptcl", "ptc"]
+        regexes = [r"k-?elec", r"^net", r"eats?$", r"(a)\1", "(?i)ptcl", r"\d{4}", "fli(x|ck)"]
+        for _ in range(200):
+            rule_list = []
+            for n in range(generator.randint(1, 8)):
+                if generator.random() < 0.4:
+                    rule = {"pattern": generator.choice(regexes), "match": "regex"}
+                else:
+                    rule = {"pattern": generator.choice(words)}
+                rule["category"] = f"C{n}"
+                if generator.random() < 0.3:
+                    rule["priority"] = generator.randint(0, 2)
+                if generator.random() < 0.3:
+                    rule["type"] = generator.choice(rules.TRANSACTION_TYPES)
+                rule_list.append(rule)
+            classify = rules.compile_rules(rule_list)
+            for _ in range(10):
+                description = " ".join(generator.choice(words + ["aa", "2024", "Flick"])
+                                       for _ in range(generator.randint(0, 4)))
+                kind = generator.choice(rules.TRANSACTION_TYPES)
+                self.assertEqual(classify(description, kind, 100),
+                                 reference_classify(rule_list, description, kind, 100),
+                                 (rule_list, description, kind))
+
+
+if __name__ == "__main__":
+    unittest.main()